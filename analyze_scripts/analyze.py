@@ -1,19 +1,92 @@
-from itertools import count, islice
+from itertools import count
+import sys
 import keyword
 
 from utils import *
 from prompt import *
+from corpus import Corpus, KeywordsMentioned
+from work_queue import WorkItem, run_work_items
+from batch_runner import corpus_item_key, run_batch_items
+from prompt_registry import prompt_registry
+from llm_usage import usage_stats
+from keyword_index import TaxonomyIndex
+from llm_hedging import HedgePolicy
+from model_tiers import STAGE_MODEL_POLICIES
+from inference_profiles import get_profile
+from response_cache import ResponseCache
+from token_chunker import map_reduce, pack_chunks
+from focus_merge import tree_merge
+from focus_batching import distribute_in_batches
+from content_sampler import ContentSampler, item_text
+from content_index import get_default_index
+from keyphrases import apply_refined_sentiment, extract_frequent_terms, term_contexts
+from output_schemas import (
+    IS_HOTEL_RELATED_SCHEMA,
+    KEYWORDS_MENTIONED_SCHEMA,
+    TYPICAL_REVIEWS_SCHEMA,
+    USER_FOCUS_BATCH_SCHEMA,
+    USER_FOCUS_SCHEMA,
+    USER_FOCUS_SUMMARY_SCHEMA,
+)
+from hotel_gate import GATE_REASON, HotelRelevanceGate
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 
-def analyzer(system_prompt, user_prompt):
+# 高频词 / 典型评价阶段的内容抽样：条数上限与原来的前 10 / 前 50 条相同，另加 token 预算
+FREQUENT_WORDS_SAMPLER = ContentSampler(max_items=10, token_budget=3000)
+TYPICAL_REVIEWS_SAMPLER = ContentSampler(max_items=50, token_budget=12000)
+
+# 设置环境变量 USE_STRUCTURED_OUTPUT=1 后按 output_schemas 中的 schema 请求 structured output
+USE_STRUCTURED_OUTPUT = os.environ.get("USE_STRUCTURED_OUTPUT") == "1"
+# 设置环境变量 USE_HEDGED_REQUESTS=1 后，耗时超过近期 p95 的请求会发出对冲请求
+HEDGE_POLICY = HedgePolicy() if os.environ.get("USE_HEDGED_REQUESTS") == "1" else None
+# 设置环境变量 USE_MODEL_TIERING=1 后按 model_tiers.STAGE_MODEL_POLICIES 先用小模型、低置信度时再升级
+USE_MODEL_TIERING = os.environ.get("USE_MODEL_TIERING") == "1"
+# 设置环境变量 USE_EMBEDDING_DISTRIBUTION=1 后，用户关注点分配先按向量相似度在本地完成
+USE_EMBEDDING_DISTRIBUTION = os.environ.get("USE_EMBEDDING_DISTRIBUTION") == "1"
+# 设置环境变量 USE_BATCHED_DISTRIBUTION=1 后，用户关注点分配每次请求带多条内容
+USE_BATCHED_DISTRIBUTION = os.environ.get("USE_BATCHED_DISTRIBUTION") == "1"
+# 设置环境变量 USE_RESPONSE_CACHE=1 后，inference_profiles 中可缓存阶段的结果写入/复用 response_cache
+RESPONSE_CACHE = ResponseCache() if os.environ.get("USE_RESPONSE_CACHE") == "1" else None
+# 设置环境变量 USE_LOCAL_FREQUENT_WORDS=1 后高频词在本地统计，REFINE_FREQUENT_WORDS=1 时再由 LLM 修正情感
+USE_LOCAL_FREQUENT_WORDS = os.environ.get("USE_LOCAL_FREQUENT_WORDS") == "1"
+REFINE_FREQUENT_WORDS = os.environ.get("REFINE_FREQUENT_WORDS") == "1"
+
+
+def analyzer(system_prompt, user_prompt, schema=None, stage=None):
     openai_service = OpenAIService()
-    try:
-        analysis = openai_service.infer(
+    policy = STAGE_MODEL_POLICIES.get(stage) if USE_MODEL_TIERING else None
+    profile = get_profile(stage)
+
+    def call(model="gpt-4.1-mini", temperature=None, retries=3):
+        return openai_service.infer(
             user_prompt=user_prompt,
             system_prompt=system_prompt,
+            model=model,
+            temperature=profile.temperature if temperature is None else temperature,
+            retries=retries,
+            stream=True,
+            response_schema=schema if USE_STRUCTURED_OUTPUT else None,
+            hedge=HEDGE_POLICY,
+            stage=stage,
+            seed=profile.seed,
+            max_tokens=profile.max_tokens,
+            cache=RESPONSE_CACHE if profile.cacheable else None,
         )
+
+    try:
+        if policy is None:
+            analysis = call()
+        else:
+            # 低档模型输出无效时直接升级，不在同一档反复重试
+            analysis = policy.run(
+                lambda tier: call(
+                    tier.model,
+                    tier.temperature,
+                    retries=3 if tier is policy.tiers[-1] else 1,
+                )
+            )
     except Exception as e:
         print(f"Error analyzing content: {e}")
         return None
@@ -23,7 +96,62 @@ def analyzer(system_prompt, user_prompt):
         return None
 
 
-def analyze_is_hotel_related(raw_data, max_workers=200):
+def run_stage(
+    items,
+    build_request,
+    on_result,
+    on_error=None,
+    max_workers=200,
+    max_pending=None,
+    batch_client=None,
+    stage="batch",
+    item_key=None,
+):
+    """
+    执行一个分析阶段的任务：默认通过有界工作队列逐条调用接口；
+    传入 batch_client（batch_runner.OpenAIBatchClient / LocalBatchClient）时改为离线 Batch API 模式，
+    batch 模式使用固定模型，不做模型分级；两种模式都使用 inference_profiles 中该阶段的推理参数。
+
+    :param build_request: build_request(item) -> (system_prompt, user_prompt, schema)
+    """
+    if batch_client is None:
+        run_work_items(
+            items,
+            lambda item: analyzer(*build_request(item), stage=stage),
+            on_result,
+            on_error,
+            max_workers=max_workers,
+            max_pending=max_pending,
+        )
+        return
+
+    def batch_request(item):
+        system_prompt, user_prompt, schema = build_request(item)
+        return system_prompt, user_prompt, schema if USE_STRUCTURED_OUTPUT else None
+
+    profile = get_profile(stage)
+    run_batch_items(
+        items,
+        batch_request,
+        on_result,
+        on_error,
+        client=batch_client,
+        stage=stage,
+        item_key=item_key,
+        temperature=profile.temperature,
+        seed=profile.seed,
+        max_tokens=profile.max_tokens,
+    )
+
+
+def analyze_is_hotel_related(
+    raw_data, max_workers=200, max_pending=None, gate=None, batch_client=None
+):
+    """
+    :param gate: 可选的 hotel_gate.HotelRelevanceGate，置信度高的内容在本地直接判定，
+                 只有不确定的内容才调用 LLM
+    :param batch_client: 传入时以离线 Batch API 模式执行，见 batch_runner.py
+    """
     start_time = datetime.now()
 
     # 按平台读取所有酒店
@@ -40,11 +168,11 @@ def analyze_is_hotel_related(raw_data, max_workers=200):
     total_posts_to_analyze = 0
     total_replies_to_analyze = 0
     for hotel in simplified_data:
-        total_posts_to_analyze += len(hotel["posts"])
-        for post in hotel["posts"]:
+        total_posts_to_analyze += len(hotel.posts)
+        for post in hotel.posts:
             # 只有在帖子分析后才确定哪些回复需要分析，但为了进度条，先计算所有回复
             # 稍后在提交任务时会跳过内容过短的回复
-            total_replies_to_analyze += len(post["replies"])
+            total_replies_to_analyze += len(post.replies)
 
     print(
         f"共发现 {total_posts_to_analyze} 个帖子和 {total_replies_to_analyze} 个回复需要分析"
@@ -52,203 +180,153 @@ def analyze_is_hotel_related(raw_data, max_workers=200):
 
     analyzed_posts_count = 0
     analyzed_replies_count = 0
-    tasks_submitted = 0
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures_map = {}
-
-        # 提交帖子分析任务
-        for hotel_index, hotel in enumerate(simplified_data):
-            for post_index, post in enumerate(hotel["posts"]):
-                content = post.get("title", "") + "\n" + post["content"]
-                future = executor.submit(
-                    analyzer,
-                    is_hotel_related_system_prompt,
-                    is_hotel_related_user_prompt.format(post_content=content),
-                )
-                futures_map[future] = {
-                    "type": "post",
-                    "location": (hotel_index, post_index),
-                }
-                tasks_submitted += 1
-
-        # 处理帖子分析结果，并根据结果提交回复分析任务
-        post_futures = {
-            f: info for f, info in futures_map.items() if info["type"] == "post"
-        }
-        for future in as_completed(post_futures):
-            try:
-                partial_res = future.result()
-                analyzed_posts_count += 1
-                task_info = futures_map[future]
-                hotel_index, post_index = task_info["location"]
-
-                is_related = False
-                reason = "分析失败或无结果"
-                if partial_res:
-                    is_related = partial_res.get("is_hotel_related", False)
-                    is_hotel_related_reason = partial_res.get(
-                        "is_hotel_related_reason", "无原因"
-                    )
-                    is_ad = partial_res.get("is_ad", False)
-                    is_ad_reason = partial_res.get("is_ad_reason", "无原因")
-
-                # 更新帖子的分析结果
-                simplified_data[hotel_index]["posts"][post_index][
-                    "is_hotel_related"
-                ] = is_related
-                simplified_data[hotel_index]["posts"][post_index][
-                    "is_hotel_related_reason"
-                ] = is_hotel_related_reason
-                simplified_data[hotel_index]["posts"][post_index]["is_ad"] = is_ad
-                simplified_data[hotel_index]["posts"][post_index][
-                    "is_ad_reason"
-                ] = is_ad_reason
-
-                # 如果帖子相关，则提交其回复的分析任务
-                if is_related:
-                    post = simplified_data[hotel_index]["posts"][post_index]
-                    for reply_index, reply in enumerate(post["replies"]):
-                        # 对于内容长度小于10的评论，直接标记为False，不提交分析
-                        if len(reply["content"]) < 10:
-                            simplified_data[hotel_index]["posts"][post_index][
-                                "replies"
-                            ][reply_index]["is_hotel_related"] = False
-                            simplified_data[hotel_index]["posts"][post_index][
-                                "replies"
-                            ][reply_index]["is_hotel_related_reason"] = "评论内容过短"
-                            # 从总回复数中减去，因为它不被分析
-                            total_replies_to_analyze -= 1
-                            continue
-
-                        reply_future = executor.submit(
-                            analyzer,
-                            is_hotel_related_system_prompt,
-                            is_hotel_related_user_prompt.format(
-                                post_content=reply["content"]
-                            ),
-                        )
-                        futures_map[reply_future] = {
-                            "type": "reply",
-                            "location": (hotel_index, post_index, reply_index),
-                        }
-                        tasks_submitted += 1
-                else:
-                    # 如果帖子不相关，其所有回复也不相关，从总回复数中减去
-                    total_replies_to_analyze -= len(
-                        simplified_data[hotel_index]["posts"][post_index]["replies"]
-                    )
-                    # 标记所有回复为不相关
-                    for reply_index, reply in enumerate(
-                        simplified_data[hotel_index]["posts"][post_index]["replies"]
-                    ):
-                        simplified_data[hotel_index]["posts"][post_index]["replies"][
-                            reply_index
-                        ]["is_hotel_related"] = False
-                        simplified_data[hotel_index]["posts"][post_index]["replies"][
-                            reply_index
-                        ]["is_hotel_related_reason"] = "所属帖子与酒店无关"
-
-                # 打印帖子分析进度
-                post_progress = (
-                    (analyzed_posts_count / total_posts_to_analyze) * 100
-                    if total_posts_to_analyze > 0
-                    else 0
-                )
-                print(
-                    f"\r分析帖子进度: {post_progress:.2f}% ({analyzed_posts_count}/{total_posts_to_analyze})",
-                    end="",
-                )
-
-            except Exception as exc:
-                print(f"\n处理帖子结果时发生错误: {exc}")
-                # 标记帖子分析失败
-                task_info = futures_map[future]
-                hotel_index, post_index = task_info["location"]
-                simplified_data[hotel_index]["posts"][post_index][
-                    "is_hotel_related"
-                ] = False
-                simplified_data[hotel_index]["posts"][post_index][
-                    "is_hotel_related_reason"
-                ] = f"处理错误: {exc}"
-                # 同样，其回复也不再分析
-                total_replies_to_analyze -= len(
-                    simplified_data[hotel_index]["posts"][post_index]["replies"]
-                )
-                continue
-        print("\n帖子分析完成，开始处理回复...")
-
-        # 处理回复分析结果
-        reply_futures = {
-            f: info for f, info in futures_map.items() if info["type"] == "reply"
-        }
-        for future in as_completed(reply_futures):
-            try:
-                partial_res = future.result()
-                analyzed_replies_count += 1
-                task_info = futures_map[future]
-                hotel_index, post_index, reply_index = task_info["location"]
+    gate_saved_posts = 0
+    gate_saved_replies = 0
+
+    def print_progress():
+        post_progress = (
+            (analyzed_posts_count / total_posts_to_analyze) * 100
+            if total_posts_to_analyze > 0
+            else 0
+        )
+        reply_progress = (
+            (analyzed_replies_count / total_replies_to_analyze) * 100
+            if total_replies_to_analyze > 0
+            else 100
+        )
+        print(
+            f"\r分析帖子进度: {post_progress:.2f}% ({analyzed_posts_count}/{total_posts_to_analyze}) | 分析回复进度: {reply_progress:.2f}% ({analyzed_replies_count}/{total_replies_to_analyze})",
+            end="",
+        )
 
-                is_related = False
-                reason = "分析失败或无结果"
-                if partial_res:
-                    is_related = partial_res.get("is_hotel_related", False)
-                    reason = partial_res.get("is_hotel_related_reason", "无原因")
-
-                # 更新回复的分析结果
-                simplified_data[hotel_index]["posts"][post_index]["replies"][
-                    reply_index
-                ]["is_hotel_related"] = is_related
-                simplified_data[hotel_index]["posts"][post_index]["replies"][
-                    reply_index
-                ]["is_hotel_related_reason"] = reason
-
-                # 打印回复分析进度
-                # 确保 total_replies_to_analyze 不为零
-                if total_replies_to_analyze > 0:
-                    reply_progress = (
-                        analyzed_replies_count / total_replies_to_analyze
-                    ) * 100
-                    print(
-                        f"\r分析回复进度: {reply_progress:.2f}% ({analyzed_replies_count}/{total_replies_to_analyze})",
-                        end="",
-                    )
-                else:
-                    print(
-                        f"\r分析回复进度: 无需分析的回复 ({analyzed_replies_count}/0)",
-                        end="",
-                    )
+    def build_request(item):
+        # prompt 在工作线程中生成，任务结束后即可回收
+        content = item.target.full_content if item.kind == "post" else item.target.content
+        return (
+            is_hotel_related_system_prompt,
+            is_hotel_related_user_prompt.format(post_content=content),
+            IS_HOTEL_RELATED_SCHEMA,
+        )
 
-            except Exception as exc:
-                print(f"\n处理回复结果时发生错误: {exc}")
-                # 标记回复分析失败
-                task_info = futures_map[future]
-                hotel_index, post_index, reply_index = task_info["location"]
-                simplified_data[hotel_index]["posts"][post_index]["replies"][
-                    reply_index
-                ]["is_hotel_related"] = False
-                simplified_data[hotel_index]["posts"][post_index]["replies"][
-                    reply_index
-                ]["is_hotel_related_reason"] = f"处理错误: {exc}"
+    def on_post_result(post, partial_res):
+        nonlocal total_replies_to_analyze, analyzed_replies_count, gate_saved_replies
+        is_related = False
+        is_hotel_related_reason = "分析失败或无结果"
+        is_ad = False
+        is_ad_reason = "分析失败或无结果"
+        if partial_res:
+            is_related = partial_res.get("is_hotel_related", False)
+            is_hotel_related_reason = partial_res.get(
+                "is_hotel_related_reason", "无原因"
+            )
+            is_ad = partial_res.get("is_ad", False)
+            is_ad_reason = partial_res.get("is_ad_reason", "无原因")
+
+        # 更新帖子的分析结果
+        post.is_hotel_related = is_related
+        post.is_hotel_related_reason = is_hotel_related_reason
+        post.is_ad = is_ad
+        post.is_ad_reason = is_ad_reason
+
+        # 如果帖子相关，则返回其回复的分析任务
+        reply_items = []
+        if is_related:
+            for reply in post.replies:
+                # 对于内容长度小于10的评论，直接标记为False，不提交分析
+                if len(reply.content) < 10:
+                    reply.is_hotel_related = False
+                    reply.is_hotel_related_reason = "评论内容过短"
+                    # 从总回复数中减去，因为它不被分析
+                    total_replies_to_analyze -= 1
+                    continue
+                decision = gate.decide(reply.content, "reply") if gate else None
+                if decision is not None:
+                    reply.is_hotel_related = decision
+                    reply.is_hotel_related_reason = GATE_REASON
+                    analyzed_replies_count += 1
+                    gate_saved_replies += 1
+                    continue
+                reply_items.append(WorkItem("reply", reply))
+        else:
+            # 如果帖子不相关，其所有回复也不相关，从总回复数中减去
+            total_replies_to_analyze -= len(post.replies)
+            # 标记所有回复为不相关
+            for reply in post.replies:
+                reply.is_hotel_related = False
+                reply.is_hotel_related_reason = "所属帖子与酒店无关"
+        return reply_items
+
+    def on_result(item, partial_res):
+        nonlocal analyzed_posts_count, analyzed_replies_count
+        reply_items = None
+        if item.kind == "post":
+            analyzed_posts_count += 1
+            reply_items = on_post_result(item.target, partial_res)
+        else:
+            analyzed_replies_count += 1
+            is_related = False
+            reason = "分析失败或无结果"
+            if partial_res:
+                is_related = partial_res.get("is_hotel_related", False)
+                reason = partial_res.get("is_hotel_related_reason", "无原因")
+            # 更新回复的分析结果
+            item.target.is_hotel_related = is_related
+            item.target.is_hotel_related_reason = reason
+        print_progress()
+        return reply_items
+
+    def on_error(item, exc):
+        nonlocal total_replies_to_analyze
+        if item.kind == "post":
+            print(f"\n处理帖子结果时发生错误: {exc}")
+            # 帖子分析失败，其回复也不再分析
+            total_replies_to_analyze -= len(item.target.replies)
+        else:
+            print(f"\n处理回复结果时发生错误: {exc}")
+        item.target.is_hotel_related = False
+        item.target.is_hotel_related_reason = f"处理错误: {exc}"
+
+    def post_items():
+        nonlocal analyzed_posts_count, gate_saved_posts
+        for _, post in simplified_data.iter_posts():
+            decision = gate.decide(post.full_content, "post") if gate else None
+            if decision is None:
+                yield WorkItem("post", post)
                 continue
-        print("\n回复分析完成!")
+            # 本地判定的帖子不经过 LLM，is_ad 只在判定为无关时才能确定为 False
+            analyzed_posts_count += 1
+            gate_saved_posts += 1
+            follow_ups = on_post_result(
+                post,
+                {
+                    "is_hotel_related": decision,
+                    "is_hotel_related_reason": GATE_REASON,
+                    "is_ad": False,
+                    "is_ad_reason": GATE_REASON,
+                },
+            )
+            yield from follow_ups
+
+    run_stage(
+        post_items(),
+        build_request,
+        on_result,
+        on_error,
+        max_workers=max_workers,
+        max_pending=max_pending,
+        batch_client=batch_client,
+        stage="is_hotel_related",
+        item_key=corpus_item_key(simplified_data),
+    )
+    print("\n帖子和回复分析完成!")
 
     # 统计分析结果
     final_hotel_related_posts = sum(
-        1
-        for hotel in simplified_data
-        for post in hotel["posts"]
-        if post.get("is_hotel_related")
-    )
-    final_is_ad_posts = sum(
-        1 for hotel in simplified_data for post in hotel["posts"] if post.get("is_ad")
+        1 for _, post in simplified_data.iter_posts() if post.is_hotel_related
     )
+    final_is_ad_posts = sum(1 for _, post in simplified_data.iter_posts() if post.is_ad)
     final_hotel_related_replies = sum(
-        1
-        for hotel in simplified_data
-        for post in hotel["posts"]
-        for reply in post["replies"]
-        if reply.get("is_hotel_related")
+        1 for _, _, reply in simplified_data.iter_replies() if reply.is_hotel_related
     )
 
     # 计算总耗时
@@ -262,117 +340,137 @@ def analyze_is_hotel_related(raw_data, max_workers=200):
     # 使用修正后的总回复数
     print(f"总回复数 (实际分析): {total_replies_to_analyze}")
     print(f"- 与酒店相关回复数: {final_hotel_related_replies}")
+    if gate:
+        print(
+            f"本地预分类节省 LLM 调用: {gate_saved_posts + gate_saved_replies} 次 "
+            f"(帖子 {gate_saved_posts}, 回复 {gate_saved_replies})"
+        )
     print(f"总耗时: {duration}")
+    if HEDGE_POLICY:
+        HEDGE_POLICY.report()
+    if RESPONSE_CACHE:
+        RESPONSE_CACHE.report()
+    if USE_MODEL_TIERING and batch_client is None:
+        STAGE_MODEL_POLICIES["is_hotel_related"].report()
 
     return simplified_data
 
 
-def analyze_keywords(analyzed_data, max_workers=500):
+def analyze_keywords(
+    analyzed_data,
+    max_workers=500,
+    max_pending=None,
+    keyword_top_k=None,
+    batch_client=None,
+):
+    """
+    analyzed_data 可以是 Corpus 或 *_analyzed.json 格式的列表，返回写入了 keywords_mentioned 的 Corpus
+
+    :param keyword_top_k: 设置后先在本地为每条内容预筛选 top-K 个候选二级关键词，
+                          只把候选关键词放进 prompt；为 None 时使用完整关键词列表
+    :param batch_client: 传入时以离线 Batch API 模式执行，见 batch_runner.py
+    """
     start_time = datetime.now()
+    analyzed_data = Corpus.coerce(analyzed_data)
+    taxonomy_index = None
+    # 在线程中计数，记在 usage_stats 中（有锁），结束时报告本次运行的增量
+    pruned_before = usage_stats.events().get("pruned_taxonomy", 0)
+    if keyword_top_k:
+        taxonomy_index = TaxonomyIndex(Keywords.get_keywords_with_description())
     total_posts = 0
     total_replies = 0
     analyzed_posts = 0
     analyzed_replies = 0
 
     # 计算需要分析的帖子和评论数量
-    for hotel in analyzed_data:
-        for post in hotel["posts"]:
-            if post.get("is_hotel_related"):
-                total_posts += 1
-                total_replies += sum(
-                    1 for reply in post["replies"] if reply.get("is_hotel_related")
-                )
+    for _, post in analyzed_data.iter_posts():
+        if post.is_hotel_related:
+            total_posts += 1
+            total_replies += sum(1 for reply in post.replies if reply.is_hotel_related)
 
     print(f"找到 {total_posts} 个相关帖子和 {total_replies} 个相关回复")
 
-    # 合并分析帖子和评论
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures_map = {}
-
-        for hotel_index, hotel in enumerate(analyzed_data):
-            hotel_name = hotel["hotel"]
-            keywords = Keywords.get_keywords_with_description()
-
-            for post_index, post in enumerate(hotel["posts"]):
-                if post.get("is_hotel_related"):
-                    post_content = post.get("title", "") + "\n" + post["content"]
-                    # 提交帖子分析任务
-                    future_post = executor.submit(
-                        analyzer,
-                        analyze_post_system_prompt.format(
-                            keywords=keywords, hotel=hotel_name
-                        ),
-                        analyze_post_user_prompt.format(post_content=post_content),
-                    )
-                    futures_map[future_post] = {
-                        "type": "post",
-                        "location": (hotel_index, post_index),
-                    }
-
-                    # 提交评论分析任务
-                    for reply_index, reply in enumerate(post["replies"]):
-                        if reply.get("is_hotel_related"):
-                            future_reply = executor.submit(
-                                analyzer,
-                                analyze_reply_system_prompt.format(
-                                    keywords=keywords, hotel=hotel_name
-                                ),
-                                analyze_reply_user_prompt.format(
-                                    reply_content=reply["content"],
-                                    post_content=post_content,
-                                ),
-                            )
-                            futures_map[future_reply] = {
-                                "type": "reply",
-                                "location": (hotel_index, post_index, reply_index),
-                            }
-
-        # 处理结果
-        for future in as_completed(futures_map):
-            try:
-                partial_res = future.result()
-                task_info = futures_map[future]
-                task_type = task_info["type"]
-                location = task_info["location"]
+    def iter_items():
+        # 惰性产出帖子和评论任务，由 run_work_items 控制在途任务数量
+        for hotel in analyzed_data:
+            for post in hotel.posts:
+                if not post.is_hotel_related:
+                    continue
+                yield WorkItem("post", post, hotel.hotel)
+                for reply in post.replies:
+                    if reply.is_hotel_related:
+                        yield WorkItem("reply", reply, (hotel.hotel, post))
+
+    def system_prompt(name, template, hotel_name, text):
+        if taxonomy_index is not None:
+            candidates = taxonomy_index.select(text, top_k=keyword_top_k)
+            if candidates is not None:
+                usage_stats.count("pruned_taxonomy")
+                return template.format(keywords=candidates, hotel=hotel_name)
+        # 同一酒店的完整 system prompt 只渲染一次，所有任务共享同一个字符串
+        return prompt_registry.render(name, hotel=hotel_name)
+
+    def build_request(item):
+        if item.kind == "post":
+            post_content = item.target.full_content
+            return (
+                system_prompt(
+                    "analyze_post", analyze_post_system_prompt, item.context, post_content
+                ),
+                analyze_post_user_prompt.format(post_content=post_content),
+                KEYWORDS_MENTIONED_SCHEMA,
+            )
+        hotel_name, post = item.context
+        return (
+            system_prompt(
+                "analyze_reply",
+                analyze_reply_system_prompt,
+                hotel_name,
+                item.target.content,
+            ),
+            analyze_reply_user_prompt.format(
+                reply_content=item.target.content,
+                post_content=post.full_content,
+            ),
+            KEYWORDS_MENTIONED_SCHEMA,
+        )
 
-                if partial_res:
-                    if task_type == "post":
-                        hotel_index, post_index = location
-                        filtered_keywords = Keywords.filter_mentioned_keywords(
-                            partial_res.get("keywords_mentioned", {})
-                        )
-
-                        analyzed_data[hotel_index]["posts"][post_index][
-                            "keywords_mentioned"
-                        ] = filtered_keywords
-                        analyzed_posts += 1
-                    elif task_type == "reply":
-                        hotel_index, post_index, reply_index = location
-                        filtered_keywords = Keywords.filter_mentioned_keywords(
-                            partial_res.get("keywords_mentioned", {})
-                        )
-                        analyzed_data[hotel_index]["posts"][post_index]["replies"][
-                            reply_index
-                        ]["keywords_mentioned"] = filtered_keywords
-                        analyzed_replies += 1
-
-                # 更新进度显示
-                post_progress = (
-                    (analyzed_posts / total_posts) * 100 if total_posts > 0 else 0
-                )
-                reply_progress = (
-                    (analyzed_replies / total_replies) * 100 if total_replies > 0 else 0
-                )
-                print(
-                    f"\r分析进度: 帖子 {post_progress:.2f}% ({analyzed_posts}/{total_posts}) | 回复 {reply_progress:.2f}% ({analyzed_replies}/{total_replies})",
-                    end="",
-                    flush=True,
-                )
+    def on_result(item, partial_res):
+        nonlocal analyzed_posts, analyzed_replies
+        if partial_res:
+            filtered_keywords = Keywords.filter_mentioned_keywords(
+                partial_res.get("keywords_mentioned", {})
+            )
+            item.target.keywords_mentioned = KeywordsMentioned.from_dict(
+                filtered_keywords
+            )
+            if item.kind == "post":
+                analyzed_posts += 1
+            elif item.kind == "reply":
+                analyzed_replies += 1
+
+        # 更新进度显示
+        post_progress = (analyzed_posts / total_posts) * 100 if total_posts > 0 else 0
+        reply_progress = (
+            (analyzed_replies / total_replies) * 100 if total_replies > 0 else 0
+        )
+        print(
+            f"\r分析进度: 帖子 {post_progress:.2f}% ({analyzed_posts}/{total_posts}) | 回复 {reply_progress:.2f}% ({analyzed_replies}/{total_replies})",
+            end="",
+            flush=True,
+        )
 
-            except Exception as exc:
-                print(f"\n处理结果时发生错误: {exc}")
-                continue
-        print("\n分析完成!")
+    run_stage(
+        iter_items(),
+        build_request,
+        on_result,
+        max_workers=max_workers,
+        max_pending=max_pending,
+        batch_client=batch_client,
+        stage="keywords",
+        item_key=corpus_item_key(analyzed_data),
+    )
+    print("\n分析完成!")
 
     # 计算总耗时
     end_time = datetime.now()
@@ -381,20 +479,60 @@ def analyze_keywords(analyzed_data, max_workers=500):
     print(f"\n分析完成! 统计结果:")
     print(f"分析的帖子数: {total_posts}")
     print(f"分析的回复数: {total_replies}")
+    if taxonomy_index is not None:
+        pruned_calls = usage_stats.events().get("pruned_taxonomy", 0) - pruned_before
+        print(f"使用预筛选关键词列表的调用数: {pruned_calls}")
     print(f"总耗时: {duration}")
+    usage_stats.report()
+    if HEDGE_POLICY:
+        HEDGE_POLICY.report()
+    if RESPONSE_CACHE:
+        RESPONSE_CACHE.report()
 
     return analyzed_data
 
 
-def extract_frequent_mentioned_words(keyword_content_map, max_workers=50):
+def _refine_frequent_words(p_keyword, s_keyword, terms, contents):
+    """把本地统计出的高频词及其上下文交给 LLM 修正情感"""
+    payload = [
+        {"keyword": term["keyword"], "contexts": term_contexts(term["keyword"], contents)}
+        for term in terms
+    ]
+    result = analyzer(
+        refine_frequent_words_system_prompt,
+        refine_frequent_words_user_prompt.format(
+            primary_keyword=p_keyword,
+            secondary_keyword=s_keyword,
+            terms=json.dumps(payload, ensure_ascii=False, indent=2),
+        ),
+        stage="refine_frequent_words",
+    )
+    return apply_refined_sentiment(terms, result)
+
+
+def extract_frequent_mentioned_words(
+    keyword_content_map, max_workers=50, sampler=None, local=None
+):
     """
-    从每个二级关键词对应的内容列表中提取前N条内容，合并后提取高频词汇。
+    从每个二级关键词对应的内容列表中抽取部分内容，合并后提取高频词汇。
     将提取的高频词汇列表替换掉原来的内容列表。
 
-    :param keyword_content_map: 结构为 {primary_keyword: {secondary_keyword: [content1, content2, ...]}}
+    :param keyword_content_map: 结构为 {primary_keyword: {secondary_keyword: [content1, content2, ...]}}，
+                                内容也可以是 content_index.ContentIndex.keyword_content_map
+                                或 content_sampler.build_keyword_content_map 生成的字典
     :param max_workers: ThreadPoolExecutor的最大工作线程数
-    :return: 更新后的字典，结构为 {primary_keyword: {secondary_keyword: [{"word": "w1", "sentiment": "s1"}, ...]}}
+    :param sampler: 内容抽样器，默认为 FREQUENT_WORDS_SAMPLER，见 content_sampler.py
+    :param local: 为 True 时在本地统计全部内容的高频词，见 keyphrases.py；默认取 USE_LOCAL_FREQUENT_WORDS
+    :return: 更新后的字典，结构为 {primary_keyword: {secondary_keyword: [{"keyword": "w1", "sentiment": "s1"}, ...]}}
     """
+    if USE_LOCAL_FREQUENT_WORDS if local is None else local:
+        updated_keyword_map = extract_frequent_terms(
+            keyword_content_map,
+            refine=_refine_frequent_words if REFINE_FREQUENT_WORDS else None,
+            max_workers=max_workers,
+        )
+        print("高频词汇本地提取完成!")
+        return updated_keyword_map
 
     updated_keyword_map = {}
     tasks = []
@@ -406,7 +544,10 @@ def extract_frequent_mentioned_words(keyword_content_map, max_workers=50):
             if p_keyword not in updated_keyword_map:
                 updated_keyword_map[p_keyword] = {}
             for s_keyword, contents in s_keywords_map.items():
-                top_contents = contents[:10]
+                top_contents = [
+                    item_text(content)
+                    for content in (sampler or FREQUENT_WORDS_SAMPLER).sample(contents)
+                ]
                 if not top_contents:
                     updated_keyword_map[p_keyword][
                         s_keyword
@@ -424,6 +565,7 @@ def extract_frequent_mentioned_words(keyword_content_map, max_workers=50):
                         primary_keyword=p_keyword,
                         secondary_keyword=s_keyword,
                     ),
+                    stage="frequent_words",
                 )
                 tasks.append(future)
                 task_info_map[future] = (p_keyword, s_keyword)
@@ -454,18 +596,24 @@ def extract_frequent_mentioned_words(keyword_content_map, max_workers=50):
     return updated_keyword_map
 
 
-def extract_typical_reviews_by_primary_keyword(keyword_content_map, max_workers=200):
+def extract_typical_reviews_by_primary_keyword(
+    keyword_content_map, max_workers=200, sampler=None
+):
     """
     为每个一级关键词提取典型的正面和负面评价案例。
 
-    :param keyword_content_map: 结构为 {primary_keyword: {secondary_keyword: [content1, ...]}}
+    :param keyword_content_map: 结构为 {primary_keyword: {secondary_keyword: [content1, ...]}}，
+                                内容也可以是 content_index.ContentIndex.keyword_content_map
+                                或 content_sampler.build_keyword_content_map 生成的字典
     :param max_workers: ThreadPoolExecutor的最大工作线程数
+    :param sampler: 内容抽样器，默认为 TYPICAL_REVIEWS_SAMPLER，见 content_sampler.py
     :return: 字典，键为一级关键词，值为包含典型评价的JSON对象
              例如: {primary_keyword1: {"typical_positive_reviews": [...], "typical_negative_reviews": [...]}}
     """
 
     def get_typical_reviews_for_primary_keyword(p_keyword, all_contents_for_p_keyword):
         openai_service = OpenAIService()
+        profile = get_profile("typical_reviews")
         combined_content = "\n".join(all_contents_for_p_keyword)
         if not combined_content.strip():
             return {
@@ -479,6 +627,12 @@ def extract_typical_reviews_by_primary_keyword(keyword_content_map, max_workers=
                     primary_keyword=p_keyword, text_content=combined_content
                 ),
                 system_prompt=extract_typical_reviews_system_prompt,
+                temperature=profile.temperature,
+                response_schema=TYPICAL_REVIEWS_SCHEMA if USE_STRUCTURED_OUTPUT else None,
+                hedge=HEDGE_POLICY,
+                stage="typical_reviews",
+                seed=profile.seed,
+                max_tokens=profile.max_tokens,
             )
         except Exception as e:
             print(
@@ -528,9 +682,11 @@ def extract_typical_reviews_by_primary_keyword(keyword_content_map, max_workers=
                 }
                 continue
 
-            # 限制传递给模型的内容长度，避免过长，例如取前 N 条或总字符数限制
-            # 这里简单地取前 50 条内容，根据需要调整策略
-            contents_to_analyze = all_contents[:50]
+            # 按平台 / 情感 / 季度分层、在 token 预算内尽量多样地抽取内容
+            contents_to_analyze = [
+                item_text(content)
+                for content in (sampler or TYPICAL_REVIEWS_SAMPLER).sample(all_contents)
+            ]
 
             future = executor.submit(
                 get_typical_reviews_for_primary_keyword, p_keyword, contents_to_analyze
@@ -567,67 +723,135 @@ def extract_typical_reviews_by_primary_keyword(keyword_content_map, max_workers=
     return typical_reviews_result
 
 
-def extract_user_focus(data, max_workers=20):
+def extract_user_focus(
+    data,
+    max_workers=20,
+    token_budget=8000,
+    merge_fan_in=8,
+    output_path="analysis_result/user_focused_keywords.json",
+):
     """
     从分析结果中提取用户关注的关键词
-    """
 
-    def chunk_list(lst, n):
-        it = iter(lst)
-        size = (len(lst) + n - 1) // n  # 向上取整
-        return list(next(islice(it, size), []) for _ in range(n))
+    内容按 token_budget 装入分块（见 token_chunker.py），并行提取每个分块的关注点，
+    再按 focus_merge.tree_merge 本地去重后逐层归并为最终的关注点列表
 
-    chunks = [
-        f"**帖子{i+1}:**\n".join(chunk) for i, chunk in enumerate(chunk_list(data, 20))
-    ]
+    :param token_budget: 每个分块中帖子内容的最大 token 数
+    :param merge_fan_in: 每次 LLM 归并的关注点列表数
+    :param output_path: 关注点列表的保存路径
+    """
 
-    user_focus_list = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures_res = {
-            executor.submit(
-                analyzer,
-                extract_user_focus_system_prompt,
-                extract_user_focus_user_prompt.format(content_chunk=chunk),
-            ): chunk
-            for chunk in chunks
-        }
+    def extract(chunk):
+        content_chunk = "\n".join(
+            f"**帖子{i + 1}:**\n{content}" for i, content in enumerate(chunk)
+        )
+        return analyzer(
+            extract_user_focus_system_prompt,
+            extract_user_focus_user_prompt.format(content_chunk=content_chunk),
+            USER_FOCUS_SCHEMA,
+            "user_focus",
+        )
 
-        for future in as_completed(futures_res):
-            try:
-                partial_res = future.result()
-                if partial_res:
-                    user_focus_list.extend(partial_res)
-            except Exception as exc:
-                print(f"Res {futures_res[future]} generated an exception: {exc}")
-                continue
+    def merge(keywords):
+        return analyzer(
+            merge_user_focus_system_prompt,
+            merge_user_focus_user_prompt.format(user_focus_keywords=", ".join(keywords)),
+            USER_FOCUS_SCHEMA,
+            "merge_user_focus",
+        )
 
-    merged_user_focus_list = analyzer(
-        merge_user_focus_system_prompt,
-        merge_user_focus_user_prompt.format(
-            user_focus_keywords=", ".join(user_focus_list)
+    chunks = pack_chunks(data, token_budget)
+    print(f"共 {len(data)} 条内容，按 {token_budget} tokens 分为 {len(chunks)} 块提取用户关注点")
+    merged_user_focus_list = map_reduce(
+        chunks,
+        extract,
+        lambda partial_results: tree_merge(
+            partial_results, merge, fan_in=merge_fan_in, max_workers=max_workers
         ),
+        max_workers=max_workers,
+        label="用户关注点分块",
     )
-    write_to_json(merged_user_focus_list, "analysis_result/user_focused_keywords.json")
+    write_to_json(merged_user_focus_list, output_path)
     return merged_user_focus_list
 
 
-def distribute_content_to_user_focus(contents):
+def _count_user_focus(result, contents, assignments):
+    """按输入顺序把每条内容计入其分配到的关注点"""
+    for content, keywords in zip(contents, assignments):
+        for keyword in keywords or []:
+            if keyword in result:
+                result[keyword]["count"] += 1
+                result[keyword]["contents"].append(content)
+    return result
+
+
+def distribute_content_to_user_focus(
+    contents, user_focus_keywords=None, max_workers=None, encoder=None
+):
     """
     根据用户关注的关键词将内容分配到对应的关键词下并进行统计
+
+    设置 USE_EMBEDDING_DISTRIBUTION=1 时按向量相似度在本地分配，只有不确定的内容才调用 LLM，见 focus_distribution.py；
+    设置 USE_BATCHED_DISTRIBUTION=1 时每次请求批量分配多条内容，见 focus_batching.py
+
+    :param user_focus_keywords: 关注点列表，默认读取 extract_user_focus 保存的结果
+    :param max_workers: 并发请求数，None 时使用各分配方式原来的并发数
+    :param encoder: USE_EMBEDDING_DISTRIBUTION 时使用的向量编码器，默认 focus_distribution.get_default_encoder()
     """
-    user_focus_keywords = get_raw_data("analysis_result/user_focused_keywords.json")
+    if user_focus_keywords is None:
+        user_focus_keywords = get_raw_data("analysis_result/user_focused_keywords.json")
     if not user_focus_keywords:
         return {}
 
     result = {keyword: {"count": 0, "contents": []} for keyword in user_focus_keywords}
-    with ThreadPoolExecutor(max_workers=200) as executor:
+    system_prompt = prompt_registry.render(
+        "distribute_user_focus", user_focus_keywords=user_focus_keywords
+    )
+
+    if USE_EMBEDDING_DISTRIBUTION:
+        # numpy / sentence-transformers 只在该模式下需要
+        from focus_distribution import FocusDistributor
+
+        contents = list(contents)
+        assignments = FocusDistributor(user_focus_keywords, encoder=encoder).distribute(
+            contents,
+            lambda content: analyzer(
+                system_prompt,
+                distribute_user_focus_user_prompt.format(content=content),
+                USER_FOCUS_SCHEMA,
+                "distribute_user_focus",
+            ),
+            max_workers=max_workers or 200,
+        )
+        return _count_user_focus(result, contents, assignments)
+
+    if USE_BATCHED_DISTRIBUTION:
+        contents = list(contents)
+        batch_system_prompt = prompt_registry.render(
+            "distribute_user_focus_batch", user_focus_keywords=user_focus_keywords
+        )
+        assignments = distribute_in_batches(
+            contents,
+            user_focus_keywords,
+            # 重试时换用不缓存的阶段设置，避免重新组成的同一批内容命中上次不完整的结果
+            lambda batch_text, attempt: analyzer(
+                batch_system_prompt,
+                distribute_user_focus_batch_user_prompt.format(contents=batch_text),
+                USER_FOCUS_BATCH_SCHEMA,
+                "distribute_user_focus" if attempt == 0 else "distribute_user_focus_retry",
+            ),
+            max_workers=max_workers or 50,
+        )
+        return _count_user_focus(result, contents, assignments)
+
+    with ThreadPoolExecutor(max_workers=max_workers or 200) as executor:
         futures_map = {
             executor.submit(
                 analyzer,
-                distribute_user_focus_system_prompt.format(
-                    user_focus_keywords=user_focus_keywords
-                ),
+                system_prompt,
                 distribute_user_focus_user_prompt.format(content=content),
+                USER_FOCUS_SCHEMA,
+                "distribute_user_focus",
             ): content
             for content in contents
         }
@@ -648,24 +872,26 @@ def distribute_content_to_user_focus(contents):
     return result
 
 
-def summurize_user_focus():
-    user_focus_keywords_count = get_raw_data(
-        "analysis_result/user_focus_keywords_count.json"
-    )
+def summurize_user_focus(
+    path="analysis_result/user_focus_keywords_count.json", max_workers=20
+):
+    user_focus_keywords_count = get_raw_data(path)
     if not user_focus_keywords_count:
         return
     for item in user_focus_keywords_count.values():
         if "summary" in item:
             del item["summary"]
 
-    with ThreadPoolExecutor(max_workers=20) as executor:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
         future_res = {
             executor.submit(
                 analyzer,
-                summarize_user_focus_system_prompt.format(keyword=keyword),
+                prompt_registry.render("summarize_user_focus", keyword=keyword),
                 summarize_user_focus_user_prompt.format(
                     content=f"帖子内容：\n".join(keyword_dict["contents"])
                 ),
+                USER_FOCUS_SUMMARY_SCHEMA,
+                "summarize_user_focus",
             ): keyword
             for keyword, keyword_dict in user_focus_keywords_count.items()
         }
@@ -679,9 +905,100 @@ def summurize_user_focus():
             user_focus_keywords_count[keyword]["advantage"] = advantage
             user_focus_keywords_count[keyword]["disadvantage"] = disadvantage
 
+    write_to_json(user_focus_keywords_count, path)
+
+
+HOTEL_STAGES = ("frequent_words", "typical_reviews", "user_focus")
+
+
+def _run_hotel_stage(stage, hotel_map, hotel_dir, max_workers, encoder=None):
+    if stage == "frequent_words":
+        return extract_frequent_mentioned_words(
+            hotel_map["keywords"], max_workers=max_workers
+        )
+    if stage == "typical_reviews":
+        return extract_typical_reviews_by_primary_keyword(
+            hotel_map["keywords"], max_workers=max_workers
+        )
+    # 关注点提取 -> 分配计数 -> 总结，三步依赖前一步的结果，在同一个任务中顺序执行
+    contents = hotel_map["contents"]
+    keywords = extract_user_focus(
+        contents,
+        max_workers=max_workers,
+        output_path=os.path.join(hotel_dir, "user_focused_keywords.json"),
+    )
+    count_path = os.path.join(hotel_dir, "user_focus.json")
     write_to_json(
-        user_focus_keywords_count, "analysis_result/user_focus_keywords_count.json"
+        distribute_content_to_user_focus(
+            contents, keywords or [], max_workers=max_workers, encoder=encoder
+        ),
+        count_path,
     )
+    summurize_user_focus(count_path, max_workers=max_workers)
+    return get_raw_data(count_path)
+
+
+def analyze_hotels(
+    hotel_maps,
+    stages=HOTEL_STAGES,
+    hotel_workers=8,
+    max_workers=20,
+    output_dir="analysis_result/hotels",
+):
+    """
+    在一次运行中为所有酒店执行下游 LLM 阶段，各酒店、各阶段并行
+
+    :param hotel_maps: content_sampler.build_hotel_content_maps 或 content_index.ContentIndex.hotel_content_maps 的结果
+    :param stages: 要执行的阶段，取自 HOTEL_STAGES
+    :param hotel_workers: 同时执行的 (酒店, 阶段) 任务数
+    :param max_workers: 每个任务内部的并发请求数
+    :return: {hotel: {stage: 结果}}，同时保存到 output_dir/{hotel}/{stage}.json
+    """
+    encoder = None
+    if USE_EMBEDDING_DISTRIBUTION and "user_focus" in stages:
+        # 向量模型只加载一次，所有酒店共用
+        from focus_distribution import get_default_encoder
+
+        encoder = get_default_encoder()
+
+    results = {hotel: {} for hotel in hotel_maps}
+    with ThreadPoolExecutor(max_workers=hotel_workers) as executor:
+        futures = {}
+        for hotel, hotel_map in hotel_maps.items():
+            hotel_dir = os.path.join(output_dir, hotel)
+            os.makedirs(hotel_dir, exist_ok=True)
+            for stage in stages:
+                future = executor.submit(
+                    _run_hotel_stage, stage, hotel_map, hotel_dir, max_workers, encoder
+                )
+                futures[future] = (hotel, stage, hotel_dir)
+
+        for done, future in enumerate(as_completed(futures), 1):
+            hotel, stage, hotel_dir = futures[future]
+            try:
+                results[hotel][stage] = future.result()
+                write_to_json(
+                    results[hotel][stage], os.path.join(hotel_dir, f"{stage}.json")
+                )
+            except Exception as exc:
+                print(f"\n{hotel} 的 {stage} 阶段失败: {exc}")
+            print(f"\n酒店分析进度: {done}/{len(futures)} ({hotel} - {stage})")
+    return results
+
+
+def analyze_all_hotels(hotels=None, stages=HOTEL_STAGES, **kwargs):
+    """
+    从内容索引中一次取出所有酒店（或指定酒店）的内容，执行 analyze_hotels
+
+    :param hotels: 酒店列表，None 表示索引中的全部酒店
+    :param kwargs: 传给 analyze_hotels
+    """
+    hotel_maps = get_default_index().hotel_content_maps(hotels)
+    if not hotel_maps:
+        print("内容索引中没有可分析的酒店")
+        return {}
+    print(f"开始分析 {len(hotel_maps)} 个酒店: {', '.join(hotel_maps)}")
+    return analyze_hotels(hotel_maps, stages, **kwargs)
 
 
 def main():
@@ -708,12 +1025,33 @@ def main():
     ]
     paths = [f"raw_data/xhs/5-19/filtered/xhs_{hotel}_all.json" for hotel in hotels]
     formatted_data = format_all_xhs_data_from_mobile(paths, hotels)
-    first_analyzed_data = analyze_is_hotel_related(formatted_data)
+    # 模型文件不存在时 load 返回 None，全部内容交给 LLM
+    first_analyzed_data = analyze_is_hotel_related(
+        formatted_data, gate=HotelRelevanceGate.load()
+    )
     analyzed_data = analyze_keywords(first_analyzed_data)
     merge_data(formatted_data, "raw_data/xhs.json")
-    merge_data(analyzed_data, "analysis_result/xhs_analyzed.json")
+    # pandas / openpyxl 只在统计时需要
+    from data_count import apply_analyzed_delta, load_aggregate_state
+
+    analyzed_path = "analysis_result/xhs_analyzed.json"
+    # 合并前先确认统计结果、内容索引与分析结果文件一致（否则重新统计/同步），合并时只处理新帖子
+    load_aggregate_state()
+    index = get_default_index()
+
+    def on_added(added):
+        apply_analyzed_delta(added, source_path=analyzed_path)
+        index.add_corpus("xhs", added)
+        index.record_source("xhs", analyzed_path)
+
+    merge_data(analyzed_data, analyzed_path, on_added=on_added)
     print("XHS 的数据分析完毕")
 
 
 if __name__ == "__main__":
-    main()
+    # python analyze.py                  分析新的 xhs 数据
+    # python analyze.py hotels [酒店 ...]  为所有酒店（或指定酒店）执行高频词、典型评价、用户关注点阶段
+    if sys.argv[1:2] == ["hotels"]:
+        analyze_all_hotels(sys.argv[2:] or None)
+    else:
+        main()
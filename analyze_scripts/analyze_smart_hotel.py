@@ -1,24 +1,56 @@
 from utils import *
 from prompt import *
+from token_chunker import map_reduce, pack_chunks
 
-def main():
+MODEL = "gpt-4.1"
+
+
+def analyze_chunk(posts):
+    openai_service = OpenAIService()
+    return openai_service.infer(
+        model=MODEL,
+        user_prompt=analyze_smart_hotel_user_prompt.format(content="\n".join(posts)),
+        system_prompt=analyze_smart_hotel_system_prompt,
+        stage="smart_hotel",
+    )
+
+
+def merge_insights(partial_results):
+    """只有一个分块时直接返回其结果，否则再请求一次合并各分块的洞察"""
+    if len(partial_results) <= 1:
+        return partial_results[0] if partial_results else []
+    insights = [insight for partial in partial_results for insight in partial]
+    openai_service = OpenAIService()
+    return openai_service.infer(
+        model=MODEL,
+        user_prompt=merge_smart_hotel_insights_user_prompt.format(
+            insights=json.dumps(insights, ensure_ascii=False, indent=2)
+        ),
+        system_prompt=merge_smart_hotel_insights_system_prompt,
+        stage="smart_hotel_merge",
+    )
+
+
+def main(token_budget=30000, max_workers=8):
+    """
+    :param token_budget: 每次请求中帖子内容的最大 token 数，帖子超出时分块并行分析后再合并
+    """
     smart_hotel_data = get_raw_data("raw_data/flyert-smart-hotel.json")
-    post_contents = ""
-    post_count = 0
+    posts = []
     for hotel in smart_hotel_data:
         for post in hotel["posts"]:
-            content = "**TITLE: ** " + post["title"] + "\n" + "**CONTENT: ** " + post["content"]
-            post_count += 1
-            post_contents += f"**POST {post_count}: **\n" + content + "\n"
+            posts.append(
+                f"**POST {len(posts) + 1}: **\n"
+                f"**TITLE: ** {post['title']}\n**CONTENT: ** {post['content']}"
+            )
 
-    openai_service = OpenAIService()
-    analysis = openai_service.infer(
-        model="gpt-4.1",
-        user_prompt=analyze_smart_hotel_user_prompt.format(content=post_contents),
-        system_prompt=analyze_smart_hotel_system_prompt,
+    chunks = pack_chunks(posts, token_budget, model=MODEL)
+    print(f"共 {len(posts)} 个帖子，按 {token_budget} tokens 分为 {len(chunks)} 块分析")
+    analysis = map_reduce(
+        chunks, analyze_chunk, merge_insights, max_workers=max_workers, label="帖子分块"
     )
 
     write_to_json(analysis, "analyze_result/ai_insights.json")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
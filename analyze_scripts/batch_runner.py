@@ -0,0 +1,307 @@
+"""
+离线 Batch API 模式
+
+analyze_is_hotel_related / analyze_keywords 这类全量重跑的阶段不需要交互式的延迟，
+``run_batch_items`` 与 work_queue.run_work_items 的回调约定相同，但不逐条调用接口，而是：
+
+1. 把本轮所有任务序列化为 Batch API 格式的 JSONL（``custom_id`` + ``/v1/chat/completions`` 请求体）；
+2. 上传并提交 batch，轮询直到结束，下载结果文件；
+3. 按 ``custom_id`` 找回对应的任务，解析 JSON 后调用 on_result，回调返回的后续任务
+   （例如相关帖子下的回复）以及解析失败需要重试的任务组成下一轮 batch。
+
+custom_id 由 ``corpus_item_key`` 按任务在语料中的位置生成，同一份语料多次运行得到的 ID 相同；
+每轮的输入文件和 batch_id 保存在 ``batch_dir`` 中，进程中断后重新运行同一阶段会直接接着轮询已提交的 batch。
+
+``LocalBatchClient`` 是一个本地替身：在后台线程中逐行执行输入文件（默认通过后端池调用
+chat.completions，可以指向 llm_stub_server），生成与 Batch API 相同格式的结果文件，用于测试整个流程。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_backends import get_default_pool
+from llm_usage import usage_stats
+from utils import parse_llm_json
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class OpenAIBatchClient:
+    """通过 OpenAI Batch API 执行，默认使用后端池中的第一个后端"""
+
+    poll_interval = 30
+
+    def __init__(self, backend=None):
+        self.client = (backend or get_default_pool().backends[0]).client
+
+    def submit(self, input_path):
+        with open(input_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def status(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        return batch.status
+
+    def download(self, batch_id, output_path):
+        batch = self.client.batches.retrieve(batch_id)
+        lines = []
+        # 成功的结果和出错的请求分别在 output_file 和 error_file 中
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                lines.append(self.client.files.content(file_id).text.strip())
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(line for line in lines if line) + "\n")
+
+
+class LocalBatchClient:
+    """
+    Batch API 的本地替身
+
+    :param complete: complete(body) -> chat.completion 响应字典；默认通过后端池同步调用 chat.completions
+    :param max_workers: 处理输入文件的并发数
+    """
+
+    poll_interval = 0.2
+
+    def __init__(self, complete=None, max_workers=8):
+        self.complete = complete or self._complete_via_pool
+        self.max_workers = max_workers
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _complete_via_pool(body):
+        body = dict(body)
+        model = body.pop("model")
+        return get_default_pool().call(
+            lambda backend: backend.client.chat.completions.create(
+                model=backend.resolve_model(model), **body
+            ).model_dump()
+        )
+
+    def submit(self, input_path):
+        batch_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        with open(input_path, "r", encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        job = {"status": "in_progress", "output": None}
+        with self._lock:
+            self._jobs[batch_id] = job
+        threading.Thread(target=self._process, args=(job, requests), daemon=True).start()
+        return batch_id
+
+    def _process(self, job, requests):
+        def run(request):
+            try:
+                body = self.complete(request["body"])
+                response = {"status_code": 200, "request_id": uuid.uuid4().hex, "body": body}
+                error = None
+            except Exception as exc:
+                response = None
+                error = {"code": type(exc).__name__, "message": str(exc)}
+            return {
+                "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                "custom_id": request["custom_id"],
+                "response": response,
+                "error": error,
+            }
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            job["output"] = list(executor.map(run, requests))
+        job["status"] = "completed"
+
+    def status(self, batch_id):
+        return self._jobs[batch_id]["status"]
+
+    def download(self, batch_id, output_path):
+        with open(output_path, "w", encoding="utf-8") as f:
+            for line in self._jobs[batch_id]["output"]:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def corpus_item_key(corpus):
+    """返回 item -> 稳定 ID 的函数，ID 由任务类型和对象在语料中的位置组成，如 post-0-12、reply-0-12-3"""
+    positions = {}
+    for h, hotel in enumerate(corpus):
+        for p, post in enumerate(hotel.posts):
+            positions[id(post)] = f"{h}-{p}"
+            for r, reply in enumerate(post.replies):
+                positions[id(reply)] = f"{h}-{p}-{r}"
+    return lambda item: f"{item.kind}-{positions[id(item.target)]}"
+
+
+def _request_body(
+    system_prompt, user_prompt, schema, model, temperature, seed=None, max_tokens=None
+):
+    body = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": temperature,
+    }
+    if seed is not None:
+        body["seed"] = seed
+    if max_tokens is not None:
+        body["max_tokens"] = max_tokens
+    if schema is not None:
+        body["response_format"] = schema.response_format()
+    return body
+
+
+def _parse_output_line(line, schema):
+    if line.get("error"):
+        raise RuntimeError(f"batch 请求失败: {line['error']}")
+    response = line.get("response") or {}
+    if response.get("status_code") != 200:
+        raise RuntimeError(f"batch 请求返回状态码 {response.get('status_code')}")
+    body = response["body"]
+    usage_stats.record(body.get("usage"), body.get("model"), stage="batch")
+    content = body["choices"][0]["message"]["content"]
+    result = parse_llm_json(content, allow_bare=schema is not None)
+    if schema is not None:
+        errors = schema.validate(result)
+        if errors:
+            raise ValueError("; ".join(errors[:5]))
+        result = schema.unwrap(result)
+    return result
+
+
+def _wait_and_download(client, stage, round_index, input_path, batch_dir, poll_interval):
+    with open(input_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    meta_path = os.path.join(batch_dir, f"{stage}_round{round_index}.meta.json")
+    batch_id = None
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        # 输入完全相同且 batch 仍可查询时，接着轮询之前提交的 batch
+        if meta.get("input_sha256") == digest:
+            try:
+                client.status(meta["batch_id"])
+                batch_id = meta["batch_id"]
+                print(f"继续轮询已提交的 batch: {batch_id}")
+            except Exception:
+                batch_id = None
+    if batch_id is None:
+        batch_id = client.submit(input_path)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"batch_id": batch_id, "input_sha256": digest}, f)
+
+    while True:
+        status = client.status(batch_id)
+        if status in TERMINAL_STATUSES:
+            break
+        print(f"\rbatch {batch_id} 状态: {status}", end="", flush=True)
+        time.sleep(poll_interval)
+    print(f"\rbatch {batch_id} 状态: {status}")
+
+    output_path = os.path.join(batch_dir, f"{stage}_round{round_index}.output.jsonl")
+    if status == "completed":
+        client.download(batch_id, output_path)
+    else:
+        # batch 整体失败时本轮所有任务都视为失败
+        open(output_path, "w", encoding="utf-8").close()
+    return output_path
+
+
+def run_batch_items(
+    items,
+    build_request,
+    on_result,
+    on_error=None,
+    client=None,
+    stage="batch",
+    item_key=None,
+    model="gpt-4.1-mini",
+    temperature=0.8,
+    seed=None,
+    max_tokens=None,
+    batch_dir="analysis_result/batches",
+    poll_interval=None,
+    retries=1,
+):
+    """
+    以 Batch API 执行任务，回调约定与 run_work_items 相同
+
+    :param build_request: build_request(item) -> (system_prompt, user_prompt, schema)，schema 可以为 None
+    :param item_key: item -> 稳定 ID，默认按提交顺序编号
+    :param poll_interval: 轮询间隔（秒），默认使用 client.poll_interval
+    :param retries: 解析失败或请求失败的任务放入下一轮重试的次数
+    """
+    client = client or OpenAIBatchClient()
+    if poll_interval is None:
+        poll_interval = client.poll_interval
+    os.makedirs(batch_dir, exist_ok=True)
+    pending = list(items)
+    attempts = {}
+    round_index = 0
+
+    while pending:
+        requests = {}
+        schemas = {}
+        input_path = os.path.join(batch_dir, f"{stage}_round{round_index}.input.jsonl")
+        with open(input_path, "w", encoding="utf-8") as f:
+            for i, item in enumerate(pending):
+                custom_id = f"{stage}:{item_key(item) if item_key else i}"
+                system_prompt, user_prompt, schema = build_request(item)
+                requests[custom_id] = item
+                schemas[custom_id] = schema
+                line = {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": _request_body(
+                        system_prompt,
+                        user_prompt,
+                        schema,
+                        model,
+                        temperature,
+                        seed,
+                        max_tokens,
+                    ),
+                }
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        print(f"batch 阶段 {stage} 第 {round_index + 1} 轮: 提交 {len(requests)} 个请求")
+
+        output_path = _wait_and_download(
+            client, stage, round_index, input_path, batch_dir, poll_interval
+        )
+        outputs = {}
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    line = json.loads(line)
+                    outputs[line["custom_id"]] = line
+
+        next_round = []
+        for custom_id, item in requests.items():
+            try:
+                line = outputs.get(custom_id)
+                if line is None:
+                    raise RuntimeError("batch 结果中缺少该请求")
+                more = on_result(item, _parse_output_line(line, schemas[custom_id]))
+            except Exception as exc:
+                attempts[custom_id] = attempts.get(custom_id, 0) + 1
+                if attempts[custom_id] <= retries:
+                    next_round.append(item)
+                    continue
+                if on_error is None:
+                    print(f"\n处理任务 {custom_id} 时发生错误: {exc}")
+                    continue
+                more = on_error(item, exc)
+            if more:
+                next_round.extend(more)
+        pending = next_round
+        round_index += 1
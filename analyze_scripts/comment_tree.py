@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+comment_tree.py — 小红书评论树的非递归遍历工具
+================================================
+
+小红书抓取数据中的评论以 ``sub_comments`` 字段层层嵌套，回复链可能非常深。
+递归遍历既有触发 ``RecursionError`` 的风险，每一层又会创建新的栈帧/生成器和中间列表。
+本模块用显式栈实现先序遍历，供 ``count_xhs_json.py``、``filter_xhs_json.py``
+以及 ``utils.format_xhs_data_from_mobile`` 共用。
+
+用法
+----
+```
+python analyze_scripts/comment_tree.py          # 运行基准测试
+```
+"""
+
+import sys
+import time
+from typing import Any, Callable, Iterator, Mapping, Optional, Sequence, Tuple
+
+Comment = Mapping[str, Any]
+
+
+def walk_comments(
+    comments: Sequence[Comment],
+    *,
+    prune: Optional[Callable[[Comment], bool]] = None,
+) -> Iterator[Tuple[int, Comment]]:
+    """
+    以先序（与递归版本相同的顺序）遍历评论树，产出 ``(depth, comment)``。
+
+    顶层评论的 depth 为 0。若给定 ``prune``，当 ``prune(comment)`` 为 True 时
+    该评论及其全部子评论都不会被产出。
+    栈中只保存每一层的迭代器，不复制子评论列表。
+    """
+    stack = []
+    it = iter(comments)
+    depth = 0
+    while True:
+        for comment in it:
+            if prune is not None and prune(comment):
+                continue
+            yield depth, comment
+            sub_comments = comment.get("sub_comments")
+            if sub_comments:
+                # 挂起当前层的迭代器，先深入子评论
+                stack.append(it)
+                it = iter(sub_comments)
+                depth += 1
+                break
+        else:
+            if not stack:
+                return
+            it = stack.pop()
+            depth -= 1
+
+
+def find_comment(
+    comments: Sequence[Comment], predicate: Callable[[Comment], bool]
+) -> Optional[Comment]:
+    """返回第一个满足 ``predicate`` 的评论，找到后立即停止遍历；没有则返回 None。"""
+    for _, comment in walk_comments(comments):
+        if predicate(comment):
+            return comment
+    return None
+
+
+def any_comment_contains(comments: Sequence[Comment], kw_lower: str) -> bool:
+    """检查任意层级评论文本是否包含关键词（``kw_lower`` 需已转为小写）。"""
+    return (
+        find_comment(comments, lambda c: kw_lower in c.get("comment_text", "").lower())
+        is not None
+    )
+
+
+def is_empty_comment(comment: Comment) -> bool:
+    """``comment_text`` 为空或全空白。"""
+    return not comment.get("comment_text", "").strip()
+
+
+# ------------------------------------------------------------
+# Benchmark
+# ------------------------------------------------------------
+
+
+def build_benchmark_tree(
+    total_nodes: int = 10_000, chain_depth: int = 500
+) -> list[dict]:
+    """
+    构造一棵用于基准测试的评论树：一条深度为 ``chain_depth`` 的回复链，
+    其余节点以宽度 10 左右的浅层分支挂在各个顶层评论下。
+    """
+    counter = 0
+
+    def new_comment(text: str) -> dict:
+        nonlocal counter
+        counter += 1
+        return {
+            "unique_id": str(counter),
+            "comment_text": text,
+            "date_location": "05-01 Shanghai",
+            "sub_comments": [],
+        }
+
+    roots = []
+    chain_root = new_comment("深层回复链 0")
+    node = chain_root
+    for i in range(1, chain_depth):
+        child = new_comment(f"深层回复链 {i}" if i % 7 else "")
+        node["sub_comments"].append(child)
+        node = child
+    node["comment_text"] = "深层回复链末端 惠庭"
+    roots.append(chain_root)
+
+    while counter < total_nodes:
+        parent = new_comment("顶层评论")
+        roots.append(parent)
+        for j in range(min(10, total_nodes - counter)):
+            parent["sub_comments"].append(new_comment(f"回复 {j}" if j % 5 else " "))
+    return roots
+
+
+def _recursive_flatten(comments: Sequence[Comment]) -> list:
+    """旧版 filter_valid_comments_recursive 的递归写法，仅用于对比。"""
+    out: list = []
+
+    def process(comment: Comment) -> None:
+        if is_empty_comment(comment):
+            return
+        out.append(comment)
+        for sub in comment.get("sub_comments", []):
+            process(sub)
+
+    for c in comments:
+        process(c)
+    return out
+
+
+def _recursive_contains(comment: Comment, kw: str) -> bool:
+    """旧版 comment_contains_keyword 的递归写法，仅用于对比。"""
+    if kw in comment.get("comment_text", "").lower():
+        return True
+    return any(_recursive_contains(child, kw) for child in comment.get("sub_comments", []))
+
+
+def benchmark(total_nodes: int = 10_000, chain_depth: int = 500, repeat: int = 20):
+    tree = build_benchmark_tree(total_nodes, chain_depth)
+    node_count = sum(1 for _ in walk_comments(tree))
+    max_depth = max(depth for depth, _ in walk_comments(tree))
+    print(f"节点数: {node_count}, 最大深度: {max_depth}")
+
+    def timed(label: str, fn: Callable[[], Any]) -> None:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        elapsed = (time.perf_counter() - start) / repeat * 1000
+        print(f"{label:<28}{elapsed:8.2f} ms")
+
+    old_limit = sys.getrecursionlimit()
+    # 递归版本在每层需要多个栈帧（any + 生成器），深链需要放宽限制才能跑完
+    sys.setrecursionlimit(max(old_limit, chain_depth * 4 + 100))
+    try:
+        timed("flatten (recursive)", lambda: _recursive_flatten(tree))
+        timed(
+            "contains, miss (recursive)",
+            lambda: any(_recursive_contains(c, "不存在") for c in tree),
+        )
+        timed(
+            "contains, deep hit (recur.)",
+            lambda: any(_recursive_contains(c, "惠庭") for c in tree),
+        )
+    finally:
+        sys.setrecursionlimit(old_limit)
+
+    timed(
+        "flatten (stack)",
+        lambda: [c for _, c in walk_comments(tree, prune=is_empty_comment)],
+    )
+    timed("contains, miss (stack)", lambda: any_comment_contains(tree, "不存在"))
+    timed("contains, deep hit (stack)", lambda: any_comment_contains(tree, "惠庭"))
+
+
+if __name__ == "__main__":
+    benchmark()
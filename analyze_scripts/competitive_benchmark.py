@@ -0,0 +1,176 @@
+"""
+酒店与行业平均的对比数据
+
+generate_ppt.py 读取的 analysis_result/tmp.json（每个一级关键词下各二级关键词的 pkBuzz / pkSentimentScore，
+某个酒店对比“行业平均”）原先是手工整理的。这里在 data_count.compile_keywords_for_analyzed_data 的结果上，
+用一张 DataFrame 一次算出所有酒店、所有关键词的：
+
+* 声量（正面 + 中立 + 负面）、情感得分（(正面 - 负面) / 声量 × 100，与 caculate_sentiment_distribution 相同）、
+  该关键词占酒店总声量的比例；
+* 行业平均：声量为所有酒店的平均值，情感得分只在该关键词有声量的酒店之间平均；
+* 该酒店在所有酒店中的百分位，以及行业的 25/50/75/90 分位数（``industry_percentiles``）。
+
+``build_ppt_data`` 生成 tmp.json 的结构，``data_count.generate_excel_for_compiled_data`` 写入“行业对比”sheet。
+```
+python analyze_scripts/competitive_benchmark.py [酒店]
+```
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils import Keywords, write_to_json
+
+SENTIMENTS = ["positive", "neutral", "negative"]
+PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+INDUSTRY_AVERAGE = "industryAverage"
+ANALYZED_FILES = [
+    "analysis_result/flyert_analyzed.json",
+    "analysis_result/wb_analyzed.json",
+    "analysis_result/xhs_analyzed.json",
+]
+
+# 写入 Excel 时的列名
+EXCEL_COLUMNS = {
+    "hotel": "酒店",
+    "primary_keyword": "一级关键词",
+    "keyword": "关键词",
+    "buzz": "声量",
+    "industry_average_buzz": "行业平均声量",
+    "buzz_percentile": "声量百分位",
+    "sentiment_score": "情感得分",
+    "industry_average_score": "行业平均情感得分",
+    "score_percentile": "情感得分百分位",
+    "share_of_voice": "占酒店声量比例",
+}
+
+
+def benchmark_frame(compiled_data):
+    """
+    :param compiled_data: compile_keywords_for_analyzed_data 的结果
+    :return: 每个 (酒店, 关键词) 一行的 DataFrame
+    """
+    sk_to_pk_map = Keywords.get_sk_to_pk_map()
+    records = [
+        (hotel, keyword, *(distribution.get(s, 0) for s in SENTIMENTS))
+        for hotel, hotel_data in compiled_data.items()
+        for keyword, distribution in hotel_data["keywords_sentiment_distribution"].items()
+    ]
+    frame = pd.DataFrame.from_records(records, columns=["hotel", "keyword", *SENTIMENTS])
+    frame["level"] = np.where(frame["keyword"].isin(sk_to_pk_map.keys()), "secondary", "primary")
+    frame["primary_keyword"] = frame["keyword"].map(sk_to_pk_map).fillna(frame["keyword"])
+
+    frame["buzz"] = frame[SENTIMENTS].sum(axis=1)
+    has_buzz = frame["buzz"] > 0
+    frame["sentiment_score"] = (
+        (frame["positive"] - frame["negative"]) / frame["buzz"].where(has_buzz) * 100
+    ).fillna(0.0)
+    hotel_buzz = frame["hotel"].map({h: d.get("buzz", 0) for h, d in compiled_data.items()})
+    frame["share_of_voice"] = (frame["buzz"] / hotel_buzz.where(hotel_buzz > 0)).fillna(0.0)
+
+    by_keyword = frame.groupby("keyword")
+    frame["industry_average_buzz"] = by_keyword["buzz"].transform("mean")
+    frame["buzz_percentile"] = by_keyword["buzz"].rank(pct=True) * 100
+    # 没有声量的酒店情感得分为 0，不参与情感得分的平均和排名
+    scores = frame["sentiment_score"].where(has_buzz)
+    frame["industry_average_score"] = (
+        scores.groupby(frame["keyword"]).transform("mean").fillna(0.0)
+    )
+    frame["score_percentile"] = scores.groupby(frame["keyword"]).rank(pct=True) * 100
+    return frame
+
+
+def industry_percentiles(frame, percentiles=PERCENTILES):
+    """每个关键词声量与情感得分的行业分位数，情感得分只统计有声量的酒店"""
+    buzz = frame.groupby("keyword")["buzz"].quantile(list(percentiles)).unstack()
+    scores = (
+        frame[frame["buzz"] > 0]
+        .groupby("keyword")["sentiment_score"]
+        .quantile(list(percentiles))
+        .unstack()
+    )
+    buzz.columns = [f"buzz_p{int(p * 100)}" for p in buzz.columns]
+    scores.columns = [f"score_p{int(p * 100)}" for p in scores.columns]
+    return buzz.join(scores, how="left")
+
+
+def build_ppt_data(frame, hotel, compare=(INDUSTRY_AVERAGE,), topics=None):
+    """
+    :param compare: 对比对象，"industryAverage" 表示行业平均，其它为酒店名称
+    :param topics: 只包含这些一级关键词，None 表示全部
+    :return: generate_ppt.py 使用的结构：
+             {一级关键词: {"pkBuzz": [{"name": 二级关键词, hotel: 声量, "industryAverage": 行业平均, 其它酒店: 声量}, ...],
+                           "pkSentimentScore": [...]}}
+    """
+    secondary = frame[frame["level"] == "secondary"]
+    if topics is not None:
+        secondary = secondary[secondary["primary_keyword"].isin(list(topics))]
+    rows = secondary[secondary["hotel"] == hotel]
+    if rows.empty:
+        raise ValueError(f"没有 {hotel} 的统计数据")
+    # 关键词 × 酒店 的透视表，对比其它酒店时按关键词直接取值
+    others = [name for name in compare if name != INDUSTRY_AVERAGE]
+    buzz_table = secondary.pivot(index="keyword", columns="hotel", values="buzz")
+    score_table = secondary.pivot(index="keyword", columns="hotel", values="sentiment_score")
+
+    def item(row, value, average, table, cast):
+        entry = {"name": row.keyword, hotel: cast(value)}
+        for name in compare:
+            if name == INDUSTRY_AVERAGE:
+                entry[name] = round(float(average), 2)
+            elif name in table.columns:
+                entry[name] = cast(table.at[row.keyword, name])
+        return entry
+
+    ppt_data = {}
+    for primary_keyword, group in rows.groupby("primary_keyword", sort=True):
+        group = group.sort_values("keyword")
+        ppt_data[primary_keyword] = {
+            "pkBuzz": [
+                item(row, row.buzz, row.industry_average_buzz, buzz_table, int)
+                for row in group.itertuples()
+            ],
+            "pkSentimentScore": [
+                item(
+                    row,
+                    row.sentiment_score,
+                    row.industry_average_score,
+                    score_table,
+                    lambda v: round(float(v), 2),
+                )
+                for row in group.itertuples()
+            ],
+        }
+    missing = [name for name in others if name not in buzz_table.columns]
+    if missing:
+        print(f"没有以下对比酒店的统计数据: {', '.join(missing)}")
+    return ppt_data
+
+
+def excel_rows(frame):
+    """写入“行业对比”sheet 的行，按酒店、一级关键词、关键词排序，一级关键词排在其二级关键词之前"""
+    frame = frame.assign(_order=(frame["level"] == "secondary").astype(int))
+    frame = frame.sort_values(["hotel", "primary_keyword", "_order", "keyword"])
+    table = frame[list(EXCEL_COLUMNS)].rename(columns=EXCEL_COLUMNS)
+    return table.round(2)
+
+
+def load_benchmark_frame(file_paths=ANALYZED_FILES):
+    from data_count import compile_keywords_for_analyzed_data, get_all_analyzed_data
+
+    return benchmark_frame(
+        compile_keywords_for_analyzed_data(get_all_analyzed_data(file_paths))
+    )
+
+
+def main(hotel="惠庭", output_path="analysis_result/tmp.json"):
+    frame = load_benchmark_frame()
+    write_to_json(build_ppt_data(frame, hotel), output_path)
+    print(f"{hotel} 与行业平均的对比数据已保存在{output_path}")
+    return frame
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
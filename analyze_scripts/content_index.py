@@ -0,0 +1,437 @@
+"""
+分析结果的倒排索引
+
+collect_huiting_content_by_keyword / get_huiting_content 每次都重新读取三个 *_analyzed.json、遍历全部帖子，
+并且写死了“惠庭”。``ContentIndex`` 把分析结果写入 sqlite（默认 analysis_result/content_index.sqlite）：
+
+* ``contents``：与酒店相关的帖子、其全部回复以及本身与酒店相关的回复各一行，
+  记录酒店、平台、帖子或回复、是否广告、本条是否与酒店相关、时间和月份；
+* ``postings``：(酒店, 一级关键词, 二级关键词, 情感, 平台, 月份) -> 内容 id，按酒店 + 关键词 + 情感建了索引，
+  任意酒店、任意关键词的查询只需一次索引查找；与 build_keyword_content_map 相同，只收录与酒店相关的帖子及其回复；
+* ``add_corpus`` 是增量的：内容 id 由平台、酒店和帖子标识（note_id / link / 内容）确定，
+  分析结果没有变化的内容直接跳过，有变化的重写其倒排项，不再与酒店相关的内容从索引中删除。
+  analyze.main 中 merge_data 只把实际新增的帖子写入索引，并用 ``record_source`` 记录合并后的文件；
+* ``sync`` 记录各平台分析结果文件的修改时间和大小，``get_default_index`` 每次使用前检查，
+  文件有变化的平台重新写入索引，并删除文件中已经不存在的内容。
+
+``keyword_content_map`` 生成与 content_sampler.build_keyword_content_map 相同结构的输入，
+供高频词、典型评价等阶段直接使用。从现有的分析结果重建索引：
+```
+python analyze_scripts/content_index.py
+```
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from corpus import Corpus, timestamp_to_datetime
+from utils import Keywords
+
+DEFAULT_INDEX_PATH = "analysis_result/content_index.sqlite"
+ANALYZED_FILES = {
+    "flyert": "analysis_result/flyert_analyzed.json",
+    "wb": "analysis_result/wb_analyzed.json",
+    "xhs": "analysis_result/xhs_analyzed.json",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_key TEXT UNIQUE NOT NULL,
+    fingerprint TEXT NOT NULL,
+    hotel TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    is_ad INTEGER NOT NULL,
+    is_hotel_related INTEGER NOT NULL,
+    timestamp INTEGER,
+    period TEXT,
+    content TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_contents_hotel ON contents (hotel, platform, kind);
+CREATE TABLE IF NOT EXISTS postings (
+    content_id INTEGER NOT NULL,
+    hotel TEXT NOT NULL,
+    primary_keyword TEXT NOT NULL,
+    secondary_keyword TEXT NOT NULL,
+    sentiment TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    period TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_postings_secondary ON postings (hotel, secondary_keyword, sentiment);
+CREATE INDEX IF NOT EXISTS idx_postings_primary ON postings (hotel, primary_keyword, sentiment);
+CREATE INDEX IF NOT EXISTS idx_postings_content ON postings (content_id);
+CREATE TABLE IF NOT EXISTS sources (
+    platform TEXT PRIMARY KEY,
+    signature TEXT NOT NULL
+);
+"""
+
+
+def _period(minutes):
+    """分钟数 -> 月份，如 2024-07"""
+    if minutes is None:
+        return None
+    return timestamp_to_datetime(minutes).strftime("%Y-%m")
+
+
+def _content_key(platform, hotel, post, reply=None):
+    # 与 utils.get_unanalyzed_posts 相同，帖子优先用 note_id / link 标识，没有时用内容
+    post_id = post.note_id or post.link or post.full_content
+    parts = [platform, hotel, post_id]
+    if reply is not None:
+        parts += [reply.content or "", str(reply.timestamp)]
+    return hashlib.sha1("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def _mentions(node, sk_to_pk_map):
+    """(一级关键词, 二级关键词, 情感)，与 build_keyword_content_map 一样只取能对应到一级关键词的二级关键词"""
+    if node.keywords_mentioned is None:
+        return []
+    mentions = []
+    for mention in node.keywords_mentioned.secondary or []:
+        keyword = (mention.keyword or "").strip()
+        if keyword in sk_to_pk_map and mention.sentiment is not None:
+            mentions.append((sk_to_pk_map[keyword], keyword, mention.sentiment.label))
+    return mentions
+
+
+def _file_signature(path):
+    """修改时间和大小，文件不存在时为空字符串"""
+    if not os.path.exists(path):
+        return ""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _where(prefix="", **filters):
+    """None 表示不限制；since / until 为包含边界的月份；prefix 为联表查询时的表别名，如 "p." """
+    clauses = []
+    params = []
+    for column, value in filters.items():
+        if value is None:
+            continue
+        if column == "since":
+            clauses.append(f"{prefix}period >= ?")
+        elif column == "until":
+            clauses.append(f"{prefix}period <= ?")
+        elif isinstance(value, (list, tuple, set)):
+            value = list(value)
+            clauses.append(f"{prefix}{column} IN ({', '.join('?' * len(value))})")
+            params.extend(value)
+            continue
+        else:
+            clauses.append(f"{prefix}{column} = ?")
+        params.append(value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+class ContentIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(contents)")}
+        if columns and "body" not in columns:
+            # 旧版本的索引没有 body 列，索引可以从分析结果重建，直接删除
+            self._conn.executescript(
+                "DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS contents; "
+                "DROP TABLE IF EXISTS sources;"
+            )
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM contents").fetchone()[0]
+
+    def add_corpus(self, platform, data, prune=False):
+        """
+        把一个平台的分析结果增量写入索引
+
+        :param data: Corpus 或 *_analyzed.json 格式的列表，可以只包含新分析的帖子
+        :param prune: data 是该平台的全部分析结果时为 True，删除其中已经不存在的内容
+        :return: {"added", "updated", "unchanged", "removed"} 条数
+        """
+        sk_to_pk_map = Keywords.get_sk_to_pk_map()
+        stats = dict.fromkeys(("added", "updated", "unchanged", "removed"), 0)
+        start = time.perf_counter()
+        with self._lock:
+            existing = {
+                key: (content_id, fingerprint)
+                for key, content_id, fingerprint in self._conn.execute(
+                    "SELECT content_key, id, fingerprint FROM contents WHERE platform = ?",
+                    (platform,),
+                )
+            }
+            seen = set()
+            for hotel in Corpus.coerce(data):
+                for post in hotel.posts:
+                    nodes = [(post, None, post.full_content, post.content or "")] + [
+                        (reply, reply, reply.content, reply.content)
+                        for reply in post.iter_replies()
+                    ]
+                    for node, reply, content, body in nodes:
+                        key = _content_key(platform, hotel.hotel, post, reply)
+                        if key in seen:
+                            # 同一帖子下内容和时间都相同的回复只保留一条
+                            continue
+                        seen.add(key)
+                        self._upsert(
+                            key, existing.pop(key, None), platform, hotel.hotel, post,
+                            node, reply, content, body, sk_to_pk_map, stats,
+                        )
+            if prune:
+                for content_id, _ in existing.values():
+                    self._delete(content_id)
+                    stats["removed"] += 1
+            self._conn.commit()
+        print(
+            f"内容索引 [{platform}]: 新增 {stats['added']} 条, 更新 {stats['updated']} 条, "
+            f"未变 {stats['unchanged']} 条, 移除 {stats['removed']} 条, "
+            f"耗时 {time.perf_counter() - start:.2f}s"
+        )
+        return stats
+
+    def _upsert(
+        self, key, current, platform, hotel, post, node, reply, content, body, sk_to_pk_map, stats
+    ):
+        # 关键词统计只看帖子是否与酒店相关（回复跟随帖子），get_huiting_content 另外需要本身与酒店相关的回复
+        if not (post.is_hotel_related or node.is_hotel_related) or not content:
+            if current is not None:
+                self._delete(current[0])
+                stats["removed"] += 1
+            return
+        mentions = _mentions(node, sk_to_pk_map) if post.is_hotel_related else []
+        is_ad = bool(post.is_ad) if reply is None else False
+        is_hotel_related = bool(node.is_hotel_related)
+        fingerprint = hashlib.sha1(
+            json.dumps(
+                [content, is_ad, is_hotel_related, node.timestamp, mentions],
+                ensure_ascii=False,
+            ).encode("utf-8")
+        ).hexdigest()
+        if current is not None and current[1] == fingerprint:
+            stats["unchanged"] += 1
+            return
+        if current is not None:
+            self._delete(current[0])
+            stats["updated"] += 1
+        else:
+            stats["added"] += 1
+        period = _period(node.timestamp)
+        cursor = self._conn.execute(
+            "INSERT INTO contents (content_key, fingerprint, hotel, platform, kind, is_ad, "
+            "is_hotel_related, timestamp, period, content, body) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key, fingerprint, hotel, platform, "post" if reply is None else "reply",
+                int(is_ad), int(is_hotel_related), node.timestamp, period, content, body,
+            ),
+        )
+        self._conn.executemany(
+            "INSERT INTO postings VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (cursor.lastrowid, hotel, pk, sk, sentiment, platform, period)
+                for pk, sk, sentiment in dict.fromkeys(mentions)
+            ],
+        )
+
+    def _delete(self, content_id):
+        self._conn.execute("DELETE FROM postings WHERE content_id = ?", (content_id,))
+        self._conn.execute("DELETE FROM contents WHERE id = ?", (content_id,))
+
+    def query(
+        self,
+        hotel=None,
+        primary_keyword=None,
+        secondary_keyword=None,
+        sentiment=None,
+        platform=None,
+        since=None,
+        until=None,
+    ):
+        """
+        倒排查询，各条件为 None 时不限制，也可以传列表表示任一取值
+
+        :return: 按 id 排序、去重的内容 id 列表
+        """
+        where, params = _where(
+            hotel=hotel,
+            primary_keyword=primary_keyword,
+            secondary_keyword=secondary_keyword,
+            sentiment=sentiment,
+            platform=platform,
+            since=since,
+            until=until,
+        )
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT content_id FROM postings{where} ORDER BY content_id", params
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def contents(self, content_ids):
+        """内容 id -> [{"id", "content", "hotel", "platform", "kind", "timestamp"}, ...]，顺序与 content_ids 相同"""
+        records = {}
+        ids = list(content_ids)
+        with self._lock:
+            # sqlite 对单条语句的参数个数有限制，分批查询
+            for start in range(0, len(ids), 500):
+                chunk = ids[start : start + 500]
+                for row in self._conn.execute(
+                    "SELECT id, content, hotel, platform, kind, timestamp FROM contents "
+                    f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ):
+                    records[row[0]] = dict(
+                        zip(("id", "content", "hotel", "platform", "kind", "timestamp"), row)
+                    )
+        return [records[i] for i in ids if i in records]
+
+    def hotel_contents(self, hotel, include_replies=False, include_ads=False, platform=None):
+        """某个酒店全部与酒店相关的内容文本（不要求提到关键词），帖子只取正文，不含标题"""
+        where, params = _where(
+            hotel=hotel,
+            platform=platform,
+            kind=None if include_replies else "post",
+            is_ad=None if include_ads else 0,
+            is_hotel_related=1,
+        )
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT body FROM contents{where} ORDER BY id", params
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _keyword_rows(self, hotel, platform, since, until):
+        where, params = _where(
+            "p.", hotel=hotel, platform=platform, since=since, until=until
+        )
+        with self._lock:
+            return self._conn.execute(
+                "SELECT p.hotel, p.primary_keyword, p.secondary_keyword, p.sentiment, "
+                "c.content, c.platform, c.timestamp "
+                f"FROM postings p JOIN contents c ON c.id = p.content_id{where} ORDER BY p.content_id",
+                params,
+            ).fetchall()
+
+    def keyword_content_map(self, hotel=None, platform=None, since=None, until=None):
+        """
+        hotel 为 None 时包含全部酒店
+
+        :return: {primary_keyword: {secondary_keyword: [{"content", "platform", "sentiment", "timestamp"}, ...]}}，
+                 与 content_sampler.build_keyword_content_map 的结构相同
+        """
+        keyword_content_map = {}
+        for _, pk, sk, sentiment, content, content_platform, timestamp in self._keyword_rows(
+            hotel, platform, since, until
+        ):
+            keyword_content_map.setdefault(pk, {}).setdefault(sk, []).append(
+                {
+                    "content": content,
+                    "platform": content_platform,
+                    "sentiment": sentiment,
+                    "timestamp": timestamp,
+                }
+            )
+        return keyword_content_map
+
+    def hotel_content_maps(self, hotels=None, platform=None, since=None, until=None):
+        """
+        一次查询同时取出多个酒店的内容，结构与 content_sampler.build_hotel_content_maps 相同；
+        "contents" 与 hotel_contents 一样取帖子正文（不含标题），与单个酒店的用户关注点提取使用相同的文本
+
+        :param hotels: 酒店列表，None 表示全部
+        :return: {hotel: {"keywords": keyword_content_map 结构的字典, "contents": [与酒店相关的内容文本, ...]}}
+        """
+        hotels = list(hotels) if hotels is not None else None
+        hotel_maps = {}
+        for hotel, pk, sk, sentiment, content, content_platform, timestamp in self._keyword_rows(
+            hotels, platform, since, until
+        ):
+            hotel_map = hotel_maps.setdefault(hotel, {"keywords": {}, "contents": []})
+            hotel_map["keywords"].setdefault(pk, {}).setdefault(sk, []).append(
+                {
+                    "content": content,
+                    "platform": content_platform,
+                    "sentiment": sentiment,
+                    "timestamp": timestamp,
+                }
+            )
+        where, params = _where(
+            hotel=hotels,
+            platform=platform,
+            since=since,
+            until=until,
+            is_ad=0,
+            is_hotel_related=1,
+        )
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT hotel, body FROM contents{where} ORDER BY id", params
+            ).fetchall()
+        for hotel, content in rows:
+            hotel_maps.setdefault(hotel, {"keywords": {}, "contents": []})["contents"].append(
+                content
+            )
+        return hotel_maps
+
+    def rebuild(self, files=None):
+        """从分析结果文件重建索引"""
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM contents")
+            self._conn.execute("DELETE FROM sources")
+            self._conn.commit()
+        return self.sync(files)
+
+    def record_source(self, platform, path=None):
+        """记录分析结果文件当前的修改时间和大小，之后 sync 只在它再次变化时重新写入该平台"""
+        path = path or ANALYZED_FILES[platform]
+        signature = _file_signature(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?)", (platform, signature)
+            )
+            self._conn.commit()
+
+    def sync(self, files=None):
+        """分析结果文件的修改时间或大小与上次写入索引时不同的平台，用文件中的全部内容重新写入"""
+        from utils import get_raw_data
+
+        for platform, path in (files or ANALYZED_FILES).items():
+            signature = _file_signature(path)
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT signature FROM sources WHERE platform = ?", (platform,)
+                ).fetchone()
+            if (row[0] if row else "") == signature:
+                continue
+            print(f"{path} 有变化，更新内容索引")
+            self.add_corpus(platform, (get_raw_data(path) if signature else None) or [], prune=True)
+            self.record_source(platform, path)
+        return self
+
+
+_default_index = None
+
+
+def get_default_index():
+    """默认路径的索引，每次使用前与分析结果文件同步"""
+    global _default_index
+    if _default_index is None:
+        _default_index = ContentIndex()
+    return _default_index.sync()
+
+
+if __name__ == "__main__":
+    index = ContentIndex().rebuild()
+    print(f"内容索引共 {len(index)} 条内容")
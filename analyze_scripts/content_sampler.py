@@ -0,0 +1,227 @@
+"""
+给 LLM 的内容抽样
+
+extract_frequent_mentioned_words 每个二级关键词只取 contents[:10]，extract_typical_reviews_by_primary_keyword
+只取 all_contents[:50]，取的是插入顺序，结果偏向最先读入的平台文件。这里提供可替换的抽样器：
+
+* ``HeadSampler``：原来的取前 N 条；
+* ``ContentSampler``：
+  1. 分层：按平台 / 情感 / 季度分组（内容为纯字符串时没有这些信息，全部在同一层），
+     每次从“已取条数 / 该层总条数”最小的层中取下一条，各层按比例覆盖，小的层也至少能取到一条；
+  2. 层内按 MMR 排序：相关性为与该层字符 n-gram 质心的相似度，多样性惩罚为与已选内容的最大 Jaccard 相似度，
+     完全相同的内容只取一次；
+  3. 按 token 预算装填，放不下的内容跳过，直到条数上限或没有内容能再放入。
+
+内容可以是字符串，也可以是 ``build_keyword_content_map`` 生成的带 platform / sentiment / timestamp 的字典，
+``item_text`` 统一取出文本。
+"""
+
+import math
+from collections import Counter, defaultdict
+
+from corpus import Corpus, timestamp_to_datetime
+from keyword_index import text_ngrams
+from token_chunker import count_tokens
+from utils import Keywords
+
+# 连续这么多条内容都放不进剩余预算时停止抽样
+_MAX_CONSECUTIVE_SKIPS = 20
+
+
+def item_text(item):
+    return item["content"] if isinstance(item, dict) else item
+
+
+def _period(timestamp):
+    """分钟数或 "%Y-%m-%d %H:%M" 字符串 -> 季度，如 2024Q3"""
+    if isinstance(timestamp, int):
+        dt = timestamp_to_datetime(timestamp)
+        return f"{dt.year}Q{(dt.month - 1) // 3 + 1}"
+    if isinstance(timestamp, str) and len(timestamp) >= 7:
+        return f"{timestamp[:4]}Q{(int(timestamp[5:7]) - 1) // 3 + 1}"
+    return None
+
+
+def _stratum(item, fields):
+    if not isinstance(item, dict):
+        return ()
+    values = []
+    for field in fields:
+        if field == "period":
+            values.append(_period(item.get("timestamp")))
+        else:
+            values.append(item.get(field))
+    return tuple(values)
+
+
+class HeadSampler:
+    """原来的策略：按插入顺序取前 max_items 条"""
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+
+    def sample(self, items):
+        return list(items)[: self.max_items]
+
+
+class ContentSampler:
+    """
+    :param max_items: 最多抽取的条数，None 表示只受 token 预算限制
+    :param token_budget: 抽取内容的总 token 数上限，None 表示不限制
+    :param strata: 分层字段，"period" 表示按季度
+    :param diversity: MMR 中多样性的权重，0 时只看相关性
+    """
+
+    def __init__(
+        self,
+        max_items=None,
+        token_budget=None,
+        strata=("platform", "sentiment", "period"),
+        diversity=0.5,
+    ):
+        if max_items is None and token_budget is None:
+            raise ValueError("max_items 和 token_budget 至少需要指定一个")
+        self.max_items = max_items
+        self.token_budget = token_budget
+        self.strata = strata
+        self.diversity = diversity
+
+    def sample(self, items):
+        groups = defaultdict(list)
+        for item in items:
+            groups[_stratum(item, self.strata)].append(item)
+        # 各层的 MMR 排序是惰性的，只计算实际需要的部分
+        orderings = {key: self._mmr(group) for key, group in groups.items()}
+        taken = dict.fromkeys(groups, 0)
+
+        selected = []
+        used_tokens = 0
+        skipped = 0
+        while orderings and (self.max_items is None or len(selected) < self.max_items):
+            key = min(orderings, key=lambda k: (taken[k] / len(groups[k]), -len(groups[k])))
+            item = next(orderings[key], None)
+            if item is None:
+                del orderings[key]
+                continue
+            taken[key] += 1
+            if self.token_budget is not None:
+                tokens = count_tokens(item_text(item))
+                if used_tokens + tokens > self.token_budget:
+                    skipped += 1
+                    if skipped >= _MAX_CONSECUTIVE_SKIPS:
+                        break
+                    continue
+                used_tokens += tokens
+            skipped = 0
+            selected.append(item)
+        return selected
+
+    def _mmr(self, group):
+        texts = [item_text(item) or "" for item in group]
+        grams = [text_ngrams(text) for text in texts]
+        centroid = Counter(gram for item_grams in grams for gram in item_grams)
+        norm = math.sqrt(sum(count * count for count in centroid.values())) or 1.0
+        relevance = [
+            sum(centroid[g] for g in item_grams) / (norm * math.sqrt(len(item_grams)))
+            if item_grams
+            else 0.0
+            for item_grams in grams
+        ]
+        max_similarity = [0.0] * len(group)
+        remaining = set(range(len(group)))
+        seen_texts = set()
+        while remaining:
+            best = max(
+                remaining,
+                key=lambda i: (
+                    (1 - self.diversity) * relevance[i] - self.diversity * max_similarity[i],
+                    -i,
+                ),
+            )
+            remaining.discard(best)
+            if texts[best] in seen_texts:
+                continue
+            seen_texts.add(texts[best])
+            yield group[best]
+            for i in remaining:
+                union = len(grams[i] | grams[best])
+                if union:
+                    similarity = len(grams[i] & grams[best]) / union
+                    if similarity > max_similarity[i]:
+                        max_similarity[i] = similarity
+
+
+def _iter_analyzed_contents(corpora, sk_to_pk_map):
+    """
+    一次遍历全部分析结果，产出 (酒店, 内容记录, [(一级关键词, 二级关键词, 情感), ...], 酒店内容)
+
+    关键词与 build_keyword_content_map 原来的规则相同：只看与酒店相关的帖子及其全部回复，帖子内容为标题 + 正文；
+    酒店内容与 utils.get_huiting_content 相同：与酒店相关的非广告帖子的正文（不含标题），以及本身与酒店相关的回复，
+    不计入酒店内容时为 None
+    """
+    for platform, data in corpora.items():
+        for hotel in Corpus.coerce(data):
+            for post in hotel.posts:
+                nodes = [(post, post.full_content, post.content, not post.is_ad)] + [
+                    (reply, reply.content, reply.content, True)
+                    for reply in post.iter_replies()
+                ]
+                for node, content, body, not_ad in nodes:
+                    if not content:
+                        continue
+                    mentions = []
+                    if post.is_hotel_related and node.keywords_mentioned is not None:
+                        for mention in node.keywords_mentioned.secondary or []:
+                            keyword = (mention.keyword or "").strip()
+                            if keyword in sk_to_pk_map and mention.sentiment is not None:
+                                mentions.append(
+                                    (sk_to_pk_map[keyword], keyword, mention.sentiment.label)
+                                )
+                    is_hotel_content = bool(node.is_hotel_related) and not_ad
+                    if not mentions and not is_hotel_content:
+                        continue
+                    yield hotel.hotel, {
+                        "content": content,
+                        "platform": platform,
+                        "timestamp": node.timestamp,
+                    }, mentions, body if is_hotel_content else None
+
+
+def build_keyword_content_map(corpora):
+    """
+    由分析结果生成 extract_frequent_mentioned_words / extract_typical_reviews_by_primary_keyword 的输入
+
+    :param corpora: {平台名: Corpus 或 *_analyzed.json 格式的列表}
+    :return: {primary_keyword: {secondary_keyword: [{"content", "platform", "sentiment", "timestamp"}, ...]}}
+    """
+    keyword_content_map = defaultdict(lambda: defaultdict(list))
+    for _, record, mentions, _ in _iter_analyzed_contents(
+        corpora, Keywords.get_sk_to_pk_map()
+    ):
+        for pk, sk, sentiment in mentions:
+            keyword_content_map[pk][sk].append(dict(record, sentiment=sentiment))
+    return {pk: dict(sk_map) for pk, sk_map in keyword_content_map.items()}
+
+
+def build_hotel_content_maps(corpora, hotels=None):
+    """
+    一次遍历同时为所有酒店收集内容，替代逐个酒店重新遍历语料
+
+    :param hotels: 只收集这些酒店，None 表示全部
+    :return: {hotel: {"keywords": build_keyword_content_map 结构的字典,
+                      "contents": [与 utils.get_huiting_content 相同的酒店内容, ...]}}
+    """
+    hotel_maps = {}
+    for hotel, record, mentions, hotel_content in _iter_analyzed_contents(
+        corpora, Keywords.get_sk_to_pk_map()
+    ):
+        if hotels is not None and hotel not in hotels:
+            continue
+        hotel_map = hotel_maps.setdefault(hotel, {"keywords": {}, "contents": []})
+        for pk, sk, sentiment in mentions:
+            hotel_map["keywords"].setdefault(pk, {}).setdefault(sk, []).append(
+                dict(record, sentiment=sentiment)
+            )
+        if hotel_content is not None:
+            hotel_map["contents"].append(hotel_content)
+    return hotel_maps
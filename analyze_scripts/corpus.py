@@ -0,0 +1,583 @@
+"""
+紧凑的内存语料模型
+
+流水线中的数据原本以嵌套字典在各个阶段之间传递：
+``[{"hotel", "posts": [{"content", "timestamp", "link", "replies": [...]}]}]``。
+每个字典都要为字段名付出内存，写回结果时还要走 ``data[h]["posts"][p]["replies"][r]``
+这样的多级索引。本模块用 ``__slots__`` 类表示同样的数据：
+
+* 酒店名、关键词名通过 ``sys.intern`` 共享同一个字符串对象；
+* ``"%Y-%m-%d %H:%M"`` 格式的时间戳保存为自 1970-01-01 起的分钟数（int）；
+* 关键词情感保存为 ``Sentiment`` 枚举，``is_hotel_related`` / ``is_ad`` 压缩进 ``Flags``；
+* 无法放入上述字段的值（未知字段、非标准格式的值）原样保存在 ``extra`` 中，
+  因此 ``Corpus.from_json(data).to_json() == data`` 始终成立。
+
+用法：
+```
+corpus = Corpus.from_json(get_raw_data("analysis_result/xhs_analyzed.json"))
+for hotel, post in corpus.iter_posts():
+    post.is_hotel_related = True
+write_to_json(corpus.to_json(), path)
+```
+
+运行 ``python analyze_scripts/corpus.py`` 可以对比 16 家酒店规模的合成语料在两种表示下的内存占用。
+"""
+
+import re
+import sys
+from datetime import datetime, timedelta
+from enum import IntEnum, IntFlag
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+_EPOCH = datetime(1970, 1, 1)
+_ONE_MINUTE = timedelta(minutes=1)
+_TIMESTAMP_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2})")
+
+
+def encode_timestamp(value):
+    """
+    将 ``"%Y-%m-%d %H:%M"`` 格式的时间字符串转换为分钟数。
+    无法无损转换时返回 None（调用方应将原值放入 extra）。
+    """
+    if not isinstance(value, str):
+        return None
+    # 只接受补零的标准写法（strptime 也能接受 "2024-3-1 8:05"，但那样转换回来会变样）
+    match = _TIMESTAMP_RE.fullmatch(value)
+    if not match:
+        return None
+    try:
+        dt = datetime(*map(int, match.groups()))
+    except ValueError:
+        return None
+    return (dt - _EPOCH) // _ONE_MINUTE
+
+
+def decode_timestamp(minutes):
+    """将分钟数转换回 ``"%Y-%m-%d %H:%M"`` 格式的时间字符串。"""
+    if minutes is None:
+        return None
+    return (_EPOCH + timedelta(minutes=minutes)).strftime(TIMESTAMP_FORMAT)
+
+
+def timestamp_to_datetime(minutes):
+    if minutes is None:
+        return None
+    return _EPOCH + timedelta(minutes=minutes)
+
+
+class Sentiment(IntEnum):
+    NEGATIVE = -1
+    NEUTRAL = 0
+    POSITIVE = 1
+
+    @property
+    def label(self):
+        return self.name.lower()
+
+    @classmethod
+    def from_label(cls, label):
+        """``"positive"``/``"negative"``/``"neutral"`` -> Sentiment，其它值返回 None。"""
+        return _SENTIMENT_BY_LABEL.get(label) if isinstance(label, str) else None
+
+
+_SENTIMENT_BY_LABEL = {s.label: s for s in Sentiment}
+
+
+class Flags(IntFlag):
+    """
+    布尔分析结果。``*_SET`` 位表示该字段存在，用于区分“未分析”和 False。
+    对象上的 ``flags`` 字段以普通 int 保存：IntFlag 的位运算每次都会构造新的枚举对象，速度慢很多。
+    """
+
+    NONE = 0
+    HOTEL_RELATED_SET = 1
+    HOTEL_RELATED = 2
+    AD_SET = 4
+    AD = 8
+
+
+_HOTEL_RELATED_SET = Flags.HOTEL_RELATED_SET.value
+_HOTEL_RELATED = Flags.HOTEL_RELATED.value
+_AD_SET = Flags.AD_SET.value
+_AD = Flags.AD.value
+
+
+def _set_flag(flags, set_bit, value_bit, value):
+    flags &= ~(set_bit | value_bit)
+    if value is None:
+        return flags
+    flags |= set_bit
+    if value:
+        flags |= value_bit
+    return flags
+
+
+def _pop_str(d, key, extra):
+    """取出字符串字段；字段缺失返回 None，非字符串值（包括 null）放入 extra。"""
+    if key not in d:
+        return None
+    value = d[key]
+    if isinstance(value, str):
+        return value
+    extra[key] = value
+    return None
+
+
+def _pop_bool(d, key, extra):
+    if key not in d:
+        return None
+    value = d[key]
+    if isinstance(value, bool):
+        return value
+    extra[key] = value
+    return None
+
+
+def _pop_timestamp(d, key, extra):
+    if key not in d:
+        return None
+    value = d[key]
+    minutes = encode_timestamp(value)
+    if minutes is None:
+        extra[key] = value
+    return minutes
+
+
+class KeywordMention:
+    """``keywords_mentioned`` 中的一项：``{"keyword", "sentiment", "reason"}``"""
+
+    __slots__ = ("keyword", "sentiment", "reason", "extra")
+
+    def __init__(self, keyword=None, sentiment=None, reason=None, extra=None):
+        self.keyword = sys.intern(keyword) if keyword is not None else None
+        self.sentiment = sentiment
+        self.reason = reason
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, d):
+        if not isinstance(d, dict):
+            return cls(extra={None: d})
+        extra = {k: v for k, v in d.items() if k not in _MENTION_KEYS}
+        keyword = _pop_str(d, "keyword", extra)
+        sentiment = None
+        if "sentiment" in d:
+            sentiment = Sentiment.from_label(d["sentiment"])
+            if sentiment is None:
+                extra["sentiment"] = d["sentiment"]
+        reason = _pop_str(d, "reason", extra)
+        return cls(keyword, sentiment, reason, extra or None)
+
+    def to_dict(self):
+        if self.extra and None in self.extra:
+            return self.extra[None]
+        d = {}
+        if self.keyword is not None:
+            d["keyword"] = self.keyword
+        if self.sentiment is not None:
+            d["sentiment"] = self.sentiment.label
+        if self.reason is not None:
+            d["reason"] = self.reason
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+
+_MENTION_KEYS = ("keyword", "sentiment", "reason")
+
+
+class KeywordsMentioned:
+    """
+    ``keywords_mentioned`` 字段：一级、二级关键词列表。
+    列表为 None 表示原数据中没有该键（与空列表区分开）。
+    """
+
+    __slots__ = ("primary", "secondary", "extra")
+
+    def __init__(self, primary=None, secondary=None, extra=None):
+        self.primary = primary
+        self.secondary = secondary
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, d):
+        if not isinstance(d, dict):
+            return cls(extra={None: d})
+        extra = {}
+        lists = []
+        for key in ("primary_keyword", "secondary_keyword"):
+            value = d.get(key)
+            if key in d and isinstance(value, list):
+                lists.append([KeywordMention.from_dict(item) for item in value])
+            else:
+                if key in d:
+                    extra[key] = value
+                lists.append(None)
+        for k, v in d.items():
+            if k not in ("primary_keyword", "secondary_keyword"):
+                extra[k] = v
+        return cls(lists[0], lists[1], extra or None)
+
+    def to_dict(self):
+        if self.extra and None in self.extra:
+            return self.extra[None]
+        d = {}
+        if self.primary is not None:
+            d["primary_keyword"] = [m.to_dict() for m in self.primary]
+        if self.secondary is not None:
+            d["secondary_keyword"] = [m.to_dict() for m in self.secondary]
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+    def all(self):
+        """按一级、二级顺序返回所有关键词。"""
+        return (self.primary or []) + (self.secondary or [])
+
+
+class Reply:
+    __slots__ = (
+        "content",
+        "timestamp",
+        "flags",
+        "is_hotel_related_reason",
+        "keywords_mentioned",
+        "extra",
+    )
+
+    def __init__(self, content=None, timestamp=None):
+        self.content = content
+        self.timestamp = timestamp
+        self.flags = 0
+        self.is_hotel_related_reason = None
+        self.keywords_mentioned = None
+        self.extra = None
+
+    @property
+    def is_hotel_related(self):
+        return self._get_bool("is_hotel_related", _HOTEL_RELATED_SET, _HOTEL_RELATED)
+
+    @is_hotel_related.setter
+    def is_hotel_related(self, value):
+        self._set_bool(
+            "is_hotel_related", _HOTEL_RELATED_SET, _HOTEL_RELATED, value
+        )
+
+    def _get_bool(self, key, set_bit, value_bit):
+        if self.flags & set_bit:
+            return bool(self.flags & value_bit)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        return None
+
+    def _set_bool(self, key, set_bit, value_bit, value):
+        """写入布尔结果；LLM 返回的非布尔值原样保存在 extra 中，保证写回 JSON 时不丢失。"""
+        if self.extra and key in self.extra:
+            del self.extra[key]
+        if value is not None and not isinstance(value, bool):
+            self.flags = _set_flag(self.flags, set_bit, value_bit, None)
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+            return
+        self.flags = _set_flag(self.flags, set_bit, value_bit, value)
+
+    @property
+    def timestamp_str(self):
+        if self.extra and "timestamp" in self.extra:
+            return self.extra["timestamp"]
+        return decode_timestamp(self.timestamp)
+
+    @classmethod
+    def from_dict(cls, d):
+        extra = {k: v for k, v in d.items() if k not in _REPLY_KEYS}
+        reply = cls(_pop_str(d, "content", extra), _pop_timestamp(d, "timestamp", extra))
+        reply._load_analysis(d, extra)
+        reply.extra = extra or None
+        return reply
+
+    def _load_analysis(self, d, extra):
+        self.flags = _set_flag(
+            0,
+            _HOTEL_RELATED_SET,
+            _HOTEL_RELATED,
+            _pop_bool(d, "is_hotel_related", extra),
+        )
+        self.is_hotel_related_reason = _pop_str(d, "is_hotel_related_reason", extra)
+        if "keywords_mentioned" in d:
+            self.keywords_mentioned = KeywordsMentioned.from_dict(d["keywords_mentioned"])
+
+    def to_dict(self):
+        d = {}
+        if self.content is not None:
+            d["content"] = self.content
+        if self.timestamp is not None:
+            d["timestamp"] = decode_timestamp(self.timestamp)
+        self._dump_analysis(d)
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+    def _dump_analysis(self, d):
+        if self.flags & _HOTEL_RELATED_SET:
+            d["is_hotel_related"] = bool(self.flags & _HOTEL_RELATED)
+        if self.is_hotel_related_reason is not None:
+            d["is_hotel_related_reason"] = self.is_hotel_related_reason
+        if self.keywords_mentioned is not None:
+            d["keywords_mentioned"] = self.keywords_mentioned.to_dict()
+
+
+_REPLY_KEYS = (
+    "content",
+    "timestamp",
+    "is_hotel_related",
+    "is_hotel_related_reason",
+    "keywords_mentioned",
+)
+
+
+class Post(Reply):
+    __slots__ = ("title", "link", "note_id", "replies", "is_ad_reason")
+
+    def __init__(self, content=None, timestamp=None, link=None, note_id=None):
+        super().__init__(content, timestamp)
+        self.title = None
+        self.link = link
+        self.note_id = note_id
+        self.replies = []
+        self.is_ad_reason = None
+
+    @property
+    def is_ad(self):
+        return self._get_bool("is_ad", _AD_SET, _AD)
+
+    @is_ad.setter
+    def is_ad(self, value):
+        self._set_bool("is_ad", _AD_SET, _AD, value)
+
+    @property
+    def full_content(self):
+        """分析时使用的帖子内容：标题 + 换行 + 正文。"""
+        return (self.title or "") + "\n" + (self.content or "")
+
+    @classmethod
+    def from_dict(cls, d):
+        extra = {k: v for k, v in d.items() if k not in _POST_KEYS}
+        post = cls(
+            _pop_str(d, "content", extra),
+            _pop_timestamp(d, "timestamp", extra),
+            _pop_str(d, "link", extra),
+            _pop_str(d, "note_id", extra),
+        )
+        post.title = _pop_str(d, "title", extra)
+        replies = d.get("replies")
+        if isinstance(replies, list) and all(isinstance(r, dict) for r in replies):
+            post.replies = [Reply.from_dict(r) for r in replies]
+        elif "replies" in d:
+            extra["replies"] = replies
+            post.replies = None
+        else:
+            post.replies = None
+        post._load_analysis(d, extra)
+        post.flags = _set_flag(
+            post.flags, _AD_SET, _AD, _pop_bool(d, "is_ad", extra)
+        )
+        post.is_ad_reason = _pop_str(d, "is_ad_reason", extra)
+        post.extra = extra or None
+        return post
+
+    def to_dict(self):
+        d = {}
+        if self.title is not None:
+            d["title"] = self.title
+        if self.content is not None:
+            d["content"] = self.content
+        if self.timestamp is not None:
+            d["timestamp"] = decode_timestamp(self.timestamp)
+        if self.link is not None:
+            d["link"] = self.link
+        if self.replies is not None:
+            d["replies"] = [reply.to_dict() for reply in self.replies]
+        if self.note_id is not None:
+            d["note_id"] = self.note_id
+        if self.flags & _HOTEL_RELATED_SET:
+            d["is_hotel_related"] = bool(self.flags & _HOTEL_RELATED)
+        if self.is_hotel_related_reason is not None:
+            d["is_hotel_related_reason"] = self.is_hotel_related_reason
+        if self.flags & _AD_SET:
+            d["is_ad"] = bool(self.flags & _AD)
+        if self.is_ad_reason is not None:
+            d["is_ad_reason"] = self.is_ad_reason
+        if self.keywords_mentioned is not None:
+            d["keywords_mentioned"] = self.keywords_mentioned.to_dict()
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+    def iter_replies(self):
+        return iter(self.replies or ())
+
+
+_POST_KEYS = _REPLY_KEYS + (
+    "title",
+    "link",
+    "note_id",
+    "replies",
+    "is_ad",
+    "is_ad_reason",
+)
+
+
+class HotelPosts:
+    __slots__ = ("hotel", "posts", "extra")
+
+    def __init__(self, hotel, posts=None, extra=None):
+        self.hotel = sys.intern(hotel) if isinstance(hotel, str) else hotel
+        self.posts = posts if posts is not None else []
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, d):
+        extra = {k: v for k, v in d.items() if k not in ("hotel", "posts")}
+        return cls(
+            d.get("hotel"), [Post.from_dict(p) for p in d.get("posts", [])], extra or None
+        )
+
+    def to_dict(self):
+        d = {"hotel": self.hotel, "posts": [post.to_dict() for post in self.posts]}
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+
+class Corpus:
+    """按酒店分组的帖子集合，对应 ``*_analyzed.json`` / ``raw_data/*.json`` 的顶层列表。"""
+
+    __slots__ = ("hotels",)
+
+    def __init__(self, hotels=None):
+        self.hotels = hotels if hotels is not None else []
+
+    @classmethod
+    def from_json(cls, data):
+        return cls([HotelPosts.from_dict(hotel) for hotel in data or []])
+
+    @classmethod
+    def coerce(cls, data):
+        """接受 Corpus 或 JSON 列表，统一返回 Corpus。"""
+        if isinstance(data, Corpus):
+            return data
+        return cls.from_json(data)
+
+    def to_json(self):
+        return [hotel.to_dict() for hotel in self.hotels]
+
+    def __iter__(self):
+        return iter(self.hotels)
+
+    def __len__(self):
+        return len(self.hotels)
+
+    def __getitem__(self, index):
+        return self.hotels[index]
+
+    def extend(self, other):
+        self.hotels.extend(Corpus.coerce(other).hotels)
+
+    def get_hotel(self, hotel_name):
+        for hotel in self.hotels:
+            if hotel.hotel == hotel_name:
+                return hotel
+        return None
+
+    def iter_posts(self):
+        """产出 ``(hotel_name, post)``。"""
+        for hotel in self.hotels:
+            for post in hotel.posts:
+                yield hotel.hotel, post
+
+    def iter_replies(self):
+        """产出 ``(hotel_name, post, reply)``。"""
+        for hotel in self.hotels:
+            for post in hotel.posts:
+                for reply in post.iter_replies():
+                    yield hotel.hotel, post, reply
+
+
+def measure_memory(hotels=16, posts_per_hotel=500, replies_per_post=8):
+    """构造合成语料，分别测量 JSON 字典表示和 Corpus 表示常驻内存的大小。"""
+    import json
+    import random
+    import tracemalloc
+
+    random.seed(0)
+    sentiments = ["positive", "negative", "neutral"]
+    keywords = [f"关键词{i}Keyword {i}" for i in range(60)]
+
+    def mentions():
+        return {
+            "primary_keyword": [
+                {"keyword": random.choice(keywords), "sentiment": random.choice(sentiments), "reason": "原因"}
+            ],
+            "secondary_keyword": [
+                {"keyword": random.choice(keywords), "sentiment": random.choice(sentiments), "reason": "原因"}
+                for _ in range(2)
+            ],
+        }
+
+    def stamp():
+        return decode_timestamp(28_500_000 + random.randint(0, 500_000))
+
+    data = [
+        {
+            "hotel": f"酒店{h}",
+            "posts": [
+                {
+                    "content": f"帖子内容{h}-{p}",
+                    "timestamp": stamp(),
+                    "link": f"https://example.com/{h}/{p}",
+                    "replies": [
+                        {
+                            "content": f"回复{r}",
+                            "timestamp": stamp(),
+                            "is_hotel_related": True,
+                            "is_hotel_related_reason": "相关",
+                            "keywords_mentioned": mentions(),
+                        }
+                        for r in range(replies_per_post)
+                    ],
+                    "is_hotel_related": True,
+                    "is_hotel_related_reason": "相关",
+                    "is_ad": False,
+                    "is_ad_reason": "非广告",
+                    "keywords_mentioned": mentions(),
+                }
+                for p in range(posts_per_hotel)
+            ],
+        }
+        for h in range(hotels)
+    ]
+    # 与从文件读取的情形一致：字符串都是 json.loads 新建的对象，没有共享
+    text = json.dumps(data, ensure_ascii=False)
+    del data
+
+    tracemalloc.start()
+    loaded = json.loads(text)
+    dict_size, dict_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    corpus = Corpus.from_json(json.loads(text))
+    corpus_size, corpus_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert corpus.to_json() == loaded
+    mb = 1024 * 1024
+    print(f"语料规模: {hotels} 家酒店, {hotels * posts_per_hotel} 帖子, "
+          f"{hotels * posts_per_hotel * replies_per_post} 回复")
+    print(f"JSON 字典常驻内存: {dict_size / mb:8.1f} MB (峰值 {dict_peak / mb:.1f} MB)")
+    print(f"Corpus 常驻内存:   {corpus_size / mb:8.1f} MB (转换期间峰值 {corpus_peak / mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    measure_memory()
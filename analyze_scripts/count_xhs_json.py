@@ -48,6 +48,8 @@ import sys
 from pathlib import Path
 from typing import Sequence, Mapping, Any, Tuple
 
+from comment_tree import any_comment_contains, is_empty_comment, walk_comments
+
 
 # ------------------------------------------------------------
 # Helpers
@@ -55,16 +57,13 @@ from typing import Sequence, Mapping, Any, Tuple
 
 
 def recursive_count(replies: Sequence[Mapping[str, Any]], *, skip_empty: bool) -> int:
-    """递归统计 ``sub_comments``。当 ``skip_empty`` 为 True 时，忽略空文本评论。"""
+    """统计 ``sub_comments`` 数量。当 ``skip_empty`` 为 True 时，空文本评论的直接子评论不计数。"""
     total = 0
-    for r in replies:
-        # 条件 4：跳过空字符串评论
-        if skip_empty and not r.get("comment_text", "").strip():
-            # 仍需深入其 sub_comments，以防有有效回复嵌套其中
-            total += recursive_count(r.get("sub_comments", []), skip_empty=skip_empty)
+    for _, r in walk_comments(replies):
+        # 条件 4：跳过空字符串评论，但仍需深入其 sub_comments，以防有有效回复嵌套其中
+        if skip_empty and is_empty_comment(r):
             continue
-        sub = r.get("sub_comments", [])
-        total += len(sub) + recursive_count(sub, skip_empty=skip_empty)
+        total += len(r.get("sub_comments", []))
     return total
 
 
@@ -91,10 +90,9 @@ def note_passes_strict_rules(
         body = note.get("body", "").lower()
         if keyword_lower in title or keyword_lower in body:
             return False, True, False
-        # 搜索评论文本
-        for c in note.get("comments", []):
-            if comment_contains_keyword(c, keyword_lower):
-                return False, True, False
+        # 搜索评论文本（找到即停止）
+        if any_comment_contains(note.get("comments", []), keyword_lower):
+            return False, True, False
         # 未找到关键词 ⇒ 跳过
         return True, False, False
 
@@ -103,11 +101,7 @@ def note_passes_strict_rules(
 
 
 def comment_contains_keyword(comment: Mapping[str, Any], kw: str) -> bool:
-    if kw in comment.get("comment_text", "").lower():
-        return True
-    return any(
-        comment_contains_keyword(child, kw) for child in comment.get("sub_comments", [])
-    )
+    return any_comment_contains((comment,), kw)
 
 
 # ------------------------------------------------------------
@@ -1,15 +1,21 @@
 """
 用于统计分析后的数据的酒店总buzz，一级关键词和二级关键词的情感分布和情感得分，运行该脚本会在analysis_result文件夹下生成data_count.xlsx文件
+
+统计结果（酒店 × 关键词 × 情感的计数）持久化在 analysis_result/data_count_state.json 中：
+merge_data 合并新的分析结果时通过 on_added=apply_analyzed_delta 只累加新帖子，并记录有变化的酒店；
+refresh_excel 只重新生成这些酒店的sheet，不再重新读取全部分析结果
 """
 
-from openpyxl import Workbook
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 from utils import *
+from corpus import Corpus
 import pandas as pd
 import json  # Ensure json is imported
 from openpyxl import Workbook  # For creating new Excel files
-from openpyxl.utils.dataframe import (
-    dataframe_to_rows,
-)  # For writing dataframes to sheets
 
 
 def caculate_sentiment_distribution(sentiment_distribution):
@@ -28,12 +34,21 @@ def caculate_sentiment_distribution(sentiment_distribution):
     return {"totalBuzz": total_buzz, "sentimentScorePercent": sentiment_score_percent}
 
 
+def _iter_valid_mentions(node):
+    """产出帖子/回复中关键词非空、情感为 positive/negative/neutral 的关键词"""
+    if node.keywords_mentioned is None:
+        return
+    for mention in node.keywords_mentioned.all():
+        if mention.keyword and mention.keyword.strip() and mention.sentiment is not None:
+            yield mention
+
+
 def compile_keywords_for_analyzed_data(analyzed_data):
     """
     统计每个酒店每个关键词的情感分布以及每个酒店的buzz数量
+    analyzed_data 可以是 Corpus 或 *_analyzed.json 格式的列表
     """
     sk_to_pk_map = Keywords.get_sk_to_pk_map()
-    valid_sentiments = ["positive", "negative", "neutral"]
     compiled_data = {}
 
     initialSentimentDistribution = {}
@@ -50,8 +65,9 @@ def compile_keywords_for_analyzed_data(analyzed_data):
                 "neutral": 0,
             }
 
-    for hotel_entry in analyzed_data:
-        hotel_name = hotel_entry["hotel"]
+    primary_keywords = set(sk_to_pk_map.values())
+    for hotel_entry in Corpus.coerce(analyzed_data):
+        hotel_name = hotel_entry.hotel
         if not compiled_data.get(hotel_name):
             compiled_data[hotel_name] = {
                 "buzz": 0,
@@ -59,176 +75,202 @@ def compile_keywords_for_analyzed_data(analyzed_data):
                     json.dumps(initialSentimentDistribution)
                 ),
             }
-        for post in hotel_entry["posts"]:
-            if not post.get("is_hotel_related", False):
+        distribution = compiled_data[hotel_name]["keywords_sentiment_distribution"]
+        for post in hotel_entry.posts:
+            if not post.is_hotel_related:
                 continue
             compiled_data[hotel_name]["buzz"] += 1
 
-            replies = post.get("replies", [])
+            replies = post.replies or []
             replies_count = len(replies)
             compiled_data[hotel_name]["buzz"] += replies_count
 
             # 处理帖子本身
-            primary_keywords = post.get("keywords_mentioned", {}).get(
-                "primary_keyword", []
-            )
-            secondary_keywords = post.get("keywords_mentioned", {}).get(
-                "secondary_keyword", []
-            )
-            for keyword_dict in primary_keywords + secondary_keywords:
-                keyword = keyword_dict.get("keyword", "").strip()
-                sentiment = keyword_dict.get("sentiment", "")
-                if not keyword or sentiment not in valid_sentiments:
-                    continue
-                compiled_data[hotel_name]["keywords_sentiment_distribution"][keyword][
-                    sentiment
-                ] += (1 + replies_count)
+            for mention in _iter_valid_mentions(post):
+                keyword = mention.keyword.strip()
+                sentiment = mention.sentiment.label
+                distribution[keyword][sentiment] += 1 + replies_count
                 # 如果是二级关键词，则对应的一级关键词也要加上
-                if not Keywords.is_primary_keyword(keyword):
+                if keyword not in primary_keywords:
                     pk = sk_to_pk_map[keyword]
-                    compiled_data[hotel_name]["keywords_sentiment_distribution"][pk][
-                        sentiment
-                    ] += (1 + replies_count)
+                    distribution[pk][sentiment] += 1 + replies_count
 
             # 处理帖子回复
             for reply in replies:
-                reply_keywords = reply.get("keywords_mentioned", {}).get(
-                    "primary_keyword", []
-                ) + reply.get("keywords_mentioned", {}).get("secondary_keyword", [])
-                for keyword_dict in reply_keywords:
-                    keyword = keyword_dict.get("keyword", "").strip()
-                    sentiment = keyword_dict.get("sentiment", "")
-                    if not keyword or sentiment not in valid_sentiments:
-                        continue
-                    compiled_data[hotel_name]["keywords_sentiment_distribution"][
-                        keyword
-                    ][sentiment] += 1
+                for mention in _iter_valid_mentions(reply):
+                    keyword = mention.keyword.strip()
+                    sentiment = mention.sentiment.label
+                    distribution[keyword][sentiment] += 1
                     # 如果是二级关键词，则对应的一级关键词也要加上
-                    if not Keywords.is_primary_keyword(keyword):
+                    if keyword not in primary_keywords:
                         pk = sk_to_pk_map[keyword]
-                        compiled_data[hotel_name]["keywords_sentiment_distribution"][
-                            pk
-                        ][sentiment] += 1
+                        distribution[pk][sentiment] += 1
     return compiled_data
 
 
-def generate_excel_for_compiled_data(compiled_data, excel_file_path):
-    """
-    生成excel表格
-    """
-    # 创建Excel工作簿
-    wb = Workbook()
-    # 删除默认创建的sheet
-    if "Sheet" in wb.sheetnames:
-        wb.remove(wb["Sheet"])
-
-    column_order = [
-        "酒店声量",
-        "一级关键词",
-        "一级正面",
-        "一级中立",
-        "一级负面",
-        "一级关键词情感得分",
-        "二级关键词",
-        "二级正面",
-        "二级中立",
-        "二级负面",
-        "二级关键词情感得分",
-    ]
+COLUMN_ORDER = [
+    "酒店声量",
+    "一级关键词",
+    "一级正面",
+    "一级中立",
+    "一级负面",
+    "一级关键词情感得分",
+    "二级关键词",
+    "二级正面",
+    "二级中立",
+    "二级负面",
+    "二级关键词情感得分",
+]
+BENCHMARK_SHEETS = ("行业对比", "行业分位数")
+# 一个酒店的表格约 0.15ms，进程间传输的开销与之相当，进程池启动约 20ms，
+# 酒店数达到该值时 build_hotel_tables 默认才使用进程池
+PARALLEL_MIN_HOTELS = 1000
 
-    sk_to_pk_map = Keywords.get_sk_to_pk_map()
 
-    for hotel_name, hotel_data in compiled_data.items():
-        pk_data = []
-        sk_data = {}
-        hotel_buzz = hotel_data.get("buzz", 0)
-        keywords_sentiment_distribution = hotel_data.get(
-            "keywords_sentiment_distribution", {}
+def _hotel_rows(hotel_data, sk_to_pk_map):
+    """一个酒店的sheet中的行数据"""
+    pk_data = []
+    sk_data = {}
+    hotel_buzz = hotel_data.get("buzz", 0)
+    keywords_sentiment_distribution = hotel_data.get(
+        "keywords_sentiment_distribution", {}
+    )
+    # 收集一级关键词和二级关键词
+    for keyword, sentiment_distribution in keywords_sentiment_distribution.items():
+        if Keywords.is_primary_keyword(keyword):
+            pk_data.append(
+                {
+                    "keyword": keyword,
+                    "sentiment_distribution": sentiment_distribution,
+                }
+            )
+        else:
+            pk = sk_to_pk_map.get(keyword)
+            if not sk_data.get(pk):
+                sk_data[pk] = []
+            sk_data[pk].append(
+                {
+                    "keyword": keyword,
+                    "sentiment_distribution": sentiment_distribution,
+                }
+            )
+
+    hotel_specific_rows = []  # 用于存储当前酒店的行数据
+    for pk_dict in sorted(pk_data, key=lambda x: x["keyword"]):
+        pk_name = pk_dict["keyword"]
+        pk_sentiment = pk_dict["sentiment_distribution"]
+        pk_score = caculate_sentiment_distribution(pk_sentiment).get(
+            "sentimentScorePercent", 0
         )
-        # 收集一级关键词和二级关键词
-        for keyword, sentiment_distribution in keywords_sentiment_distribution.items():
-            if Keywords.is_primary_keyword(keyword):
-                pk_data.append(
-                    {
-                        "keyword": keyword,
-                        "sentiment_distribution": sentiment_distribution,
-                    }
-                )
-            else:
-                pk = sk_to_pk_map.get(keyword)
-                if not sk_data.get(pk):
-                    sk_data[pk] = []
-                sk_data[pk].append(
-                    {
-                        "keyword": keyword,
-                        "sentiment_distribution": sentiment_distribution,
-                    }
-                )
+        row_data_pk = {
+            "酒店声量": hotel_buzz,
+            "一级关键词": pk_name,
+            "一级正面": pk_sentiment.get("positive", 0),
+            "一级中立": pk_sentiment.get("neutral", 0),
+            "一级负面": pk_sentiment.get("negative", 0),
+            "一级关键词情感得分": f"{pk_score:.2f}%",
+            "二级关键词": "",
+            "二级正面": "",
+            "二级中立": "",
+            "二级负面": "",
+            "二级关键词情感得分": "",
+        }
+        hotel_specific_rows.append(row_data_pk)
 
-        hotel_specific_rows = []  # 用于存储当前酒店的行数据
-        for pk_dict in sorted(pk_data, key=lambda x: x["keyword"]):
-            pk_name = pk_dict["keyword"]
-            pk_sentiment = pk_dict["sentiment_distribution"]
-            pk_score = caculate_sentiment_distribution(pk_sentiment).get(
+        for sk_dict in sorted(sk_data.get(pk_name, []), key=lambda x: x["keyword"]):
+            sk_name = sk_dict["keyword"]
+            sk_sentiment = sk_dict["sentiment_distribution"]
+            sk_score = caculate_sentiment_distribution(sk_sentiment).get(
                 "sentimentScorePercent", 0
             )
-            row_data_pk = {
+            row_data_sk = {
                 "酒店声量": hotel_buzz,
                 "一级关键词": pk_name,
                 "一级正面": pk_sentiment.get("positive", 0),
                 "一级中立": pk_sentiment.get("neutral", 0),
                 "一级负面": pk_sentiment.get("negative", 0),
                 "一级关键词情感得分": f"{pk_score:.2f}%",
-                "二级关键词": "",
-                "二级正面": "",
-                "二级中立": "",
-                "二级负面": "",
-                "二级关键词情感得分": "",
+                "二级关键词": sk_name,
+                "二级正面": sk_sentiment.get("positive", 0),
+                "二级中立": sk_sentiment.get("neutral", 0),
+                "二级负面": sk_sentiment.get("negative", 0),
+                "二级关键词情感得分": f"{sk_score:.2f}%",
             }
-            hotel_specific_rows.append(row_data_pk)
+            hotel_specific_rows.append(row_data_sk)
+    return hotel_specific_rows
 
-            for sk_dict in sorted(sk_data.get(pk_name, []), key=lambda x: x["keyword"]):
-                sk_name = sk_dict["keyword"]
-                sk_sentiment = sk_dict["sentiment_distribution"]
-                sk_score = caculate_sentiment_distribution(sk_sentiment).get(
-                    "sentimentScorePercent", 0
-                )
-                row_data_sk = {
-                    "酒店声量": hotel_buzz,
-                    "一级关键词": pk_name,
-                    "一级正面": pk_sentiment.get("positive", 0),
-                    "一级中立": pk_sentiment.get("neutral", 0),
-                    "一级负面": pk_sentiment.get("negative", 0),
-                    "一级关键词情感得分": f"{pk_score:.2f}%",
-                    "二级关键词": sk_name,
-                    "二级正面": sk_sentiment.get("positive", 0),
-                    "二级中立": sk_sentiment.get("neutral", 0),
-                    "二级负面": sk_sentiment.get("negative", 0),
-                    "二级关键词情感得分": f"{sk_score:.2f}%",
-                }
-                hotel_specific_rows.append(row_data_sk)
 
-        if not hotel_specific_rows:  # 如果当前酒店没有数据
-            # 创建一个带表头的空sheet
-            df = pd.DataFrame(columns=column_order)  # type: ignore
-        else:
-            df = pd.DataFrame(hotel_specific_rows)
-            # 检查df是否为空，以及是否包含所有column_order中的列
-            if not df.empty and all(col in df.columns for col in column_order):
-                df = df[column_order]
+def _hotel_table(job):
+    """一个酒店sheet的表格（不含表头），只依赖传入的数据，可以在子进程中执行"""
+    hotel_name, hotel_data, sk_to_pk_map = job
+    rows = _hotel_rows(hotel_data, sk_to_pk_map)
+    return hotel_name, [[row.get(col) for col in COLUMN_ORDER] for row in rows]
+
+
+def build_hotel_tables(compiled_data, hotels=None, max_workers=None):
+    """
+    生成各酒店sheet的表格，酒店数达到 PARALLEL_MIN_HOTELS 时在多个进程中并行生成
+
+    :param hotels: 只生成这些酒店，None 表示全部
+    :param max_workers: 进程数，为 1 时在当前进程中依次生成；
+                        None 时酒店数少于 PARALLEL_MIN_HOTELS 在当前进程中生成，否则使用 CPU 核数
+    :return: {酒店: 表格}，顺序与 hotels 相同
+    """
+    sk_to_pk_map = Keywords.get_sk_to_pk_map()
+    hotels = list(compiled_data) if hotels is None else list(hotels)
+    jobs = [(hotel, compiled_data[hotel], sk_to_pk_map) for hotel in hotels]
+    if max_workers is None:
+        max_workers = 1 if len(jobs) < PARALLEL_MIN_HOTELS else os.cpu_count() or 1
+    max_workers = min(max_workers, len(jobs))
+    if max_workers <= 1:
+        return dict(map(_hotel_table, jobs))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # 每个进程一次处理多个酒店，减少进程间传输的次数
+        chunksize = max(1, len(jobs) // (max_workers * 4))
+        return dict(executor.map(_hotel_table, jobs, chunksize=chunksize))
+
+
+def _write_hotel_sheet(wb, hotel_name, table, index=None):
+    ws = wb.create_sheet(title=hotel_name, index=index)
+    ws.append(COLUMN_ORDER)
+    for row in table:
+        ws.append(row)
 
-        # 创建新的sheet
-        ws = wb.create_sheet(title=hotel_name)
 
-        # 写入表头
-        ws.append(column_order)
+def _write_benchmark_sheets(wb, benchmark):
+    from competitive_benchmark import excel_rows, industry_percentiles
 
-        # 写入数据
-        for r_idx, row in enumerate(
-            dataframe_to_rows(df, index=False, header=False), 2
-        ):
-            for c_idx, value in enumerate(row, 1):
-                ws.cell(row=r_idx, column=c_idx, value=value)
+    comparison = excel_rows(benchmark)
+    ws = wb.create_sheet(title=BENCHMARK_SHEETS[0])
+    ws.append(list(comparison.columns))
+    for row in comparison.itertuples(index=False):
+        ws.append(list(row))
+
+    percentiles = industry_percentiles(benchmark).round(2)
+    ws = wb.create_sheet(title=BENCHMARK_SHEETS[1])
+    ws.append(["关键词"] + list(percentiles.columns))
+    for keyword, row in percentiles.iterrows():
+        ws.append([keyword] + [None if pd.isna(v) else v for v in row])
+
+
+def generate_excel_for_compiled_data(
+    compiled_data, excel_file_path, benchmark=None, max_workers=None
+):
+    """
+    生成excel表格，各酒店的表格由 build_hotel_tables 生成
+
+    :param benchmark: competitive_benchmark.benchmark_frame 的结果，提供时额外写入“行业对比”和“行业分位数”两个sheet
+    :param max_workers: 生成表格的进程数，见 build_hotel_tables
+    """
+    tables = build_hotel_tables(compiled_data, max_workers=max_workers)
+
+    # 所有sheet在同一个工作簿中一次写入，write_only 模式下逐行写出，不在内存中保留单元格对象
+    wb = Workbook(write_only=True)
+    for hotel_name, table in tables.items():
+        _write_hotel_sheet(wb, hotel_name, table)
+
+    if benchmark is not None:
+        _write_benchmark_sheets(wb, benchmark)
 
     wb.save(excel_file_path)
 
@@ -237,22 +279,216 @@ def get_all_analyzed_data(file_paths):
     """
     读取所有的analyzed_data
     """
-    all_analyzed_data = []
+    all_analyzed_data = Corpus()
     for file_path in file_paths:
         data = get_raw_data(file_path)
         if data:
-            all_analyzed_data.extend(data)
+            all_analyzed_data.extend(Corpus.from_json(data))
     return all_analyzed_data
 
 
-if __name__ == "__main__":
-    file_paths = [
-        "analysis_result/flyert_analyzed.json",
-        "analysis_result/wb_analyzed.json",
-        "analysis_result/xhs_analyzed.json",
+AGGREGATE_STATE_PATH = "analysis_result/data_count_state.json"
+ANALYZED_FILE_PATHS = [
+    "analysis_result/flyert_analyzed.json",
+    "analysis_result/wb_analyzed.json",
+    "analysis_result/xhs_analyzed.json",
+]
+
+
+def merge_compiled_data(compiled_data, delta):
+    """把 delta（只包含新帖子的统计结果）累加到 compiled_data 中，返回有变化的酒店"""
+    changed = set()
+    for hotel_name, hotel_delta in delta.items():
+        hotel_data = compiled_data.setdefault(
+            hotel_name, {"buzz": 0, "keywords_sentiment_distribution": {}}
+        )
+        hotel_data["buzz"] += hotel_delta["buzz"]
+        distribution = hotel_data["keywords_sentiment_distribution"]
+        for keyword, counts in hotel_delta["keywords_sentiment_distribution"].items():
+            target = distribution.setdefault(
+                keyword, {"positive": 0, "negative": 0, "neutral": 0}
+            )
+            for sentiment, count in counts.items():
+                target[sentiment] = target.get(sentiment, 0) + count
+        if hotel_delta["buzz"]:
+            changed.add(hotel_name)
+    return changed
+
+
+def _file_signature(path):
+    """与 content_index.ContentIndex.sync 相同，用修改时间和大小判断文件是否变化"""
+    if not os.path.exists(path):
+        return ""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _stale_sources(state, file_paths=ANALYZED_FILE_PATHS, exclude=()):
+    """上次统计后被其它方式修改过的分析结果文件"""
+    sources = state.get("sources", {})
+    return [
+        path
+        for path in file_paths
+        if path not in exclude and sources.get(path) != _file_signature(path)
     ]
+
+
+def rebuild_aggregate_state(
+    file_paths=ANALYZED_FILE_PATHS, state_path=AGGREGATE_STATE_PATH
+):
+    """从全部分析结果重新统计，所有酒店都标记为需要重新生成sheet"""
+    compiled_data = compile_keywords_for_analyzed_data(get_all_analyzed_data(file_paths))
+    state = {
+        "compiled_data": compiled_data,
+        "dirty": sorted(compiled_data),
+        "sources": {path: _file_signature(path) for path in file_paths},
+    }
+    write_to_json(state, state_path)
+    return state
+
+
+def load_aggregate_state(file_paths=ANALYZED_FILE_PATHS, state_path=AGGREGATE_STATE_PATH):
+    """读取统计结果；不存在，或者分析结果文件在上次统计后有变化时，完整重新统计"""
+    state = get_raw_data(state_path) if os.path.exists(state_path) else None
+    if not state:
+        print("统计结果不存在，从分析结果完整统计")
+        return rebuild_aggregate_state(file_paths, state_path)
+    stale = _stale_sources(state, file_paths)
+    if stale:
+        print(f"{', '.join(stale)} 在上次统计后有变化，从分析结果完整统计")
+        return rebuild_aggregate_state(file_paths, state_path)
+    return state
+
+
+def apply_analyzed_delta(
+    new_analyzed_data, state_path=AGGREGATE_STATE_PATH, source_path=None
+):
+    """
+    把新合并进分析结果的帖子累加到持久化的统计结果中，作为 merge_data 的 on_added 回调使用
+
+    统计结果不存在、或其它分析结果文件有变化时，从分析结果文件完整统计一次（此时文件中已经包含这些新帖子）。
+    source_path 本身在合并前是否被修改过无法在这里判断，调用方应在合并前先 load_aggregate_state
+
+    :param source_path: merge_data 写入的文件，累加后记录其新的修改时间和大小
+    """
+    state = get_raw_data(state_path) if os.path.exists(state_path) else None
+    stale = _stale_sources(state, exclude=(source_path,)) if state else None
+    if not state or stale:
+        print("统计结果不存在或分析结果文件有变化，从分析结果完整统计")
+        return rebuild_aggregate_state(state_path=state_path)
+    changed = merge_compiled_data(
+        state["compiled_data"], compile_keywords_for_analyzed_data(new_analyzed_data)
+    )
+    state["dirty"] = sorted(set(state.get("dirty", [])) | changed)
+    if source_path:
+        state.setdefault("sources", {})[source_path] = _file_signature(source_path)
+    write_to_json(state, state_path)
+    print(f"统计结果已更新，{len(changed)} 个酒店有新数据")
+    return state
+
+
+def refresh_excel(
+    excel_file_path, state_path=AGGREGATE_STATE_PATH, benchmark=True, max_workers=None
+):
+    """
+    只重新生成有新数据的酒店的sheet；工作簿不存在时完整生成；分析结果文件被其它方式修改过时先完整重新统计。
+    行业对比依赖所有酒店，有任何酒店变化时由统计结果重新计算（不需要重新读取分析结果）
+    """
+    from openpyxl import load_workbook
+
+    state = load_aggregate_state(state_path=state_path)
+    compiled_data = state["compiled_data"]
+    dirty = [hotel for hotel in state.get("dirty", []) if hotel in compiled_data]
+
+    benchmark_frame = None
+    # 工作簿不存在时完整生成，同样需要行业对比
+    if benchmark and (dirty or not os.path.exists(excel_file_path)):
+        from competitive_benchmark import benchmark_frame as build_benchmark_frame
+
+        benchmark_frame = build_benchmark_frame(compiled_data)
+
+    if not os.path.exists(excel_file_path):
+        generate_excel_for_compiled_data(
+            compiled_data, excel_file_path, benchmark_frame, max_workers
+        )
+    elif dirty:
+        tables = build_hotel_tables(compiled_data, dirty, max_workers=max_workers)
+        wb = load_workbook(excel_file_path)
+        for hotel_name, table in tables.items():
+            index = None
+            if hotel_name in wb.sheetnames:
+                index = wb.sheetnames.index(hotel_name)
+                wb.remove(wb[hotel_name])
+            elif any(name in wb.sheetnames for name in BENCHMARK_SHEETS):
+                # 新酒店的sheet放在行业对比之前
+                index = min(
+                    wb.sheetnames.index(name)
+                    for name in BENCHMARK_SHEETS
+                    if name in wb.sheetnames
+                )
+            _write_hotel_sheet(wb, hotel_name, table, index)
+        if benchmark_frame is not None:
+            for name in BENCHMARK_SHEETS:
+                if name in wb.sheetnames:
+                    wb.remove(wb[name])
+            _write_benchmark_sheets(wb, benchmark_frame)
+        wb.save(excel_file_path)
+
+    print(f"重新生成了 {len(dirty)} 个酒店的sheet: {', '.join(dirty)}")
+    state["dirty"] = []
+    write_to_json(state, state_path)
+    return dirty
+
+
+def benchmark_excel(
+    hotel_count=50, excel_file_path="analysis_result/data_count_benchmark.xlsx", seed=0
+):
+    """
+    用随机生成的 hotel_count 个酒店的统计结果，对比依次生成和并行生成工作簿的耗时
+
+    :return: {"sequential": 秒, "parallel": 秒}
+    """
+    rng = random.Random(seed)
+    sk_to_pk_map = Keywords.get_sk_to_pk_map()
+    keywords = list(sk_to_pk_map) + sorted(set(sk_to_pk_map.values()))
+    compiled_data = {
+        f"酒店{i:02d}": {
+            "buzz": rng.randint(100, 10000),
+            "keywords_sentiment_distribution": {
+                keyword: {
+                    sentiment: rng.randint(0, 50)
+                    for sentiment in ("positive", "neutral", "negative")
+                }
+                for keyword in keywords
+            },
+        }
+        for i in range(hotel_count)
+    }
+    timings = {}
+    for name, max_workers in (("sequential", 1), ("parallel", 4)):
+        start = time.perf_counter()
+        generate_excel_for_compiled_data(
+            compiled_data, excel_file_path, max_workers=max_workers
+        )
+        timings[name] = time.perf_counter() - start
+        print(f"{name}: {hotel_count} 个sheet，耗时 {timings[name]:.2f}s")
+    os.remove(excel_file_path)
+    return timings
+
+
+if __name__ == "__main__":
+    # python data_count.py            完整统计并生成
+    # python data_count.py refresh    只重新生成有新数据的酒店的sheet
+    # python data_count.py benchmark  对比依次生成和并行生成 50 个sheet 的耗时
     excel_file_path = "analysis_result/data_count.xlsx"
-    analyzed_data = get_all_analyzed_data(file_paths)
-    compiled_data = compile_keywords_for_analyzed_data(analyzed_data)
-    generate_excel_for_compiled_data(compiled_data, excel_file_path)
+    if sys.argv[1:] == ["benchmark"]:
+        benchmark_excel()
+        sys.exit(0)
+    if sys.argv[1:] == ["refresh"]:
+        refresh_excel(excel_file_path)
+    else:
+        rebuild_aggregate_state()
+        if os.path.exists(excel_file_path):
+            os.remove(excel_file_path)
+        refresh_excel(excel_file_path)
     print(f"统计结果已保存在{excel_file_path}")
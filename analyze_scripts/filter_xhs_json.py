@@ -38,6 +38,8 @@ import copy  # For deepcopy
 from pathlib import Path
 from typing import Sequence, Mapping, Any, Tuple, List, Dict, Optional
 
+from comment_tree import any_comment_contains, is_empty_comment, walk_comments
+
 # ------------------------------------------------------------
 # Helpers (adapted from count_xhs_json.py)
 # ------------------------------------------------------------
@@ -45,12 +47,7 @@ from typing import Sequence, Mapping, Any, Tuple, List, Dict, Optional
 
 def comment_contains_keyword(comment: Mapping[str, Any], kw_lower: str) -> bool:
     """检查评论及其子评论是否包含关键词（大小写不敏感）。"""
-    if kw_lower in comment.get("comment_text", "").lower():
-        return True
-    return any(
-        comment_contains_keyword(child, kw_lower)
-        for child in comment.get("sub_comments", [])
-    )
+    return any_comment_contains((comment,), kw_lower)
 
 
 def note_passes_strict_rules(
@@ -82,14 +79,13 @@ def note_passes_strict_rules(
         if keyword_lower in title or keyword_lower in body:
             return False, True, False  # Keep, has keyword, not placeholder
 
-        # 关键词不在标题或正文，则搜索评论文本
-        for c in note.get("comments", []):
-            if comment_contains_keyword(c, keyword_lower):
-                return (
-                    False,
-                    True,
-                    False,
-                )  # Keep, has keyword (in comments), not placeholder
+        # 关键词不在标题或正文，则搜索评论文本（找到即停止）
+        if any_comment_contains(note.get("comments", []), keyword_lower):
+            return (
+                False,
+                True,
+                False,
+            )  # Keep, has keyword (in comments), not placeholder
 
         # 未找到关键词 (且关键词被指定) ⇒ 跳过
         return True, False, False  # Skip, no keyword found, not placeholder
@@ -106,34 +102,18 @@ def filter_valid_comments_recursive(
     comments_list: Sequence[Mapping[str, Any]],
 ) -> List[Mapping[str, Any]]:
     """
-    递归过滤评论列表，将所有层级的评论（包括子评论）放入同一个扁平数组中。
-    每个评论对象都会包含相同的键结构。
+    过滤评论列表，将所有层级的评论（包括子评论）放入同一个扁平数组中。
+    每个评论对象都会包含相同的键结构。空评论及其子评论会被跳过。
     返回一个包含所有有效评论的扁平列表。
     """
-    processed_comments: List[Mapping[str, Any]] = []
-
-    def process_comment(comment: Mapping[str, Any]) -> None:
-        # 创建标准化的评论对象结构
-        comment_text = comment.get("comment_text", "").strip()
-        if not comment_text:  # 跳过空评论
-            return
-
-        standard_comment = {
+    return [
+        {
             "unique_id": comment.get("unique_id", ""),
-            "comment_text": comment_text,
+            "comment_text": comment.get("comment_text", "").strip(),
             "date_location": comment.get("date_location", ""),
         }
-        processed_comments.append(standard_comment)
-
-        # 递归处理子评论
-        for sub_comment in comment.get("sub_comments", []):
-            process_comment(sub_comment)
-
-    # 处理所有顶层评论及其子评论
-    for comment in comments_list:
-        process_comment(comment)
-
-    return processed_comments
+        for _, comment in walk_comments(comments_list, prune=is_empty_comment)
+    ]
 
 
 # ------------------------------------------------------------
@@ -158,10 +138,13 @@ def filter_data_strict_mode(
 
         # 如果笔记本身不跳过，则处理其评论
         # 创建笔记的深拷贝，以免修改原始数据（如果后续需要）
-        # 并且确保我们是在修改一个独立的副本
-        note_to_keep = copy.deepcopy(original_note)
+        # 并且确保我们是在修改一个独立的副本。
+        # comments 会被扁平化后的新列表替换，不参与深拷贝，避免深层回复链触发递归上限
+        note_to_keep = {
+            k: copy.deepcopy(v) for k, v in original_note.items() if k != "comments"
+        }
 
-        original_comments = note_to_keep.get("comments", [])
+        original_comments = original_note.get("comments", [])
         if original_comments:
             valid_comments = filter_valid_comments_recursive(original_comments)
             if valid_comments:
@@ -169,6 +152,8 @@ def filter_data_strict_mode(
             else:
                 # 如果所有评论都被过滤掉了，移除 "comments" 键
                 note_to_keep.pop("comments", None)
+        elif "comments" in original_note:
+            note_to_keep["comments"] = copy.deepcopy(original_comments)
 
         filtered_notes.append(note_to_keep)
 
@@ -0,0 +1,178 @@
+"""
+批量分配内容到用户关注点
+
+distribute_content_to_user_focus 的 LLM 模式原先每条内容一次请求，每次都带着完整的 system prompt。
+批量模式把多条带编号的内容放进同一个请求（所有批次共用同一个 system prompt，服务端 prompt 缓存可以命中），
+模型返回 编号 -> 关注点 的映射：
+
+* 逐条校验：编号必须属于本批、关注点必须是字符串列表，不在关注点列表中的关注点直接丢弃；
+  缺失或不合法的内容放回重试队列，攒够一批（或没有其它在途批次）后重新组批，超过 ``max_attempts`` 次后放弃；
+* ``AdaptiveBatchSizer`` 按 token 预算和条数上限组批，本批失败率超过阈值时条数减半，
+  全部合法时逐步增大（加性增、乘性减）；
+* 批次通过 work_queue.run_work_items 执行，批次在需要时才生成，总能使用最新的批大小；
+* 结果按内容下标保存，最终按输入顺序重组，与完成顺序无关。
+"""
+
+import threading
+from collections import deque
+
+from token_chunker import count_tokens, truncate_to_budget
+from work_queue import WorkItem, run_work_items
+
+
+class AdaptiveBatchSizer:
+    """
+    :param initial: 初始的每批条数
+    :param token_budget: 每批内容的最大 token 数
+    :param failure_threshold: 本批失败率超过该值时批大小减半
+    """
+
+    def __init__(
+        self,
+        initial=20,
+        min_size=1,
+        max_size=50,
+        token_budget=6000,
+        failure_threshold=0.1,
+    ):
+        self.size = initial
+        self.min_size = min_size
+        self.max_size = max_size
+        self.token_budget = token_budget
+        self.failure_threshold = failure_threshold
+        self._lock = threading.Lock()
+
+    def take(self, queue, tokens):
+        """从 queue 头部取出一批内容下标，tokens[i] 为第 i 条内容的 token 数"""
+        with self._lock:
+            size = self.size
+        batch = []
+        used = 0
+        while queue and len(batch) < size:
+            if batch and used + tokens[queue[0]] > self.token_budget:
+                break
+            index = queue.popleft()
+            batch.append(index)
+            used += tokens[index]
+        return batch
+
+    def record(self, total, failed):
+        with self._lock:
+            if failed / total > self.failure_threshold:
+                self.size = max(self.min_size, self.size // 2)
+            elif failed == 0:
+                self.size = min(self.max_size, self.size + max(1, self.size // 4))
+
+
+def validate_batch_result(result, batch_size, keywords):
+    """
+    :param result: 模型返回的 {"results": [...]} 或其中的列表
+    :return: {批内编号: 关注点列表}，只包含合法的项
+    """
+    if isinstance(result, dict):
+        result = result.get("results")
+    if not isinstance(result, list):
+        return {}
+    valid = {}
+    for entry in result:
+        if not isinstance(entry, dict):
+            continue
+        index = entry.get("index")
+        assigned = entry.get("keywords")
+        if isinstance(index, bool) or not isinstance(index, int):
+            continue
+        if not 1 <= index <= batch_size or index in valid:
+            continue
+        if not isinstance(assigned, list) or not all(isinstance(k, str) for k in assigned):
+            continue
+        # 去掉列表外的关注点，保持顺序并去重
+        valid[index] = list(dict.fromkeys(k for k in assigned if k in keywords))
+    return valid
+
+
+def format_batch(contents):
+    return "\n".join(
+        f"<内容 {i}>\n{content}\n</内容 {i}>" for i, content in enumerate(contents, 1)
+    )
+
+
+def distribute_in_batches(
+    contents,
+    keywords,
+    assign_batch,
+    sizer=None,
+    max_attempts=3,
+    max_workers=50,
+):
+    """
+    :param assign_batch: assign_batch(batch_text, attempt) -> 模型返回结果，失败时返回 None 或抛出异常；
+                         attempt 从 0 开始，重试时调用方可以换用不缓存的设置
+    :return: 与 contents 等长的列表，每项为分配到的关注点列表，多次失败的内容为 None
+    """
+    sizer = sizer or AdaptiveBatchSizer()
+    keyword_set = set(keywords)
+    # 单条超过预算的内容截断，保证每批至少能放下一条
+    contents = [truncate_to_budget(content, sizer.token_budget) for content in contents]
+    tokens = [count_tokens(content) for content in contents]
+    results = [None] * len(contents)
+    attempts = [0] * len(contents)
+    queue = deque(range(len(contents)))
+    retry_queue = deque()
+    stats = {"requests": 0, "failed_items": 0, "abandoned": 0, "in_flight": 0}
+
+    def batches():
+        while queue:
+            stats["in_flight"] += 1
+            yield WorkItem("distribute_batch", sizer.take(queue, tokens), 0)
+
+    def retry_batches():
+        items = []
+        while retry_queue:
+            batch = sizer.take(retry_queue, tokens)
+            items.append(WorkItem("distribute_batch", batch, max(attempts[i] for i in batch)))
+        stats["in_flight"] += len(items)
+        return items
+
+    def worker(item):
+        return assign_batch(format_batch([contents[i] for i in item.target]), item.context)
+
+    def settle(item, valid):
+        failed = 0
+        for position, index in enumerate(item.target, 1):
+            if position in valid:
+                results[index] = valid[position]
+                continue
+            failed += 1
+            attempts[index] += 1
+            if attempts[index] < max_attempts:
+                retry_queue.append(index)
+            else:
+                stats["abandoned"] += 1
+        stats["requests"] += 1
+        stats["in_flight"] -= 1
+        stats["failed_items"] += failed
+        sizer.record(len(item.target), failed)
+        done = sum(result is not None for result in results)
+        print(
+            f"\r批量分配进度: {done}/{len(contents)} (批大小 {sizer.size})",
+            end="",
+            flush=True,
+        )
+        # 失败的内容攒够一批再重试，避免产生大量很小的批次；没有其它在途批次时不再等待
+        if len(retry_queue) < sizer.size and (queue or stats["in_flight"]):
+            return []
+        return retry_batches()
+
+    def on_result(item, result):
+        return settle(item, validate_batch_result(result, len(item.target), keyword_set))
+
+    def on_error(item, exc):
+        print(f"\n批量分配请求失败: {exc}")
+        return settle(item, {})
+
+    run_work_items(batches(), worker, on_result, on_error, max_workers=max_workers)
+    print(
+        f"\n批量分配: 共 {len(contents)} 条, 请求 {stats['requests']} 次, "
+        f"校验失败 {stats['failed_items']} 条次, 放弃 {stats['abandoned']} 条, 最终批大小 {sizer.size}"
+    )
+    return results
@@ -0,0 +1,211 @@
+"""
+按向量相似度把内容分配到用户关注点
+
+distribute_content_to_user_focus 原先对每条内容都调用一次 LLM，prompt 中带着完整的关注点列表。
+``FocusDistributor`` 改为检索式的分配：
+
+1. 每个关注点、每条内容各编码一次：安装了 sentence-transformers 时在 CPU 上用本地句向量模型
+   （默认 BAAI/bge-small-zh-v1.5，可用环境变量 FOCUS_EMBEDDING_MODEL 指定），否则用字符 n-gram 的哈希向量；
+2. 向量都做 L2 归一化，分批做一次矩阵乘法得到 内容 × 关注点 的余弦相似度；
+3. 相似度不低于 ``accept`` 的关注点直接分配，不高于 ``reject`` 的直接忽略，
+   只要有一个关注点落在两者之间，这条内容就交给 LLM 判定；
+4. 未指定阈值时先抽样 ``calibration_size`` 条内容交给 LLM，以其结果为标注，
+   每个关注点分别选取满足目标精确率、覆盖面最大的 ``reject`` / ``accept``（与 hotel_gate 的阈值校准思路相同），
+   抽样内容直接使用 LLM 的结果。
+
+需要安装 numpy。
+"""
+
+import os
+import random
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from hotel_gate import best_cut
+from keyword_index import text_ngrams
+
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-small-zh-v1.5"
+
+
+class HashingEncoder:
+    """字符 n-gram 的带符号哈希向量，不依赖任何模型文件"""
+
+    # 无法校准时使用的 (reject, accept)
+    default_thresholds = (0.05, 0.3)
+
+    def __init__(self, n_features=2**14):
+        self.n_features = n_features
+
+    def encode(self, texts):
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for gram in text_ngrams(text, n_values=(1, 2, 3)):
+                h = zlib.crc32(gram.encode("utf-8"))
+                # 最高位决定符号，减少哈希冲突带来的偏差
+                matrix[row, h % self.n_features] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+
+class SentenceEmbeddingEncoder:
+    default_thresholds = (0.35, 0.6)
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL, batch_size=64):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.batch_size = batch_size
+
+    def encode(self, texts):
+        return np.asarray(
+            self.model.encode(
+                list(texts), batch_size=self.batch_size, normalize_embeddings=True
+            ),
+            dtype=np.float32,
+        )
+
+
+def get_default_encoder():
+    """优先使用本地句向量模型，未安装或加载失败时退回哈希向量"""
+    try:
+        return SentenceEmbeddingEncoder(
+            os.environ.get("FOCUS_EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+        )
+    except Exception as exc:
+        print(f"句向量模型不可用，使用字符 n-gram 哈希向量: {exc}")
+        return HashingEncoder()
+
+
+def calibrate_thresholds(scores, labels, target_precision=0.95):
+    """
+    :param scores: 抽样内容 × 关注点的相似度（任意形状）
+    :param labels: 同形状的布尔值，LLM 是否分配了该关注点
+    :return: (reject, accept)：不高于 reject 的判为未提及，不低于 accept 的判为提及；没有正例时返回 None
+    """
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    labels = np.asarray(labels, dtype=bool).ravel()
+    if not labels.any():
+        return None
+    order = np.argsort(scores, kind="stable")
+    ascending_scores = scores[order].tolist()
+    ascending_labels = labels[order].tolist()
+    reject = best_cut(
+        ascending_scores, ascending_labels, False, target_precision, float("-inf")
+    )
+    accept = best_cut(
+        ascending_scores[::-1], ascending_labels[::-1], True, target_precision, float("inf")
+    )
+    return min(reject, accept), accept
+
+
+class FocusDistributor:
+    """
+    :param keywords: 用户关注点列表
+    :param encoder: HashingEncoder / SentenceEmbeddingEncoder，默认 get_default_encoder()
+    :param accept: 不低于该相似度直接分配，可以是数值或与 keywords 等长的数组；为 None 时按抽样结果校准
+    :param reject: 不高于该相似度直接忽略
+    :param min_positives: 抽样中正例少于该数量的关注点使用整体校准的阈值
+    """
+
+    def __init__(
+        self,
+        keywords,
+        encoder=None,
+        accept=None,
+        reject=None,
+        calibration_size=200,
+        min_positives=5,
+        batch_size=1024,
+        seed=0,
+    ):
+        self.keywords = list(keywords)
+        self.encoder = encoder or get_default_encoder()
+        self.accept = accept
+        self.reject = reject
+        self.calibration_size = calibration_size
+        self.min_positives = min_positives
+        self.batch_size = batch_size
+        self.seed = seed
+        self._keyword_vectors = self.encoder.encode(self.keywords)
+
+    def scores(self, contents):
+        """内容 × 关注点 的余弦相似度矩阵，内容分批编码，避免一次性占用过多内存"""
+        result = np.zeros((len(contents), len(self.keywords)), dtype=np.float32)
+        for start in range(0, len(contents), self.batch_size):
+            vectors = self.encoder.encode(contents[start : start + self.batch_size])
+            result[start : start + len(vectors)] = vectors @ self._keyword_vectors.T
+        return result
+
+    def _calibrate(self, scores, labeled):
+        """每个关注点的相似度分布不同（短关注点的余弦值普遍更高），按列分别校准，正例太少的列使用整体校准的结果"""
+        rows = [i for i, assigned in labeled.items() if assigned is not None]
+        labels = np.array(
+            [[keyword in labeled[i] for keyword in self.keywords] for i in rows],
+            dtype=bool,
+        ).reshape(len(rows), len(self.keywords))
+        sample = scores[rows]
+
+        pooled = calibrate_thresholds(sample, labels) if rows else None
+        if pooled is None:
+            pooled = self.encoder.default_thresholds
+            print("抽样结果中没有可用的标注，使用默认阈值")
+        reject = np.full(len(self.keywords), pooled[0], dtype=np.float32)
+        accept = np.full(len(self.keywords), pooled[1], dtype=np.float32)
+        for k in range(len(self.keywords)):
+            if labels[:, k].sum() >= self.min_positives:
+                reject[k], accept[k] = calibrate_thresholds(sample[:, k], labels[:, k])
+        self.reject, self.accept = reject, accept
+        for keyword, r, a in zip(self.keywords, reject, accept):
+            print(f"相似度阈值校准 [{keyword}]: reject={r:.3f}, accept={a:.3f}")
+
+    def distribute(self, contents, llm_assign, max_workers=200):
+        """
+        :param llm_assign: llm_assign(content) -> 关注点列表，失败时返回 None
+        :return: 与 contents 等长的列表，每项为分配到的关注点列表（LLM 失败时为 None）
+        """
+        scores = self.scores(contents)
+        results = [None] * len(contents)
+
+        def run_llm(indices, label):
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(llm_assign, contents[i]): i for i in indices}
+                for done, future in enumerate(as_completed(futures), 1):
+                    i = futures[future]
+                    try:
+                        results[i] = future.result()
+                    except Exception as exc:
+                        print(f"\n分配内容时发生错误: {exc}")
+                    print(f"\r{label}进度: {done}/{len(indices)}", end="", flush=True)
+            if indices:
+                print()
+
+        sampled = []
+        if self.accept is None or self.reject is None:
+            indices = list(range(len(contents)))
+            sampled = random.Random(self.seed).sample(
+                indices, min(self.calibration_size, len(indices))
+            )
+            run_llm(sampled, "阈值校准抽样")
+            self._calibrate(scores, {i: results[i] for i in sampled})
+
+        sampled_set = set(sampled)
+        ambiguous = []
+        local = 0
+        for i, row in enumerate(scores):
+            if i in sampled_set:
+                continue
+            accepted = row >= self.accept
+            if (~accepted & (row > self.reject)).any():
+                ambiguous.append(i)
+                continue
+            results[i] = [self.keywords[k] for k in np.flatnonzero(accepted)]
+            local += 1
+        run_llm(ambiguous, "不确定内容 LLM 分配")
+
+        print(
+            f"关注点分配: 共 {len(contents)} 条, 本地直接分配 {local} 条, "
+            f"校准抽样 {len(sampled)} 条, 交给 LLM {len(ambiguous)} 条"
+        )
+        return results
@@ -0,0 +1,116 @@
+"""
+用户关注点的树形归并
+
+extract_user_focus 原先把所有分块提取出的关注点拼成一个列表，交给一次 merge_user_focus 调用，
+分块越多这次调用越慢、prompt 越长。``tree_merge`` 改为逐层归并：
+
+1. 每个分块的结果先在本地去重：归一化（全角转半角、去空白和标点、去掉“酒店”前缀）后完全相同的合并，
+   再把字符 bigram 的 Jaccard 相似度不低于阈值的近似重复合并，保留出现次数最多的原始写法，按出现次数排序；
+2. 每 ``fan_in`` 个列表为一组，并行调用 LLM 归并，结果再作为下一层的输入，直到只剩一个列表；
+   中间层去重后不超过 ``passthrough`` 个关注点的组不调用 LLM，直接进入下一层；
+3. 某一组 LLM 归并失败时退回该组本地去重的结果，不影响其它组。
+
+层数为 log(fan_in, 分块数)，每次调用的输入长度不超过 fan_in 个列表去重后的长度。
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+_PUNCT_RE = re.compile(r"[\s\W_]+")
+_GENERIC_PREFIXES = ("酒店",)
+
+
+def normalize_keyword(keyword):
+    text = unicodedata.normalize("NFKC", str(keyword)).lower()
+    text = _PUNCT_RE.sub("", text)
+    for prefix in _GENERIC_PREFIXES:
+        # “酒店早餐”与“早餐”在这里是同一个关注点，但“酒店”本身保留
+        if text.startswith(prefix) and len(text) - len(prefix) >= 2:
+            text = text[len(prefix) :]
+    return text
+
+
+def _bigrams(text):
+    if len(text) < 2:
+        return {text}
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def dedupe_keywords(keywords, threshold=0.7):
+    """
+    本地合并完全重复和近似重复的关注点
+
+    :param keywords: 关注点列表，可以包含重复项（重复次数作为出现次数）
+    :return: 去重后的列表，按出现次数从多到少排列
+    """
+    # 归一化后完全相同的合并，记录每种原始写法的次数
+    groups = {}
+    for keyword in keywords:
+        if not isinstance(keyword, str) or not keyword.strip():
+            continue
+        key = normalize_keyword(keyword)
+        if not key:
+            continue
+        groups.setdefault(key, Counter())[keyword.strip()] += 1
+
+    # 近似重复：按出现次数从多到少，与已保留的项比较 bigram Jaccard
+    ordered = sorted(groups.items(), key=lambda item: -sum(item[1].values()))
+    kept = []
+    for key, spellings in ordered:
+        grams = _bigrams(key)
+        for other in kept:
+            union = grams | other["grams"]
+            if union and len(grams & other["grams"]) / len(union) >= threshold:
+                other["spellings"].update(spellings)
+                break
+        else:
+            kept.append({"grams": grams, "spellings": Counter(spellings)})
+
+    kept.sort(key=lambda item: -sum(item["spellings"].values()))
+    return [item["spellings"].most_common(1)[0][0] for item in kept]
+
+
+def tree_merge(partial_lists, merge_fn, fan_in=8, passthrough=10, max_workers=20):
+    """
+    :param partial_lists: 各分块提取出的关注点列表
+    :param merge_fn: merge_fn(keywords) -> 归并后的关注点列表，失败时返回 None 或抛出异常
+    :param fan_in: 每次 LLM 归并的列表数
+    :param passthrough: 中间层去重后不超过该数量的组不调用 LLM
+    :return: 最终的关注点列表
+    """
+    level = [dedupe_keywords(keywords) for keywords in partial_lists if keywords]
+    if not level:
+        return []
+    depth = 0
+    while True:
+        groups = [level[i : i + fan_in] for i in range(0, len(level), fan_in)]
+        final = len(groups) == 1
+
+        def merge_group(group):
+            # 同一组内每个列表已按出现次数排序，交错合并使各列表靠前的关注点排在前面
+            keywords = dedupe_keywords(
+                [kw for row in _interleave(group) for kw in row]
+            )
+            if not final and len(keywords) <= passthrough:
+                return keywords
+            try:
+                merged = merge_fn(keywords)
+            except Exception as exc:
+                print(f"\n关注点归并失败，使用本地去重结果: {exc}")
+                merged = None
+            return dedupe_keywords(merged) if merged else keywords
+
+        depth += 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            level = list(executor.map(merge_group, groups))
+        print(f"关注点归并第 {depth} 层: {len(groups)} 组 -> {len(level)} 个列表")
+        if final:
+            return level[0]
+
+
+def _interleave(lists):
+    """[[a1, a2], [b1]] -> [[a1, b1], [a2]]"""
+    longest = max(len(keywords) for keywords in lists)
+    return [[keywords[i] for keywords in lists if i < len(keywords)] for i in range(longest)]
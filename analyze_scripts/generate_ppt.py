@@ -1,21 +1,46 @@
+"""
+生成品牌与对比对象（行业平均或其它酒店）的 Buzz / Sentiment Score 对比 PPT
+
+* ``generate_report``：一个品牌一份 PPT，数据为 competitive_benchmark.build_ppt_data 的结构
+  （也可以是原来手工整理的 analysis_result/tmp.json），可以指定对比对象、一级关键词和模板 PPT；
+* ``generate_reports``：competitive_benchmark.benchmark_frame 只计算一次，每个品牌的数据从同一张表中取出，
+  各品牌的 PPT 在多个进程中并行生成。
+
+为所有酒店生成 PPT（可以指定品牌）：
+```
+python analyze_scripts/generate_ppt.py [品牌 ...]
+```
+"""
+
 import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 from pptx import Presentation
 from pptx.chart.data import CategoryChartData
 from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
 from pptx.util import Inches, Pt
 from pptx.dml.color import RGBColor
 
-# 读取JSON文件
-with open("analysis_result/tmp.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
+from competitive_benchmark import INDUSTRY_AVERAGE, build_ppt_data, load_benchmark_frame
 
-# 创建PPT
-prs = Presentation()
+# 依次用于品牌和各对比对象
+SERIES_COLORS = [
+    RGBColor(65, 105, 225),  # 深蓝色
+    RGBColor(255, 99, 71),  # 珊瑚红
+    RGBColor(128, 128, 128),
+    RGBColor(60, 179, 113),
+    RGBColor(218, 165, 32),
+    RGBColor(147, 112, 219),
+]
+SERIES_LABELS = {INDUSTRY_AVERAGE: "行业平均"}
 
 
-def create_chart_slide(prs, title_text, chart_data, is_sentiment=False):
+def create_chart_slide(prs, title_text, chart_data, is_sentiment=False, layout_index=5):
     # 创建新的幻灯片
-    slide = prs.slides.add_slide(prs.slide_layouts[5])  # 使用空白布局
+    slide = prs.slides.add_slide(prs.slide_layouts[layout_index])  # 默认使用只有标题的布局
 
     # 设置标题
     title = slide.shapes.title
@@ -41,11 +66,9 @@ def create_chart_slide(prs, title_text, chart_data, is_sentiment=False):
     data_labels.font.color.rgb = RGBColor(0, 0, 0)
 
     # 设置系列颜色
-    series_list = plot.series
-    series_list[0].format.fill.solid()
-    series_list[0].format.fill.fore_color.rgb = RGBColor(65, 105, 225)  # 深蓝色
-    series_list[1].format.fill.solid()
-    series_list[1].format.fill.fore_color.rgb = RGBColor(255, 99, 71)  # 珊瑚红
+    for i, series in enumerate(plot.series):
+        series.format.fill.solid()
+        series.format.fill.fore_color.rgb = SERIES_COLORS[i % len(SERIES_COLORS)]
 
     # 设置图例
     chart.has_legend = True
@@ -66,36 +89,120 @@ def create_chart_slide(prs, title_text, chart_data, is_sentiment=False):
         value_axis.maximum_scale = 100.0
 
 
-# 遍历每个主题
-for topic in data.keys():
-    # 处理Buzz数据
-    buzz_data = data[topic]["pkBuzz"]
-    chart_data = CategoryChartData()
-    chart_data.categories = [item["name"] for item in buzz_data]
-    chart_data.add_series("惠庭", [item["惠庭"] for item in buzz_data])
-    chart_data.add_series(
-        "行业平均",
-        [item.get("industryAverage", item.get("行业平均", 0)) for item in buzz_data],
-    )
-
-    # 创建Buzz图表幻灯片
-    create_chart_slide(prs, f"{topic} - Buzz对比", chart_data)
-
-    # 处理SentimentScore数据
-    sentiment_data = data[topic]["pkSentimentScore"]
+def _chart_data(items, series):
+    """series 为 [(数据中的键, 图例名称), ...]；兼容 tmp.json 中以“行业平均”为键的旧数据"""
     chart_data = CategoryChartData()
-    chart_data.categories = [item["name"] for item in sentiment_data]
-    chart_data.add_series("惠庭", [float(item["惠庭"]) for item in sentiment_data])
-    chart_data.add_series(
-        "行业平均",
-        [
-            float(item.get("industryAverage", item.get("行业平均", 0)))
-            for item in sentiment_data
-        ],
-    )
-
-    # 创建SentimentScore图表幻灯片
-    create_chart_slide(prs, f"{topic} - Sentiment Score对比", chart_data, True)
-
-# 保存PPT
-prs.save("analysis_result/home2_vs_industry_average.pptx")
+    chart_data.categories = [item["name"] for item in items]
+    for key, label in series:
+        chart_data.add_series(
+            label, [float(item.get(key, item.get(label, 0)) or 0) for item in items]
+        )
+    return chart_data
+
+
+def generate_report(
+    ppt_data,
+    brand,
+    output_path,
+    compare=(INDUSTRY_AVERAGE,),
+    topics=None,
+    template=None,
+    layout_index=5,
+):
+    """
+    :param ppt_data: {一级关键词: {"pkBuzz": [...], "pkSentimentScore": [...]}}
+    :param compare: 对比对象，"industryAverage" 表示行业平均，其它为酒店名称
+    :param topics: 只生成这些一级关键词的幻灯片，None 表示全部
+    :param template: 模板 PPT 路径，使用其中的主题和版式，模板中已有的幻灯片（如封面）保留在最前面
+    """
+    prs = Presentation(template) if template else Presentation()
+    series = [(brand, brand)] + [(name, SERIES_LABELS.get(name, name)) for name in compare]
+    for topic in topics or ppt_data:
+        if topic not in ppt_data:
+            continue
+        create_chart_slide(
+            prs,
+            f"{topic} - Buzz对比",
+            _chart_data(ppt_data[topic]["pkBuzz"], series),
+            layout_index=layout_index,
+        )
+        create_chart_slide(
+            prs,
+            f"{topic} - Sentiment Score对比",
+            _chart_data(ppt_data[topic]["pkSentimentScore"], series),
+            True,
+            layout_index=layout_index,
+        )
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    prs.save(output_path)
+    return output_path
+
+
+def _generate_report_job(job):
+    return generate_report(**job)
+
+
+def generate_reports(
+    frame=None,
+    brands=None,
+    compare=(INDUSTRY_AVERAGE,),
+    topics=None,
+    template=None,
+    output_dir="analysis_result/reports",
+    max_workers=None,
+):
+    """
+    为多个品牌并行生成 PPT
+
+    :param frame: competitive_benchmark.benchmark_frame 的结果，默认从分析结果计算
+    :param brands: 品牌列表，None 表示 frame 中的全部酒店
+    :return: {品牌: PPT 路径}，生成失败的品牌不在其中
+    """
+    start = time.perf_counter()
+    if frame is None:
+        frame = load_benchmark_frame()
+    brands = list(brands) if brands else sorted(frame["hotel"].unique())
+
+    jobs = {}
+    for brand in brands:
+        try:
+            ppt_data = build_ppt_data(frame, brand, [c for c in compare if c != brand], topics)
+        except ValueError as exc:
+            print(exc)
+            continue
+        jobs[brand] = {
+            "ppt_data": ppt_data,
+            "brand": brand,
+            "output_path": os.path.join(output_dir, f"{brand}.pptx"),
+            "compare": [c for c in compare if c != brand],
+            "topics": topics,
+            "template": template,
+        }
+
+    reports = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_generate_report_job, job): brand for brand, job in jobs.items()}
+        for done, future in enumerate(as_completed(futures), 1):
+            brand = futures[future]
+            try:
+                reports[brand] = future.result()
+            except Exception as exc:
+                print(f"\n生成 {brand} 的 PPT 失败: {exc}")
+            print(f"\rPPT 生成进度: {done}/{len(futures)}", end="", flush=True)
+    print(f"\n共生成 {len(reports)} 份 PPT，耗时 {time.perf_counter() - start:.2f}s，保存在{output_dir}")
+    return reports
+
+
+def generate_report_from_json(
+    path="analysis_result/tmp.json",
+    brand="惠庭",
+    output_path="analysis_result/home2_vs_industry_average.pptx",
+):
+    """原来的用法：读取整理好的 tmp.json，生成一个品牌对比行业平均的 PPT"""
+    with open(path, "r", encoding="utf-8") as f:
+        return generate_report(json.load(f), brand, output_path)
+
+
+if __name__ == "__main__":
+    generate_reports(brands=sys.argv[1:] or None)
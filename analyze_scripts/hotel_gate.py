@@ -0,0 +1,306 @@
+"""
+is_hotel_related 的本地预分类器
+
+analyze_is_hotel_related 会把每个帖子都发给 LLM，本地唯一的捷径是“回复少于 10 个字即判为无关”。
+这里用历史分析结果（analysis_result/*_analyzed.json 中 LLM 给出的 is_hotel_related）训练一个
+字符 n-gram + 酒店词表的朴素贝叶斯模型：
+
+* 概率低于 ``low`` 的内容直接判为无关，高于 ``high`` 的直接判为相关；
+* 介于两者之间的不确定区间仍交给 LLM；
+* 帖子还需要 LLM 判断 is_ad，因此帖子默认只自动判定“无关”，回复两个方向都可以自动判定。
+
+阈值在校准集上按目标精确率选取，再在独立的测试集上报告精确率/召回率和可节省的调用比例：
+```
+python analyze_scripts/hotel_gate.py
+```
+训练好的模型保存在 analysis_result/hotel_gate_model.json，
+``analyze_is_hotel_related(raw_data, gate=HotelRelevanceGate.load())`` 即可启用。
+"""
+
+import json
+import math
+import os
+import zlib
+
+from keyword_index import text_ngrams
+
+MODEL_PATH = "analysis_result/hotel_gate_model.json"
+
+ANALYZED_PATHS = (
+    "analysis_result/flyert_analyzed.json",
+    "analysis_result/wb_analyzed.json",
+    "analysis_result/xhs_analyzed.json",
+)
+
+HOTEL_LEXICON = (
+    "酒店",
+    "宾馆",
+    "民宿",
+    "入住",
+    "退房",
+    "前台",
+    "大堂",
+    "客房",
+    "房间",
+    "房型",
+    "大床",
+    "双床",
+    "早餐",
+    "卫生间",
+    "浴室",
+    "淋浴",
+    "隔音",
+    "床品",
+    "枕头",
+    "空调",
+    "洗衣房",
+    "健身房",
+    "泳池",
+    "停车",
+    "会员",
+    "积分",
+    "升级",
+    "房价",
+    "性价比",
+    "住了",
+    "住过",
+    "hotel",
+)
+
+GATE_REASON = "本地预分类判定"
+
+_LEXICON_FEATURE = "__lexicon__"
+_NO_LEXICON_FEATURE = "__no_lexicon__"
+
+
+def gate_features(text):
+    features = text_ngrams(text)
+    lowered = (text or "").lower()
+    if any(word in lowered for word in HOTEL_LEXICON):
+        features.add(_LEXICON_FEATURE)
+    else:
+        features.add(_NO_LEXICON_FEATURE)
+    return features
+
+
+class HotelRelevanceGate:
+    def __init__(self, low=0.05, high=0.95, auto_positive_posts=False):
+        self.low = low
+        self.high = high
+        self.auto_positive_posts = auto_positive_posts
+        self.class_counts = [0, 0]
+        # feature -> [无关样本中出现次数, 相关样本中出现次数]
+        self.feature_counts = {}
+
+    def fit(self, samples, min_count=2):
+        """samples: [(text, is_hotel_related)]"""
+        self.class_counts = [0, 0]
+        counts = {}
+        for text, label in samples:
+            label = int(bool(label))
+            self.class_counts[label] += 1
+            for feature in gate_features(text):
+                pair = counts.get(feature)
+                if pair is None:
+                    pair = counts[feature] = [0, 0]
+                pair[label] += 1
+        self.feature_counts = {
+            f: pair for f, pair in counts.items() if pair[0] + pair[1] >= min_count
+        }
+        return self
+
+    def predict_proba(self, text):
+        """返回内容与酒店相关的概率"""
+        negatives, positives = self.class_counts
+        if not negatives or not positives:
+            return 0.5
+        log_odds = math.log(positives / negatives)
+        for feature in gate_features(text):
+            pair = self.feature_counts.get(feature)
+            if pair is None:
+                continue
+            # 伯努利朴素贝叶斯，只累计出现的特征，Laplace 平滑
+            log_odds += math.log((pair[1] + 1) / (positives + 2)) - math.log(
+                (pair[0] + 1) / (negatives + 2)
+            )
+        log_odds = max(min(log_odds, 50), -50)
+        return 1 / (1 + math.exp(-log_odds))
+
+    def decide(self, text, kind="reply"):
+        """返回 True/False 表示可以本地判定，返回 None 表示需要交给 LLM"""
+        p = self.predict_proba(text)
+        if p <= self.low:
+            return False
+        if p >= self.high and (kind == "reply" or self.auto_positive_posts):
+            return True
+        return None
+
+    def save(self, path=MODEL_PATH):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "low": self.low,
+                    "high": self.high,
+                    "class_counts": self.class_counts,
+                    "feature_counts": self.feature_counts,
+                },
+                f,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, path=MODEL_PATH, **kwargs):
+        """读取模型，文件不存在时返回 None"""
+        if not os.path.exists(path):
+            print(f"{path} 不存在，不启用本地预分类")
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        gate = cls(low=data["low"], high=data["high"], **kwargs)
+        gate.class_counts = data["class_counts"]
+        gate.feature_counts = data["feature_counts"]
+        return gate
+
+
+def collect_labeled_samples(analyzed_data):
+    """从分析结果中收集 (text, is_hotel_related, kind)，跳过未被 LLM 判断过的内容"""
+    samples = []
+    for hotel in analyzed_data:
+        for post in hotel.get("posts", []):
+            label = post.get("is_hotel_related")
+            if isinstance(label, bool) and _judged_by_llm(post):
+                text = post.get("title", "") + "\n" + post.get("content", "")
+                samples.append((text, label, "post"))
+            for reply in post.get("replies", []):
+                label = reply.get("is_hotel_related")
+                if isinstance(label, bool) and _judged_by_llm(reply):
+                    samples.append((reply.get("content", ""), label, "reply"))
+    return samples
+
+
+def _judged_by_llm(node):
+    """规则判定（评论过短、所属帖子无关、处理错误）的结果不能作为训练标注"""
+    reason = node.get("is_hotel_related_reason") or ""
+    return reason not in ("评论内容过短", "所属帖子与酒店无关", GATE_REASON) and not (
+        reason.startswith("处理错误") or reason == "分析失败或无结果"
+    )
+
+
+def _split(text):
+    """按内容哈希稳定地划分 训练/校准/测试 = 60/20/20"""
+    bucket = zlib.crc32(text.encode("utf-8")) % 10
+    if bucket < 6:
+        return "train"
+    if bucket < 8:
+        return "calibrate"
+    return "test"
+
+
+def _calibrate(gate, samples, target_precision):
+    """
+    在校准集上选取满足目标精确率、覆盖面最大的 low/high 阈值；
+    某个方向达不到目标精确率时阈值为 ±inf，该方向不自动判定
+    """
+    scored = sorted((gate.predict_proba(text), label) for text, label, _ in samples)
+    scores = [p for p, _ in scored]
+    labels = [label for _, label in scored]
+    gate.low = best_cut(scores, labels, False, target_precision, float("-inf"))
+    gate.high = max(
+        best_cut(scores[::-1], labels[::-1], True, target_precision, float("inf")),
+        gate.low,
+    )
+    return gate
+
+
+def best_cut(scores, labels, wanted, target_precision, default):
+    """
+    scores / labels 按判定方向排好序，返回 label == wanted 的占比不低于目标精确率的最长前缀的边界分数，
+    没有满足条件的前缀时返回 default。
+    分数相同的样本必须一起划入或划出，只在相邻分数不同的位置切分；此外前缀必须以含 wanted 样本的分数结尾，
+    否则前缀会越过边界，吞进一段全是反例的分数区间。
+    """
+    cut = default
+    hits = 0
+    group_has_wanted = False
+    for i, (score, label) in enumerate(zip(scores, labels), 1):
+        hits += label == wanted
+        group_has_wanted = group_has_wanted or label == wanted
+        if i < len(scores) and scores[i] == score:
+            continue
+        if group_has_wanted and hits / i >= target_precision:
+            cut = float(score)
+        group_has_wanted = False
+    return cut
+
+
+def evaluate(gate, samples):
+    """
+    统计本地判定的精确率/召回率（以 LLM 标注为准）以及可节省的 LLM 调用数
+    """
+    stats = {
+        "total": len(samples),
+        "auto_negative": 0,
+        "auto_negative_correct": 0,
+        "auto_positive": 0,
+        "auto_positive_correct": 0,
+        "negatives": 0,
+        "positives": 0,
+    }
+    for text, label, kind in samples:
+        stats["positives" if label else "negatives"] += 1
+        decision = gate.decide(text, kind)
+        if decision is False:
+            stats["auto_negative"] += 1
+            stats["auto_negative_correct"] += not label
+        elif decision is True:
+            stats["auto_positive"] += 1
+            stats["auto_positive_correct"] += label
+
+    def ratio(a, b):
+        return a / b if b else 0.0
+
+    report = {
+        "negative_precision": ratio(stats["auto_negative_correct"], stats["auto_negative"]),
+        "negative_recall": ratio(stats["auto_negative_correct"], stats["negatives"]),
+        "positive_precision": ratio(stats["auto_positive_correct"], stats["auto_positive"]),
+        "positive_recall": ratio(stats["auto_positive_correct"], stats["positives"]),
+        "calls_saved": stats["auto_negative"] + stats["auto_positive"],
+        "calls_saved_ratio": ratio(
+            stats["auto_negative"] + stats["auto_positive"], stats["total"]
+        ),
+    }
+    print(f"测试样本数: {stats['total']} (相关 {stats['positives']}, 无关 {stats['negatives']})")
+    print(f"阈值: low={gate.low:.4f}, high={gate.high:.4f}")
+    print(
+        f"自动判定无关: {stats['auto_negative']} 条, 精确率 {report['negative_precision']:.2%}, "
+        f"召回率 {report['negative_recall']:.2%}"
+    )
+    print(
+        f"自动判定相关: {stats['auto_positive']} 条, 精确率 {report['positive_precision']:.2%}, "
+        f"召回率 {report['positive_recall']:.2%}"
+    )
+    print(f"可节省 LLM 调用: {report['calls_saved']} 次 ({report['calls_saved_ratio']:.2%})")
+    return report
+
+
+def train_gate(analyzed_data, target_precision=0.98):
+    samples = collect_labeled_samples(analyzed_data)
+    splits = {"train": [], "calibrate": [], "test": []}
+    for sample in samples:
+        splits[_split(sample[0])].append(sample)
+
+    gate = HotelRelevanceGate().fit((text, label) for text, label, _ in splits["train"])
+    _calibrate(gate, splits["calibrate"], target_precision)
+    report = evaluate(gate, splits["test"])
+    return gate, report
+
+
+if __name__ == "__main__":
+    data = []
+    for path in ANALYZED_PATHS:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data.extend(json.load(f))
+    gate, _ = train_gate(data)
+    gate.save()
+    print(f"模型已保存到 {MODEL_PATH}")
@@ -0,0 +1,54 @@
+"""
+按阶段的推理参数
+
+原先所有调用都使用 temperature 0.8，同样的输入每次返回的结果不同，既无法缓存，也无法在两次运行之间对比。
+``InferenceProfile`` 为每个阶段指定 temperature / seed / max_tokens：
+
+* 分类阶段（是否与酒店相关、关键词判定、用户关注点分配）使用 temperature 0 并固定 seed，
+  同样的请求应得到同样的结果，``cacheable=True`` 表示可以写入 response_cache 复用；
+* 抽取阶段（用户关注点、高频词）使用较低的 temperature 并固定 seed，不缓存；
+* 总结类阶段（典型评价、关注点总结）保留原来的 0.8。
+
+未列出的阶段使用 ``DEFAULT_PROFILE``，与原来的行为相同。
+"""
+
+
+class InferenceProfile:
+    """
+    :param temperature: 采样温度
+    :param seed: 传给接口的 seed，为 None 时不传
+    :param max_tokens: 最大输出 token 数，为 None 时不限制
+    :param cacheable: 结果是否可以写入 response_cache 复用
+    """
+
+    def __init__(self, temperature=0.8, seed=None, max_tokens=None, cacheable=False):
+        self.temperature = temperature
+        self.seed = seed
+        self.max_tokens = max_tokens
+        self.cacheable = cacheable
+
+
+DEFAULT_PROFILE = InferenceProfile()
+
+_CLASSIFICATION = InferenceProfile(temperature=0, seed=42, cacheable=True)
+_EXTRACTION = InferenceProfile(temperature=0.2, seed=42)
+
+STAGE_PROFILES = {
+    "is_hotel_related": InferenceProfile(
+        temperature=0, seed=42, max_tokens=512, cacheable=True
+    ),
+    "keywords": _CLASSIFICATION,
+    "distribute_user_focus": _CLASSIFICATION,
+    # 批量分配的重试：重新组成的批次与首次请求参数相同，不缓存，避免命中上次不完整的结果
+    "distribute_user_focus_retry": InferenceProfile(temperature=0, seed=42),
+    "user_focus": _EXTRACTION,
+    "merge_user_focus": _EXTRACTION,
+    "frequent_words": _EXTRACTION,
+    "refine_frequent_words": _CLASSIFICATION,
+    "typical_reviews": DEFAULT_PROFILE,
+    "summarize_user_focus": DEFAULT_PROFILE,
+}
+
+
+def get_profile(stage):
+    return STAGE_PROFILES.get(stage, DEFAULT_PROFILE)
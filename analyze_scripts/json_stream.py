@@ -0,0 +1,220 @@
+"""
+流式解析 LLM 返回的 JSON
+
+OpenAIService.infer 原先要等完整的回复返回后再用正则查找 ```json 代码块，格式有误时整段输出都已经生成并计费。
+``JsonStreamParser`` 在流式响应到达时逐段扫描：
+
+* 找到 ```json 代码块（或直接以 ``{`` / ``[`` 开头的回复）后开始跟踪括号与字符串状态；
+* 最外层括号闭合时立即解析并返回结果，调用方可以关闭连接，不再接收代码块之后的多余解释；
+* 括号不匹配、JSON 结构之外出现非法字符、代码块在 JSON 闭合前结束等结构错误一出现就抛出
+  ``JsonStreamError``，调用方可以中止请求并立即重试。
+
+``repair_json`` 是一个容错的解析器，在发起重试请求之前先尝试修复常见的格式问题：
+多余的尾逗号、字符串中未转义的换行/引号、Python 风格的 True/False/None、被截断的结尾括号。
+"""
+
+import json
+import re
+
+_FENCE = "```json"
+_OPENERS = {"{": "}", "[": "]"}
+_CLOSERS = {"}", "]"}
+# JSON 字符串之外允许出现的字符：空白、标点、数字以及 true/false/null（Python 风格的 True/False/None 交给 repair_json）
+_BARE_CHARS = set(" \t\r\n,:-+.0123456789eEtruefalsnTFNo")
+
+
+class JsonStreamError(ValueError):
+    """流式输出中检测到无法修复的 JSON 结构错误"""
+
+
+class JsonStreamParser:
+    """
+    :param max_preamble: JSON 开始之前允许的最大字符数，超过即认为模型没有按格式输出
+    """
+
+    def __init__(self, max_preamble=2000):
+        self.max_preamble = max_preamble
+        self.buffer = ""
+        self.start = None  # JSON 在 buffer 中的起始位置
+        self.pos = 0  # 已扫描到的位置
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.done = False
+        self.repaired = False
+        self.result = None
+
+    def feed(self, chunk):
+        """
+        追加一段输出，JSON 完整时返回解析结果，否则返回 None
+
+        :raises JsonStreamError: 检测到结构错误
+        """
+        if self.done or not chunk:
+            return self.result
+        self.buffer += chunk
+        if self.start is None and not self._find_start():
+            return None
+        return self._scan()
+
+    def _find_start(self):
+        stripped = self.buffer.lstrip()
+        if stripped[:1] in _OPENERS:
+            self.start = len(self.buffer) - len(stripped)
+        else:
+            index = self.buffer.find(_FENCE)
+            if index < 0:
+                if len(self.buffer) > self.max_preamble:
+                    raise JsonStreamError(f"前 {self.max_preamble} 个字符内没有出现 ```json 代码块")
+                return False
+            # 代码块标记之后的空白还没有全部到达时，等待下一段
+            rest = self.buffer[index + len(_FENCE) :]
+            body = rest.lstrip()
+            if not body:
+                return False
+            if body[0] not in _OPENERS:
+                raise JsonStreamError(f"```json 代码块不是以 {{ 或 [ 开头: {body[:20]!r}")
+            self.start = len(self.buffer) - len(body)
+        self.pos = self.start
+        return True
+
+    def _scan(self):
+        buffer = self.buffer
+        for i in range(self.pos, len(buffer)):
+            ch = buffer[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+            if ch == '"':
+                self.in_string = True
+            elif ch in _OPENERS:
+                self.stack.append(_OPENERS[ch])
+            elif ch in _CLOSERS:
+                if not self.stack or self.stack.pop() != ch:
+                    raise JsonStreamError(f"第 {i - self.start} 个字符处括号不匹配: {ch!r}")
+                if not self.stack:
+                    return self._finish(i + 1)
+            elif ch == "`":
+                raise JsonStreamError("代码块在 JSON 闭合之前结束")
+            elif ch not in _BARE_CHARS:
+                raise JsonStreamError(f"第 {i - self.start} 个字符处出现非法字符: {ch!r}")
+        self.pos = len(buffer)
+        return None
+
+    def _finish(self, end):
+        text = self.buffer[self.start : end]
+        try:
+            self.result = json.loads(text, strict=False)
+        except json.JSONDecodeError as e:
+            try:
+                self.result = repair_json(text)
+            except ValueError:
+                raise JsonStreamError(str(e)) from e
+            self.repaired = True
+        self.done = True
+        return self.result
+
+    def close(self):
+        """输出结束时调用，JSON 不完整则抛出 JsonStreamError"""
+        if self.done:
+            return self.result
+        if self.start is None:
+            raise JsonStreamError("输出中没有找到 JSON")
+        raise JsonStreamError("输出在 JSON 闭合之前结束")
+
+
+_FENCED_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)(?:```|$)")
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_STRING_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def _next_significant(text, i):
+    while i < len(text) and text[i] in " \t\r\n":
+        i += 1
+    return text[i] if i < len(text) else ""
+
+
+def repair_json(text):
+    """
+    尽量修复并解析 LLM 输出的 JSON，无法修复时抛出 ValueError
+
+    只在严格解析失败之后调用，修复规则是启发式的：字符串中的引号如果后面紧跟的不是
+    ``, : } ]`` 或结尾，就认为是未转义的内容引号。
+    """
+    match = _FENCED_RE.search(text or "")
+    if match:
+        text = match.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("没有找到 JSON")
+    text = text[min(starts) :]
+
+    out = []
+    stack = []
+    in_string = False
+    escape = False
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+                out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == '"':
+                if _next_significant(text, i + 1) in (",", ":", "}", "]", ""):
+                    in_string = False
+                    out.append(ch)
+                else:
+                    out.append('\\"')
+            else:
+                out.append(_STRING_ESCAPES.get(ch, ch))
+            i += 1
+            continue
+
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in _OPENERS:
+            stack.append(_OPENERS[ch])
+            out.append(ch)
+        elif ch in _CLOSERS:
+            if stack and stack[-1] == ch:
+                stack.pop()
+                out.append(ch)
+                if not stack:
+                    break
+        elif ch == ",":
+            # 去掉尾逗号
+            if _next_significant(text, i + 1) not in ("}", "]", ""):
+                out.append(ch)
+        else:
+            for literal, replacement in _LITERALS.items():
+                if text.startswith(literal, i):
+                    out.append(replacement)
+                    i += len(literal)
+                    break
+            else:
+                out.append(ch)
+                i += 1
+            continue
+        i += 1
+
+    # 输出被截断时补全字符串和括号
+    if in_string:
+        out.append('"')
+    while stack:
+        if out and out[-1] == ",":
+            out.pop()
+        out.append(stack.pop())
+    try:
+        return json.loads("".join(out), strict=False)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON 修复失败: {e}") from e
@@ -0,0 +1,400 @@
+"""
+本地提取高频关键短语，替代 extract_frequent_mentioned_words 中的 LLM 调用
+
+extract_frequent_mentioned_words 每个二级关键词只把 10 条内容交给 LLM 总结高频词。这里在本地处理全部内容：
+
+1. 分词：安装了 jieba 时使用 jieba，否则取中文连续片段中长度 2~6 的字符 n-gram，去掉含停用字的候选；
+   n-gram 左侧或右侧几乎总是同一个字时（如“智能马桶”中的“能马桶”）视为片段，不作为结果；
+2. 打分：以该二级关键词下的内容为目标语料、全部内容为背景语料，按文档频率计算对数似然比（G²），
+   只保留在目标语料中更常见的短语；也可以选 TF-IDF；一级、二级关键词本身不作为结果；
+3. 情感：取短语所在的分句，按正负面词表计数（否定词在前时取反；有 jieba 时按分词结果匹配，
+   否则优先匹配两个字以上的词，单字词只在位于分句末尾或紧跟程度副词时计数），平手时参考内容记录中的情感标注；
+4. 可选地把排名靠前的短语和少量上下文交给 LLM 修正情感（``extract_frequent_terms`` 的 ``refine`` 参数），
+   LLM 的结果经 ``apply_refined_sentiment`` 校验，只改情感，不增删短语。
+
+返回结构与原来的 LLM 结果相同：``[{"keyword": "...", "sentiment": "positive" | "negative"}, ...]``，
+只是关键词为内容中的中文原文，没有 LLM 结果中的英文部分。
+``python analyze_scripts/keyphrases.py [酒店]`` 从 content_index 读取内容，对比本地提取与 LLM 提取的耗时和覆盖率。
+"""
+
+import math
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from content_sampler import item_text
+
+try:
+    import jieba
+except ImportError:  # 未安装时使用字符 n-gram
+    jieba = None
+
+_CJK_RUN_RE = re.compile(r"[一-龥]+")
+_CLAUSE_RE = re.compile(r"[，。！？；、,.!?;~\n\s]+")
+# 含这些字的候选短语大多是虚词组合
+_STOP_CHARS = set("的了是在很也都就和与及或我你他她它们这那有没不吗呢吧啊呀哦嘛个一些还又被把让给对")
+_STOP_WORDS = {"酒店", "我们", "他们", "自己", "这个", "那个", "一个", "什么", "因为", "所以", "但是", "然后", "还是", "感觉", "真的", "非常", "比较", "可以", "就是"}
+
+# 单字词只在 jieba 分出的同一个词时计数（“小”不会匹配“小时”“小区”）；
+# 没有 jieba 时单字词只在位于分句末尾（可带语气词，如“马桶坏了”）或紧跟程度副词（如“有点吵”）时计数
+POSITIVE_WORDS = (
+    "好", "棒", "赞", "不错", "满意", "喜欢", "推荐", "干净", "整洁", "舒服", "舒适",
+    "方便", "便利", "热情", "贴心", "周到", "安静", "宽敞", "好吃", "美味", "丰富",
+    "划算", "超值", "新", "快", "专业", "温馨", "友好", "惊喜", "完美",
+    "很好", "挺好", "很棒", "很新", "全新", "很快",
+)
+NEGATIVE_WORDS = (
+    "差", "脏", "乱", "吵", "旧", "破", "臭", "霉", "异味", "失望", "糟糕", "难吃",
+    "贵", "慢", "小", "挤", "坑", "投诉", "敷衍", "冷漠", "不好", "一般", "麻烦",
+    "坏", "漏", "噪音", "隔音差", "态度差", "后悔", "垃圾",
+    "很差", "太差", "很脏", "脏乱", "很吵", "太吵", "吵闹", "老旧", "破旧", "很贵", "太贵",
+    "偏贵", "很小", "太小", "偏小", "很慢", "太慢", "拥挤",
+)
+_NEGATIONS = ("不", "没", "没有", "未", "别", "不太", "不够")
+# 没有 jieba 时使用的 (两个字以上的词, 1 / -1)，长词在前
+_LEXICON_PHRASES = sorted(
+    [(word, 1) for word in POSITIVE_WORDS if len(word) >= 2]
+    + [(word, -1) for word in NEGATIVE_WORDS if len(word) >= 2],
+    key=lambda item: -len(item[0]),
+)
+# 没有 jieba 时按位置匹配的单字词
+_LEXICON_CHARS = {
+    **{word: 1 for word in POSITIVE_WORDS if len(word) == 1},
+    **{word: -1 for word in NEGATIVE_WORDS if len(word) == 1},
+}
+_DEGREE_ADVERBS = ("很", "太", "有点", "有些", "非常", "特别", "挺", "超", "比较", "十分", "真", "偏", "更", "最")
+_CLAUSE_END_PARTICLES = "了啦的呢啊呀吧哦嘛"
+
+
+def _candidates(text, min_n=2, max_n=6):
+    """一条内容中的候选短语集合（按文档计数，同一条内容中的重复只算一次）"""
+    if jieba is not None:
+        return {
+            word
+            for word in jieba.lcut(text)
+            if len(word) >= 2
+            and _CJK_RUN_RE.fullmatch(word)
+            and word not in _STOP_WORDS
+        }
+    grams = set()
+    for run in _CJK_RUN_RE.findall(text):
+        for n in range(min_n, max_n + 1):
+            for i in range(len(run) - n + 1):
+                gram = run[i : i + n]
+                if gram in _STOP_WORDS or any(ch in _STOP_CHARS for ch in gram):
+                    continue
+                grams.add(gram)
+    return grams
+
+
+def _llr(a, b, c, d):
+    """2x2 列联表的对数似然比 G²：a/b 为目标语料中含/不含该短语的文档数，c/d 为背景语料"""
+    n1, n2 = a + b, c + d
+    p = (a + c) / (n1 + n2)
+    p1, p2 = a / n1, c / n2 if n2 else 0.0
+
+    def ll(k, n, prob):
+        prob = min(max(prob, 1e-12), 1 - 1e-12)
+        return k * math.log(prob) + (n - k) * math.log(1 - prob)
+
+    return 2 * (ll(a, n1, p1) + ll(c, n2, p2) - ll(a, n1, p) - ll(c, n2, p))
+
+
+def _is_fragment(term, texts, ratio=0.8):
+    """term 左侧或右侧的字有 ratio 以上是同一个字时，term 只是更长短语的一部分；停用字、标点和文本首尾算作边界"""
+    for offset in (-1, len(term)):
+        neighbors = Counter()
+        total = 0
+        for text in texts:
+            start = text.find(term)
+            while start != -1:
+                total += 1
+                position = start + offset
+                if 0 <= position < len(text):
+                    ch = text[position]
+                    if _CJK_RUN_RE.match(ch) and ch not in _STOP_CHARS:
+                        neighbors[ch] += 1
+                start = text.find(term, start + 1)
+        if total and neighbors and neighbors.most_common(1)[0][1] / total >= ratio:
+            return True
+    return False
+
+
+def _overlaps(a, b):
+    """a、b 互为子串，或 a 的开头与 b 的结尾（或反之）有两个字以上重叠"""
+    if a in b or b in a:
+        return True
+    for k in range(2, min(len(a), len(b))):
+        if a[:k] == b[-k:] or b[:k] == a[-k:]:
+            return True
+    return False
+
+
+def _clause_sentiment(text, phrase):
+    """包含 phrase 的各分句中正负面词的净计数"""
+    score = 0
+    for clause in _CLAUSE_RE.split(text):
+        if phrase not in clause:
+            continue
+        if jieba is not None:
+            tokens = jieba.lcut(clause)
+            for i, token in enumerate(tokens):
+                sign = 1 if token in POSITIVE_WORDS else -1 if token in NEGATIVE_WORDS else 0
+                if sign:
+                    negated = i > 0 and tokens[i - 1] in _NEGATIONS
+                    score += -sign if negated else sign
+            continue
+        # 从左到右优先匹配较长的词，重叠的匹配（如“很好吃”中的“很好”与“好吃”）只算一次
+        position = 0
+        while position < len(clause):
+            for word, sign in _LEXICON_PHRASES:
+                if clause.startswith(word, position):
+                    break
+            else:
+                word = clause[position]
+                sign = _LEXICON_CHARS.get(word, 0)
+                before = clause[:position]
+                if sign and not (
+                    clause[position + 1 :].strip(_CLAUSE_END_PARTICLES) == ""
+                    or before.endswith(_DEGREE_ADVERBS)
+                ):
+                    sign = 0
+            if sign:
+                negated = any(clause[:position].endswith(neg) for neg in _NEGATIONS)
+                score += -sign if negated else sign
+            position += len(word)
+    return score
+
+
+class KeyphraseExtractor:
+    """
+    :param method: "llr" 或 "tfidf"
+    :param top_k: 每个二级关键词返回的短语数
+    :param min_count: 目标语料中至少出现在这么多条内容中
+    """
+
+    def __init__(self, method="llr", top_k=10, min_count=2):
+        if method not in ("llr", "tfidf"):
+            raise ValueError(f"未知的打分方法: {method}")
+        self.method = method
+        self.top_k = top_k
+        self.min_count = min_count
+        self._doc_terms = {}
+        self._background = Counter()
+        self._background_docs = 0
+
+    def fit(self, keyword_content_map):
+        """以全部内容（按文本去重）作为背景语料"""
+        for s_keywords_map in keyword_content_map.values():
+            for contents in s_keywords_map.values():
+                for item in contents:
+                    text = item_text(item)
+                    if text and text not in self._doc_terms:
+                        terms = _candidates(text)
+                        self._doc_terms[text] = terms
+                        self._background.update(terms)
+        self._background_docs = len(self._doc_terms)
+        return self
+
+    def _terms(self, text):
+        terms = self._doc_terms.get(text)
+        if terms is None:
+            terms = self._doc_terms[text] = _candidates(text)
+        return terms
+
+    def extract(self, contents, exclude=()):
+        """
+        :param contents: 某个二级关键词下的全部内容（字符串或带 sentiment 的字典）
+        :param exclude: 不作为结果的词（一级、二级关键词名称）
+        """
+        texts = list(dict.fromkeys(item_text(item) for item in contents if item_text(item)))
+        if not texts:
+            return []
+        target = Counter()
+        for text in texts:
+            target.update(self._terms(text))
+
+        n1 = len(texts)
+        n_total = max(self._background_docs, n1)
+        scores = {}
+        for term, a in target.items():
+            # 一级、二级关键词本身及其片段不作为结果，但“马桶干净”这类包含关键词的短语保留
+            if a < self.min_count or any(term in ex for ex in exclude):
+                continue
+            if self.method == "tfidf":
+                scores[term] = (a / n1) * math.log((1 + n_total) / (1 + self._background[term]))
+                continue
+            # 背景语料去掉目标语料本身
+            c = max(self._background[term] - a, 0)
+            n2 = max(n_total - n1, 0)
+            if n2 and a / n1 <= c / n2:
+                continue
+            scores[term] = _llr(a, n1 - a, c, n2 - c)
+
+        selected = []
+        for term in sorted(scores, key=lambda t: (-scores[t], -len(t), t)):
+            # 与已选短语互为子串或首尾重叠（同一短语的不同 n-gram 切分）且出现次数接近时只保留一个
+            if any(
+                _overlaps(term, kept) and target[term] <= target[kept] * 1.25
+                for kept in selected
+            ):
+                continue
+            if jieba is None and _is_fragment(term, texts):
+                continue
+            selected.append(term)
+            if len(selected) >= self.top_k:
+                break
+
+        labels = Counter(
+            item.get("sentiment") for item in contents if isinstance(item, dict)
+        )
+        results = []
+        for term in selected:
+            score = sum(_clause_sentiment(text, term) for text in texts if term in text)
+            if score == 0:
+                score = labels["positive"] - labels["negative"]
+            results.append(
+                {"keyword": term, "sentiment": "negative" if score < 0 else "positive"}
+            )
+        return results
+
+
+def _keyword_names(keyword):
+    """关键词名称形如 "卫生间Bathroom"，取出其中的中文部分用于排除"""
+    return [name for name in _CJK_RUN_RE.findall(keyword or "") if len(name) >= 2]
+
+
+def extract_frequent_terms(keyword_content_map, extractor=None, refine=None, max_workers=50):
+    """
+    与 extract_frequent_mentioned_words 相同的输入输出，在本地处理全部内容
+
+    :param refine: refine(p_keyword, s_keyword, terms, contents) -> 修正情感后的 terms，为 None 时不修正；
+                   失败时保留本地的情感标注
+    """
+    extractor = extractor or KeyphraseExtractor()
+    extractor.fit(keyword_content_map)
+    updated_keyword_map = {}
+    for p_keyword, s_keywords_map in keyword_content_map.items():
+        updated_keyword_map[p_keyword] = {}
+        for s_keyword, contents in s_keywords_map.items():
+            updated_keyword_map[p_keyword][s_keyword] = extractor.extract(
+                contents, exclude=_keyword_names(p_keyword) + _keyword_names(s_keyword)
+            )
+    if refine is None:
+        return updated_keyword_map
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for p_keyword, s_map in updated_keyword_map.items():
+            for s_keyword, terms in s_map.items():
+                if terms:
+                    contents = keyword_content_map[p_keyword][s_keyword]
+                    future = executor.submit(refine, p_keyword, s_keyword, terms, contents)
+                    futures[future] = (p_keyword, s_keyword)
+        for done, future in enumerate(as_completed(futures), 1):
+            p_keyword, s_keyword = futures[future]
+            try:
+                refined = future.result()
+                if refined:
+                    updated_keyword_map[p_keyword][s_keyword] = refined
+            except Exception as exc:
+                print(f"\n修正 {p_keyword} -> {s_keyword} 的情感失败: {exc}")
+            print(f"\r高频词情感修正进度: {done}/{len(futures)}", end="", flush=True)
+    print()
+    return updated_keyword_map
+
+
+def apply_refined_sentiment(terms, result):
+    """
+    :param result: 模型返回的 [{"keyword", "sentiment"}, ...]
+    :return: terms 的副本，只更新 keyword 属于 terms、sentiment 合法的项
+    """
+    refined = {}
+    for entry in result if isinstance(result, list) else []:
+        if isinstance(entry, dict) and entry.get("sentiment") in ("positive", "negative"):
+            refined[entry.get("keyword")] = entry["sentiment"]
+    return [
+        {"keyword": term["keyword"], "sentiment": refined.get(term["keyword"], term["sentiment"])}
+        for term in terms
+    ]
+
+
+def term_contexts(term, contents, limit=3, width=30):
+    """短语在内容中的前后文片段，供 LLM 修正情感时参考"""
+    snippets = []
+    for item in contents:
+        text = item_text(item) or ""
+        start = text.find(term)
+        if start != -1:
+            snippets.append(text[max(0, start - width) : start + len(term) + width])
+            if len(snippets) >= limit:
+                break
+    return snippets
+
+
+def compare_with_llm(local_result, llm_result):
+    """
+    以 LLM 结果为参照统计本地结果的覆盖率：LLM 关键词的中文部分与本地短语互为子串即视为命中，
+    命中的再比较情感是否一致
+    """
+    matched = 0
+    total = 0
+    same_sentiment = 0
+    for p_keyword, s_map in llm_result.items():
+        for s_keyword, llm_terms in s_map.items():
+            local_terms = local_result.get(p_keyword, {}).get(s_keyword, [])
+            for llm_term in llm_terms or []:
+                if not isinstance(llm_term, dict):
+                    continue
+                names = _keyword_names(llm_term.get("keyword"))
+                if not names:
+                    continue
+                total += 1
+                for local_term in local_terms:
+                    if any(n in local_term["keyword"] or local_term["keyword"] in n for n in names):
+                        matched += 1
+                        same_sentiment += local_term["sentiment"] == llm_term.get("sentiment")
+                        break
+    coverage = matched / total if total else 0.0
+    agreement = same_sentiment / matched if matched else 0.0
+    print(
+        f"LLM 关键词 {total} 个, 本地结果命中 {matched} 个 (覆盖率 {coverage:.2%}), "
+        f"命中项情感一致率 {agreement:.2%}"
+    )
+    return {"coverage": coverage, "sentiment_agreement": agreement}
+
+
+def benchmark(keyword_content_map, max_secondary_keywords=20):
+    """对同一批二级关键词分别用 LLM 和本地方法提取，比较耗时与覆盖率"""
+    from analyze import extract_frequent_mentioned_words
+
+    subset = {}
+    count = 0
+    for p_keyword, s_map in keyword_content_map.items():
+        for s_keyword, contents in s_map.items():
+            if count >= max_secondary_keywords:
+                break
+            subset.setdefault(p_keyword, {})[s_keyword] = contents
+            count += 1
+    contents_count = sum(len(c) for s_map in subset.values() for c in s_map.values())
+    print(f"对比 {count} 个二级关键词, 共 {contents_count} 条内容")
+
+    start = time.perf_counter()
+    local_result = extract_frequent_terms(subset)
+    local_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    llm_result = extract_frequent_mentioned_words(subset, local=False)
+    llm_seconds = time.perf_counter() - start
+
+    print(f"本地提取耗时 {local_seconds:.2f}s（处理全部内容）, LLM 提取耗时 {llm_seconds:.2f}s（每个关键词抽样）")
+    return compare_with_llm(local_result, llm_result)
+
+
+if __name__ == "__main__":
+    from content_index import get_default_index
+
+    # 可以指定酒店，默认对比全部酒店的内容
+    benchmark(get_default_index().keyword_content_map(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,182 @@
+"""
+关键词体系的本地预筛选
+
+analyze_keywords 每次调用都会把 keywords_with_description.json 中的全部关键词及描述放进 prompt，
+哪怕只是一条 20 个字的回复。这里用关键词名称和描述构建一个字符 n-gram 倒排索引，
+先在本地给每个二级关键词打分，只把得分最高的 top-K 个二级关键词放进 prompt：
+
+* 一级关键词数量少，始终全部保留，作为召回兜底；
+* 文本与任何二级关键词都没有字面重叠（得分过低）时，退回完整的关键词列表，
+  避免只能靠语义间接判断的内容被漏掉；
+* 返回的结构与 keywords_with_description.json 相同，可以直接代入原 prompt 模板。
+
+``evaluate_recall`` 以全量关键词列表下的分析结果（*_analyzed.json 中的 keywords_mentioned）为标注，
+统计不同 top-K 下的召回率与 prompt 长度，运行 ``python analyze_scripts/keyword_index.py`` 查看。
+"""
+
+import math
+import re
+from collections import defaultdict
+
+_CJK_RUN_RE = re.compile(r"[\u4e00-\u9fa5]+")
+_WORD_RE = re.compile(r"[a-z0-9]{3,}")
+
+# 关键词名称中的 n-gram 比描述中的更可靠
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def text_ngrams(text, n_values=(2, 3)):
+    """
+    提取文本特征：中文连续片段的字符 n-gram，以及长度不小于 3 的英文/数字单词。
+    单个汉字区分度太低，不作为特征。
+    """
+    text = (text or "").lower()
+    grams = set()
+    for run in _CJK_RUN_RE.findall(text):
+        for n in n_values:
+            for i in range(len(run) - n + 1):
+                grams.add(run[i : i + n])
+    grams.update(_WORD_RE.findall(text))
+    return grams
+
+
+class TaxonomyIndex:
+    """
+    :param keywords_with_description: ``{"primary_keyword": [{"keyword", "description"}], "secondary_keyword": [...]}``
+    """
+
+    def __init__(self, keywords_with_description):
+        self.taxonomy = keywords_with_description
+        self.primary = list(keywords_with_description.get("primary_keyword", []))
+        self.secondary = list(keywords_with_description.get("secondary_keyword", []))
+        self._postings = self._build_postings(self.secondary)
+
+    @staticmethod
+    def _build_postings(entries):
+        features = []
+        for entry in entries:
+            weights = {}
+            for gram in text_ngrams(entry.get("description", "")):
+                weights[gram] = DESCRIPTION_WEIGHT
+            for gram in text_ngrams(entry.get("keyword", "")):
+                weights[gram] = NAME_WEIGHT
+            features.append(weights)
+
+        doc_freq = defaultdict(int)
+        for weights in features:
+            for gram in weights:
+                doc_freq[gram] += 1
+
+        total = len(entries)
+        postings = defaultdict(list)
+        for entry_id, weights in enumerate(features):
+            for gram, weight in weights.items():
+                idf = math.log((1 + total) / (1 + doc_freq[gram])) + 1
+                postings[gram].append((entry_id, weight * idf))
+        return dict(postings)
+
+    def score(self, text):
+        """返回 {二级关键词下标: 得分}，只包含得分大于 0 的项"""
+        scores = defaultdict(float)
+        for gram in text_ngrams(text):
+            for entry_id, weight in self._postings.get(gram, ()):
+                scores[entry_id] += weight
+        return scores
+
+    def select(self, text, top_k=20, min_score=NAME_WEIGHT):
+        """
+        为文本挑选候选关键词。
+
+        :param top_k: 最多保留的二级关键词数量
+        :param min_score: 最高得分低于该值时认为没有可靠的字面线索，返回 None
+        :return: 与 keywords_with_description.json 结构相同的精简关键词列表；
+                 返回 None 表示应使用完整关键词列表
+        """
+        scores = self.score(text)
+        if not scores or max(scores.values()) < min_score:
+            return None
+        ranked = sorted(scores, key=lambda entry_id: (-scores[entry_id], entry_id))
+        selected = sorted(ranked[:top_k])
+        return {
+            "primary_keyword": self.primary,
+            "secondary_keyword": [self.secondary[i] for i in selected],
+        }
+
+
+def evaluate_recall(analyzed_data, keywords_with_description, top_k_values=(5, 10, 20, 40)):
+    """
+    以全量关键词列表下得到的 keywords_mentioned 为标注，统计预筛选的召回率。
+
+    :param analyzed_data: *_analyzed.json 格式的列表
+    :return: {top_k: {"recall", "fallback_rate", "prompt_chars_ratio"}}
+    """
+    index = TaxonomyIndex(keywords_with_description)
+    full_chars = len(str(keywords_with_description))
+
+    samples = []
+    for hotel in analyzed_data:
+        for post in hotel.get("posts", []):
+            nodes = [(post.get("title", "") + "\n" + post.get("content", ""), post)]
+            nodes += [(reply.get("content", ""), reply) for reply in post.get("replies", [])]
+            for text, node in nodes:
+                mentioned = node.get("keywords_mentioned") or {}
+                labels = {
+                    kw.get("keyword", "").replace(" ", "")
+                    for kw in mentioned.get("secondary_keyword", [])
+                    if isinstance(kw, dict)
+                }
+                labels.discard("")
+                if labels:
+                    samples.append((text, labels))
+
+    results = {}
+    for top_k in top_k_values:
+        hit = 0
+        total = 0
+        fallbacks = 0
+        chars = 0
+        for text, labels in samples:
+            selected = index.select(text, top_k=top_k)
+            total += len(labels)
+            if selected is None:
+                fallbacks += 1
+                hit += len(labels)
+                chars += full_chars
+                continue
+            candidates = {
+                kw.get("keyword", "").replace(" ", "")
+                for kw in selected["secondary_keyword"]
+            }
+            hit += len(labels & candidates)
+            chars += len(str(selected))
+        results[top_k] = {
+            "recall": hit / total if total else 0.0,
+            "fallback_rate": fallbacks / len(samples) if samples else 0.0,
+            "prompt_chars_ratio": chars / (full_chars * len(samples)) if samples else 0.0,
+        }
+    print(f"标注样本数: {len(samples)}, 完整关键词列表长度: {full_chars} 字符")
+    for top_k, r in results.items():
+        print(
+            f"top_k={top_k:<4} 召回率 {r['recall']:.2%}  回退到全量 {r['fallback_rate']:.2%}  "
+            f"关键词部分长度为全量的 {r['prompt_chars_ratio']:.2%}"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    import json
+    import os
+
+    with open("analysis_result/keywords_with_description.json", "r", encoding="utf-8") as f:
+        taxonomy = json.load(f)
+    labeled = []
+    for path in (
+        "analysis_result/flyert_analyzed.json",
+        "analysis_result/wb_analyzed.json",
+        "analysis_result/xhs_analyzed.json",
+    ):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                labeled.extend(json.load(f))
+    evaluate_recall(labeled, taxonomy)
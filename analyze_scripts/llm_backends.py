@@ -0,0 +1,268 @@
+"""
+多后端（多 endpoint / 多 key）的 LLM 调用池
+
+OpenAIService 原先只读取一组 OPENAI_API_KEY / OPENAI_API_BASE，吞吐量受单个 key 的配额限制。
+``BackendPool`` 管理多组 (base_url, key, model)：
+
+* 路由策略：``least_outstanding``（按 在途请求数 / 权重 选最空闲的后端，默认）或 ``weighted``（按权重随机）；
+* 熔断：连续失败 ``failure_threshold`` 次后熔断 ``cooldown`` 秒，到期后放行一个试探请求，成功即恢复；
+* 故障转移：连接错误、超时、429、5xx 会记为后端故障并立即换下一个后端重试，其它错误（如 400）直接抛出；
+* 健康检查：``check_health`` 调用各后端的 models.list，``start_health_checks`` 在后台定时执行。
+
+后端配置通过环境变量 ``OPENAI_BACKENDS`` 指定，值为 JSON 文件路径或 JSON 字符串：
+```
+[
+    {"name": "primary", "base_url": "https://...", "api_key_env": "OPENAI_API_KEY", "weight": 2},
+    {"name": "backup", "base_url": "https://...", "api_key": "sk-...", "models": {"gpt-4.1-mini": "my-deployment"}}
+]
+```
+未设置时退回到 OPENAI_API_KEY / OPENAI_API_BASE 组成的单后端，行为与原来相同。
+"""
+
+import json
+import os
+import random
+import threading
+import time
+
+from openai import APIConnectionError, APIStatusError, OpenAI
+
+
+class NoBackendAvailable(RuntimeError):
+    pass
+
+
+def is_backend_error(exc):
+    """是否应记为后端故障并转移到其它后端"""
+    if isinstance(exc, APIConnectionError):  # 包括 APITimeoutError
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+class Backend:
+    """
+    :param models: 请求的模型名到该后端模型/部署名的映射，未列出的模型名原样使用
+    :param max_retries: openai 客户端自身的重试次数；多后端时设为 0，由池负责故障转移
+    """
+
+    def __init__(
+        self,
+        name,
+        base_url=None,
+        api_key=None,
+        weight=1.0,
+        models=None,
+        max_retries=2,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.weight = weight
+        self.models = models or {}
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries)
+
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0  # 熔断到期时间，0 表示未熔断
+        self.probing = False  # 熔断到期后是否已放行试探请求
+
+    def resolve_model(self, model):
+        return self.models.get(model, model)
+
+    def state(self, now=None):
+        now = time.monotonic() if now is None else now
+        if not self.open_until:
+            return "closed"
+        if now < self.open_until:
+            return "open"
+        return "half_open"
+
+
+class BackendPool:
+    def __init__(
+        self,
+        backends,
+        strategy="least_outstanding",
+        failure_threshold=3,
+        cooldown=30.0,
+    ):
+        if not backends:
+            raise ValueError("至少需要一个后端")
+        if strategy not in ("least_outstanding", "weighted"):
+            raise ValueError(f"未知的路由策略: {strategy}")
+        self.backends = list(backends)
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._health_thread = None
+
+    def _available(self, exclude):
+        now = time.monotonic()
+        candidates = []
+        for backend in self.backends:
+            if backend in exclude:
+                continue
+            state = backend.state(now)
+            if state == "closed" or (state == "half_open" and not backend.probing):
+                candidates.append(backend)
+        if not candidates:
+            # 全部熔断时不直接失败，退回到所有未尝试过的后端
+            candidates = [b for b in self.backends if b not in exclude]
+        return candidates
+
+    def _acquire(self, exclude):
+        with self._lock:
+            candidates = self._available(exclude)
+            if not candidates:
+                raise NoBackendAvailable("所有后端都已尝试失败")
+            if self.strategy == "weighted":
+                backend = random.choices(
+                    candidates, weights=[b.weight for b in candidates]
+                )[0]
+            else:
+                lowest = min(b.outstanding / b.weight for b in candidates)
+                backend = random.choice(
+                    [b for b in candidates if b.outstanding / b.weight == lowest]
+                )
+            if backend.state() == "half_open":
+                backend.probing = True
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def _release(self, backend, failed):
+        with self._lock:
+            backend.outstanding -= 1
+            self._mark(backend, failed)
+
+    def _mark(self, backend, failed):
+        backend.probing = False
+        if failed:
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            if (
+                backend.consecutive_failures >= self.failure_threshold
+                or backend.open_until
+            ):
+                # 达到阈值或试探请求失败，（重新）熔断
+                backend.open_until = time.monotonic() + self.cooldown
+        else:
+            backend.consecutive_failures = 0
+            backend.open_until = 0.0
+
+    def call(self, fn):
+        """
+        在选出的后端上执行 fn(backend)，后端故障时换下一个后端重试
+
+        :return: fn 的返回值
+        """
+        tried = set()
+        while True:
+            backend = self._acquire(tried)
+            try:
+                result = fn(backend)
+            except Exception as exc:
+                failed = is_backend_error(exc)
+                self._release(backend, failed)
+                tried.add(backend)
+                if failed and len(tried) < len(self.backends):
+                    print(f"后端 {backend.name} 调用失败，切换后端重试: {exc}")
+                    continue
+                raise
+            self._release(backend, False)
+            return result
+
+    def check_health(self, timeout=10):
+        """逐个后端调用 models.list，返回 {name: 是否健康}"""
+        results = {}
+        for backend in self.backends:
+            try:
+                backend.client.models.list(timeout=timeout)
+                healthy = True
+            except Exception as exc:
+                healthy = not is_backend_error(exc)
+            with self._lock:
+                if healthy:
+                    self._mark(backend, False)
+                else:
+                    # 健康检查失败直接熔断
+                    backend.consecutive_failures = self.failure_threshold - 1
+                    self._mark(backend, True)
+            results[backend.name] = healthy
+        return results
+
+    def start_health_checks(self, interval=60):
+        if self._health_thread is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=loop, daemon=True)
+        self._health_thread.start()
+
+    def report(self):
+        print("LLM 后端状态:")
+        with self._lock:
+            for b in self.backends:
+                print(
+                    f"- {b.name}: {b.state()}, 请求 {b.requests} 次, 失败 {b.failures} 次, "
+                    f"在途 {b.outstanding}"
+                )
+
+
+def load_backend_configs():
+    """读取 OPENAI_BACKENDS，未设置时返回由 OPENAI_API_KEY / OPENAI_API_BASE 组成的单后端配置"""
+    raw = os.environ.get("OPENAI_BACKENDS")
+    if not raw:
+        return [
+            {
+                "name": "default",
+                "base_url": os.environ.get("OPENAI_API_BASE"),
+                "api_key": os.environ.get("OPENAI_API_KEY"),
+            }
+        ]
+    if os.path.exists(raw):
+        with open(raw, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(raw)
+
+
+def build_pool(configs, **kwargs):
+    backends = []
+    for i, config in enumerate(configs):
+        config = dict(config)
+        api_key_env = config.pop("api_key_env", None)
+        if api_key_env:
+            config["api_key"] = os.environ.get(api_key_env)
+        config.setdefault("name", f"backend-{i}")
+        # 多后端时由池负责故障转移，不让客户端在同一个后端上反复重试
+        config.setdefault("max_retries", 2 if len(configs) == 1 else 0)
+        backends.append(Backend(**config))
+    return BackendPool(backends, **kwargs)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """进程内共享的后端池，首次使用时按环境变量创建"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = build_pool(
+                load_backend_configs(),
+                strategy=os.environ.get("OPENAI_BACKEND_STRATEGY", "least_outstanding"),
+            )
+            interval = os.environ.get("OPENAI_HEALTH_CHECK_INTERVAL")
+            if interval:
+                _default_pool.start_health_checks(float(interval))
+        return _default_pool
@@ -0,0 +1,164 @@
+"""
+LLM 调用的对冲请求（hedged requests）
+
+infer() 的 timeout 为 300 秒，一个卡住的请求就会占住一个工作线程好几分钟，表现为进度条最后 1% 迟迟走不完。
+开启对冲后：
+
+* 请求在后台线程中发出，调用方最多等待“近期请求耗时的第 ``percentile`` 分位数”；
+* 超过该时间仍未返回时，再发出一个相同的请求，取最先返回的合法 JSON，其余请求通过 cancel 事件放弃
+  （流式请求会立即关闭连接，非流式请求在后台自然结束，结果被丢弃）；
+* 额外请求数不超过主请求数的 ``max_extra_ratio``，避免服务端整体变慢时对冲把请求量翻倍。
+
+``HedgePolicy.report()`` 打印调用方实际感受到的 p50/p95/p99 耗时、对冲次数和对冲请求胜出次数，
+与 llm_stub_server.py 的基准测试配合查看 p99 的改善。
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+
+
+def percentile(values, p):
+    """p 取 0~1，最近秩法"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class HedgePolicy:
+    """
+    :param percentile: 等待主请求的时间取近期耗时的该分位数
+    :param min_delay: 对冲前的最短等待时间（秒）
+    :param initial_delay: 样本不足 ``min_samples`` 时使用的等待时间（秒）
+    :param max_extra_ratio: 额外请求数占主请求数的上限
+    :param max_attempts: 单次调用最多同时发出的请求数（含主请求）
+    :param window: 统计耗时分位数的滑动窗口大小
+    """
+
+    def __init__(
+        self,
+        percentile=0.95,
+        min_delay=1.0,
+        initial_delay=30.0,
+        max_extra_ratio=0.1,
+        max_attempts=2,
+        window=500,
+        min_samples=20,
+    ):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.max_extra_ratio = max_extra_ratio
+        self.max_attempts = max_attempts
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)  # 主请求的耗时（对冲胜出时为下界），用于计算对冲时机
+        self._observed = []  # 调用方感受到的耗时，用于报告
+        self.primary_calls = 0
+        self.extra_calls = 0
+        self.hedge_wins = 0
+
+    def delay(self):
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            return max(self.min_delay, percentile(self._latencies, self.percentile))
+
+    def _try_reserve_extra(self):
+        with self._lock:
+            if self.extra_calls + 1 > self.max_extra_ratio * self.primary_calls:
+                return False
+            self.extra_calls += 1
+            return True
+
+    def run(self, attempt):
+        """
+        执行一次（可能被对冲的）调用
+
+        :param attempt: attempt(cancel_event) -> result，抛出异常表示这次请求无效
+        :return: 最先成功的请求结果；已发出的请求都失败时抛出最后一个异常，由调用方决定是否重试
+        """
+        with self._lock:
+            self.primary_calls += 1
+        start = time.perf_counter()
+        results = queue.Queue()
+        cancel = threading.Event()
+
+        def launch(index):
+            def target():
+                launched = time.perf_counter()
+                try:
+                    value = attempt(cancel)
+                except Exception as exc:
+                    results.put((index, False, exc, None))
+                else:
+                    results.put((index, True, value, time.perf_counter() - launched))
+
+            # 守护线程：被放弃的请求不会阻止进程退出
+            threading.Thread(target=target, daemon=True).start()
+
+        launch(0)
+        launched = 1
+        pending = 1
+        can_hedge = self.max_attempts > 1
+        next_hedge_at = start + self.delay()
+        last_error = None
+        try:
+            while pending:
+                timeout = None
+                if can_hedge and launched < self.max_attempts:
+                    timeout = max(0.0, next_hedge_at - time.perf_counter())
+                try:
+                    index, ok, value, latency = results.get(timeout=timeout)
+                except queue.Empty:
+                    # 超过对冲时机仍未返回，额度允许时再发一个相同的请求
+                    if self._try_reserve_extra():
+                        launch(launched)
+                        launched += 1
+                        pending += 1
+                        next_hedge_at = time.perf_counter() + self.delay()
+                    else:
+                        can_hedge = False
+                    continue
+
+                pending -= 1
+                if ok:
+                    elapsed = time.perf_counter() - start
+                    with self._lock:
+                        if index > 0:
+                            # 主请求被放弃，其耗时至少为 elapsed，记为该下界（删失样本）；
+                            # 只记胜出请求的耗时会不断去掉长尾样本，分位数越来越小，对冲越来越早
+                            self._latencies.append(elapsed)
+                            self.hedge_wins += 1
+                        else:
+                            self._latencies.append(latency)
+                        self._observed.append(elapsed)
+                    return value
+                last_error = value
+            raise last_error
+        finally:
+            cancel.set()
+
+    def stats(self):
+        with self._lock:
+            observed = list(self._observed)
+            return {
+                "calls": self.primary_calls,
+                "extra_calls": self.extra_calls,
+                "hedge_wins": self.hedge_wins,
+                "p50": percentile(observed, 0.5),
+                "p95": percentile(observed, 0.95),
+                "p99": percentile(observed, 0.99),
+            }
+
+    def report(self, label="对冲请求"):
+        stats = self.stats()
+        print(
+            f"{label}: 调用 {stats['calls']} 次, 额外请求 {stats['extra_calls']} 次 "
+            f"(对冲胜出 {stats['hedge_wins']} 次), 耗时 p50 {stats['p50']:.2f}s / "
+            f"p95 {stats['p95']:.2f}s / p99 {stats['p99']:.2f}s"
+        )
+        return stats
@@ -0,0 +1,202 @@
+"""
+本地的 OpenAI 兼容 stub 服务
+
+只实现 ``POST /v1/chat/completions``（含 stream=true 的 SSE 输出）和用于健康检查的 ``GET /v1/models``，按长尾分布随机延迟后返回固定的 JSON，
+用于在不调用真实 API 的情况下测试并发、对冲等调用策略：
+```
+python analyze_scripts/llm_stub_server.py            # 对比开启对冲前后的耗时分位数
+```
+也可以单独启动，把 OPENAI_API_BASE 指向 http://127.0.0.1:<port>/v1 后运行分析脚本。
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CONTENT = """```json
+{"is_hotel_related": true, "is_hotel_related_reason": "stub", "is_ad": false, "is_ad_reason": "stub", "confidence": 0.9}
+```"""
+
+
+class StubConfig:
+    """
+    :param base_latency: 正常请求的延迟范围（秒）
+    :param tail_probability: 请求落入长尾的概率
+    :param tail_latency: 长尾请求的延迟（秒）
+    :param content: 返回的 message.content
+    :param error_rate: 返回 503 的概率，用于测试故障转移
+    """
+
+    def __init__(
+        self,
+        base_latency=(0.05, 0.15),
+        tail_probability=0.03,
+        tail_latency=3.0,
+        content=DEFAULT_CONTENT,
+        error_rate=0.0,
+        seed=None,
+    ):
+        self.base_latency = base_latency
+        self.tail_probability = tail_probability
+        self.tail_latency = tail_latency
+        self.content = content
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def next_latency(self):
+        with self._lock:
+            self.requests += 1
+            if self._random.random() < self.tail_probability:
+                return self.tail_latency
+            return self._random.uniform(*self.base_latency)
+
+    def should_fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+
+def _completion(model, content):
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": 100,
+            "completion_tokens": len(content),
+            "total_tokens": 100 + len(content),
+        },
+    }
+
+
+def _chunk(model, delta, usage=None):
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": None}],
+        "usage": usage,
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if not self.path.rstrip("/").endswith("/models"):
+            self.send_error(404)
+            return
+        if self.config.should_fail():
+            self.send_error(503, "stub failure")
+            return
+        payload = json.dumps(
+            {
+                "object": "list",
+                "data": [{"id": "stub", "object": "model", "created": 0, "owned_by": "stub"}],
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        time.sleep(self.config.next_latency())
+        if self.config.should_fail():
+            self.send_error(503, "stub failure")
+            return
+        model = body.get("model", "stub")
+        content = self.config.content
+        try:
+            if body.get("stream"):
+                self._send_stream(model, content)
+            else:
+                payload = json.dumps(_completion(model, content)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前关闭了连接（流式解析提前结束或对冲请求被放弃）
+            pass
+
+    def _send_stream(self, model, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i in range(0, len(content), 8):
+            event = _chunk(model, {"content": content[i : i + 8]})
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        usage = {"prompt_tokens": 100, "completion_tokens": len(content)}
+        self.wfile.write(f"data: {json.dumps(_chunk(model, {}, usage))}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认的 listen backlog 只有 5，高并发时新连接会因为 SYN 重传多等 1 秒，干扰耗时统计
+    request_queue_size = 256
+
+
+def start_stub_server(config=None, port=0):
+    """在后台线程中启动 stub 服务，返回 (server, base_url)"""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config or StubConfig()})
+    server = StubServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def benchmark_hedging(calls=400, concurrency=32):
+    """同一个 stub 服务上分别不开启/开启对冲，各跑 calls 次调用，对比调用方感受到的耗时分位数"""
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+
+    from llm_hedging import HedgePolicy
+    from utils import OpenAIService
+
+    server, base_url = start_stub_server(StubConfig(seed=0))
+    os.environ["OPENAI_API_BASE"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    try:
+        # max_attempts=1 时不会对冲，只用来统计耗时
+        for label, policy in (
+            ("不对冲", HedgePolicy(max_attempts=1)),
+            ("对冲 p95", HedgePolicy(percentile=0.95, min_delay=0.2, initial_delay=1.0)),
+        ):
+            service = OpenAIService()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(
+                    executor.map(
+                        lambda _: service.infer("stub", "stub", hedge=policy),
+                        range(calls),
+                    )
+                )
+            policy.report(label)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    benchmark_hedging()
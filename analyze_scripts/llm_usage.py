@@ -0,0 +1,110 @@
+"""
+LLM 调用的 token 用量统计
+
+OpenAIService 每次调用成功后把 completion.usage 记录到 ``usage_stats``，按 (阶段, 模型) 汇总
+prompt / completion token 数以及命中服务端 prompt 缓存的 token 数（``prompt_tokens_details.cached_tokens``），
+用于观察缓存命中率。
+
+``count`` 记录 JSON 解析相关的事件：修复成功（省掉一次重新请求）、格式错误重试、schema 校验失败重试。
+"""
+
+import threading
+from collections import defaultdict
+
+
+def _usage_value(usage, *path):
+    """从 usage 对象（或字典）中按路径取整数值，缺失时返回 0"""
+    value = usage
+    for name in path:
+        if value is None:
+            return 0
+        if isinstance(value, dict):
+            value = value.get(name)
+        else:
+            value = getattr(value, name, None)
+    return value or 0
+
+
+class UsageStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = defaultdict(
+            lambda: {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "cached_tokens": 0,
+                "completion_tokens": 0,
+            }
+        )
+        self._events = defaultdict(int)
+
+    def count(self, event, n=1):
+        with self._lock:
+            self._events[event] += n
+
+    def events(self):
+        with self._lock:
+            return dict(self._events)
+
+    def record(self, usage, model, stage=None):
+        if usage is None:
+            return
+        with self._lock:
+            totals = self._totals[(stage or "-", model)]
+            totals["calls"] += 1
+            totals["prompt_tokens"] += _usage_value(usage, "prompt_tokens")
+            totals["cached_tokens"] += _usage_value(
+                usage, "prompt_tokens_details", "cached_tokens"
+            )
+            totals["completion_tokens"] += _usage_value(usage, "completion_tokens")
+
+    def snapshot(self):
+        with self._lock:
+            return {key: dict(value) for key, value in self._totals.items()}
+
+    def cached_ratio(self, stage=None, model=None):
+        """命中缓存的 prompt token 占全部 prompt token 的比例，可按阶段/模型过滤"""
+        prompt_tokens = 0
+        cached_tokens = 0
+        for (s, m), totals in self.snapshot().items():
+            if stage is not None and s != stage:
+                continue
+            if model is not None and m != model:
+                continue
+            prompt_tokens += totals["prompt_tokens"]
+            cached_tokens += totals["cached_tokens"]
+        return cached_tokens / prompt_tokens if prompt_tokens else 0.0
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+            self._events.clear()
+
+    def report(self):
+        snapshot = self.snapshot()
+        events = self.events()
+        if events:
+            print(
+                f"JSON 修复成功（避免重新请求）: {events.get('json_repaired', 0)} 次, "
+                f"格式错误重试: {events.get('json_retry', 0)} 次, "
+                f"schema 校验失败重试: {events.get('schema_retry', 0)} 次"
+            )
+        if not snapshot:
+            print("暂无 LLM 调用用量记录")
+            return
+        print("LLM 用量统计:")
+        for (stage, model), totals in sorted(snapshot.items()):
+            ratio = (
+                totals["cached_tokens"] / totals["prompt_tokens"]
+                if totals["prompt_tokens"]
+                else 0
+            )
+            print(
+                f"- [{stage}] {model}: 调用 {totals['calls']} 次, "
+                f"prompt {totals['prompt_tokens']} tokens (缓存命中 {totals['cached_tokens']}, {ratio:.2%}), "
+                f"completion {totals['completion_tokens']} tokens"
+            )
+        print(f"总缓存命中率: {self.cached_ratio():.2%}")
+
+
+usage_stats = UsageStats()
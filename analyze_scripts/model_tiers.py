@@ -0,0 +1,124 @@
+"""
+按阶段的模型分级策略
+
+原先所有调用都使用 gpt-4.1-mini，只有 analyze_smart_hotel.py 用 gpt-4.1 跑一次大请求。
+``TieredModelPolicy`` 为一个阶段配置若干档模型，从最便宜、最快的一档开始：
+
+* 输出无效（调用失败、JSON 无法解析）或 ``is_confident(result)`` 判定为低置信度时，升级到下一档重新请求；
+* 最后一档的结果无论置信度如何都直接采用；
+* 按档位记录调用次数、耗时、升级率，token 用量取自 usage_stats 中该阶段、该模型的记录，
+  再按 ``MODEL_PRICES`` 估算费用，``report()`` 打印出来用于调整策略。
+
+``STAGE_MODEL_POLICIES`` 是默认配置，analyze.py 在设置环境变量 USE_MODEL_TIERING=1 时启用。
+"""
+
+import threading
+import time
+
+from llm_usage import usage_stats
+
+# 美元 / 百万 token：(prompt, completion)
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+
+class ModelTier:
+    """temperature 为 None 时使用 inference_profiles 中该阶段的设置"""
+
+    def __init__(self, model, temperature=None):
+        self.model = model
+        self.temperature = temperature
+
+
+class TieredModelPolicy:
+    """
+    :param stage: 阶段名，同时作为 usage_stats 中的阶段
+    :param tiers: 从便宜到昂贵排列的 ModelTier 列表
+    :param is_confident: is_confident(result) -> bool，为 None 时只在结果无效时升级
+    """
+
+    def __init__(self, stage, tiers, is_confident=None):
+        self.stage = stage
+        self.tiers = list(tiers)
+        self.is_confident = is_confident
+        self._lock = threading.Lock()
+        self._stats = {
+            tier.model: {"calls": 0, "seconds": 0.0, "invalid": 0, "escalations": 0}
+            for tier in self.tiers
+        }
+
+    def run(self, call):
+        """
+        :param call: call(tier) -> 解析后的结果，失败时返回 None 或抛出异常
+        :return: 第一个有效且高置信度的结果，或最后一档的结果
+        """
+        result = None
+        for i, tier in enumerate(self.tiers):
+            start = time.perf_counter()
+            try:
+                result = call(tier)
+            except Exception as exc:
+                print(f"模型 {tier.model} 调用失败: {exc}")
+                result = None
+            elapsed = time.perf_counter() - start
+
+            last = i == len(self.tiers) - 1
+            valid = result is not None
+            accepted = valid and (
+                last or self.is_confident is None or self.is_confident(result)
+            )
+            with self._lock:
+                stats = self._stats[tier.model]
+                stats["calls"] += 1
+                stats["seconds"] += elapsed
+                stats["invalid"] += not valid
+                stats["escalations"] += not accepted and not last
+            if accepted:
+                return result
+        return result
+
+    def report(self):
+        usage = usage_stats.snapshot()
+        print(f"[{self.stage}] 模型分级统计:")
+        total_cost = 0.0
+        for tier in self.tiers:
+            with self._lock:
+                stats = dict(self._stats[tier.model])
+            calls = stats["calls"]
+            tokens = usage.get((self.stage, tier.model), {})
+            prompt_price, completion_price = MODEL_PRICES.get(tier.model, (0.0, 0.0))
+            cost = (
+                tokens.get("prompt_tokens", 0) * prompt_price
+                + tokens.get("completion_tokens", 0) * completion_price
+            ) / 1_000_000
+            total_cost += cost
+            print(
+                f"- {tier.model}: 调用 {calls} 次, 平均耗时 "
+                f"{stats['seconds'] / calls if calls else 0:.2f}s, 无效 {stats['invalid']} 次, "
+                f"升级率 {stats['escalations'] / calls if calls else 0:.2%}, "
+                f"prompt {tokens.get('prompt_tokens', 0)} / completion {tokens.get('completion_tokens', 0)} tokens, "
+                f"估算费用 ${cost:.4f}"
+            )
+        print(f"估算总费用: ${total_cost:.4f}")
+
+
+def is_confident_hotel_related(result, threshold=0.7):
+    """is_hotel_related 的结果必须是布尔值，confidence 缺失时视为高置信度"""
+    if not isinstance(result, dict) or not isinstance(result.get("is_hotel_related"), bool):
+        return False
+    confidence = result.get("confidence")
+    if not isinstance(confidence, (int, float)) or isinstance(confidence, bool):
+        return True
+    return confidence >= threshold
+
+
+STAGE_MODEL_POLICIES = {
+    "is_hotel_related": TieredModelPolicy(
+        "is_hotel_related",
+        [ModelTier("gpt-4.1-nano"), ModelTier("gpt-4.1-mini")],
+        is_confident=is_confident_hotel_related,
+    ),
+}
@@ -0,0 +1,166 @@
+"""
+prompt.py 中各 prompt 返回结果的 JSON schema
+
+传给 ``OpenAIService.infer(response_schema=...)`` 后会以 ``response_format`` 的 json_schema 模式请求，
+服务端按 schema 约束输出；返回后仍在本地用 ``validate`` 校验一遍，兼容不支持 structured output 的代理。
+
+structured output 要求最外层是 object，返回列表的 prompt（用户关注点等）用 ``{"items": [...]}`` 包一层，
+``OutputSchema.unwrap`` 还原为原来的列表，调用方拿到的结构与之前相同。
+"""
+
+
+def _string():
+    return {"type": "string"}
+
+
+def _object(properties):
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def _array(items):
+    return {"type": "array", "items": items}
+
+
+_KEYWORD_MENTION = _object(
+    {
+        "keyword": _string(),
+        "sentiment": {"type": "string", "enum": ["positive", "negative", "neutral"]},
+        "reason": _string(),
+    }
+)
+
+_TYPICAL_REVIEW = _object({"title": _string(), "points": _array(_string())})
+
+
+class OutputSchema:
+    """
+    :param name: response_format 中的 schema 名称
+    :param schema: JSON schema（最外层为 object）
+    :param unwrap_key: 不为 None 时，返回结果取该字段的值
+    """
+
+    def __init__(self, name, schema, unwrap_key=None):
+        self.name = name
+        self.schema = schema
+        self.unwrap_key = unwrap_key
+
+    def response_format(self):
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": self.name, "strict": True, "schema": self.schema},
+        }
+
+    def unwrap(self, value):
+        if self.unwrap_key is None:
+            return value
+        if isinstance(value, list):
+            # 模型忽略了外层包装，直接返回了列表
+            return value
+        return value[self.unwrap_key]
+
+    def validate(self, value):
+        """返回错误信息列表，为空表示通过校验；列表会先按 unwrap_key 包装再校验"""
+        if self.unwrap_key is not None and isinstance(value, list):
+            value = {self.unwrap_key: value}
+        errors = []
+        _validate(value, self.schema, "$", errors)
+        return errors
+
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "integer": int,
+    "number": (int, float),
+}
+
+
+def _validate(value, schema, path, errors):
+    expected = schema.get("type")
+    if expected is not None:
+        # bool 是 int 的子类，数值类型不接受布尔值
+        if not isinstance(value, _TYPES[expected]) or (
+            expected in ("integer", "number") and isinstance(value, bool)
+        ):
+            errors.append(f"{path} 应为 {expected}，实际为 {type(value).__name__}")
+            return
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path} 的值 {value!r} 不在 {schema['enum']} 中")
+    if expected == "object":
+        for key in schema.get("required", ()):
+            if key not in value:
+                errors.append(f"{path} 缺少字段 {key}")
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in value:
+                _validate(value[key], sub_schema, f"{path}.{key}", errors)
+    elif expected == "array" and "items" in schema:
+        for i, item in enumerate(value):
+            _validate(item, schema["items"], f"{path}[{i}]", errors)
+
+
+IS_HOTEL_RELATED_SCHEMA = OutputSchema(
+    "is_hotel_related",
+    _object(
+        {
+            "is_hotel_related": {"type": "boolean"},
+            "is_hotel_related_reason": _string(),
+            "is_ad": {"type": "boolean"},
+            "is_ad_reason": _string(),
+            "confidence": {"type": "number"},
+        }
+    ),
+)
+
+KEYWORDS_MENTIONED_SCHEMA = OutputSchema(
+    "keywords_mentioned",
+    _object(
+        {
+            "keywords_mentioned": _object(
+                {
+                    "primary_keyword": _array(_KEYWORD_MENTION),
+                    "secondary_keyword": _array(_KEYWORD_MENTION),
+                }
+            )
+        }
+    ),
+)
+
+TYPICAL_REVIEWS_SCHEMA = OutputSchema(
+    "typical_reviews",
+    _object(
+        {
+            "typical_positive_reviews": _array(_TYPICAL_REVIEW),
+            "typical_negative_reviews": _array(_TYPICAL_REVIEW),
+        }
+    ),
+)
+
+# extract_user_focus / merge_user_focus / distribute_user_focus 都返回字符串列表
+USER_FOCUS_SCHEMA = OutputSchema(
+    "user_focus", _object({"items": _array(_string())}), unwrap_key="items"
+)
+
+# 批量分配：每条内容的编号及其提及的关注点
+USER_FOCUS_BATCH_SCHEMA = OutputSchema(
+    "user_focus_batch",
+    _object(
+        {
+            "results": _array(
+                _object({"index": {"type": "integer"}, "keywords": _array(_string())})
+            )
+        }
+    ),
+    unwrap_key="results",
+)
+
+USER_FOCUS_SUMMARY_SCHEMA = OutputSchema(
+    "user_focus_summary",
+    _object({"advantage": _array(_string()), "disadvantage": _array(_string())}),
+)
@@ -1,9 +1,27 @@
+"""
+统计各平台的帖子数量，生成 analysis_result/数据量统计.xlsx，每个平台一个sheet
+
+* ``count_posts``：统计一个平台并替换文件中该平台的sheet；
+* ``count_all_posts``：各平台在多个进程中并行统计，统计的平台的sheet一次写入（其它平台的sheet保留），
+  不再为每个平台重新读取整个工作簿。
+```
+python analyze_scripts/posts_count.py [平台 ...]
+```
+"""
+
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
 from utils import *
 import pandas as pd
 import json  # Ensure json is imported
 
+POSTS_COUNT_PATH = "analysis_result/数据量统计.xlsx"
+PLATFORMS = ("xhs", "wb", "flyert")
 
-def generate_excel_for_count_posts(data, platform):
+
+def _count_table(data, platform):
+    """一个平台sheet的表格"""
     # 将数据转换为DataFrame
     df = pd.DataFrame.from_dict(data, orient="index")
 
@@ -58,10 +76,16 @@ def generate_excel_for_count_posts(data, platform):
             ]
         ]
 
+    return df
+
+
+def generate_excel_for_count_posts(data, platform):
+    df = _count_table(data, platform)
+
     # 使用ExcelWriter来处理多个sheet的写入
     try:
         with pd.ExcelWriter(
-            "analysis_result/数据量统计.xlsx",
+            POSTS_COUNT_PATH,
             mode="a",
             engine="openpyxl",
             if_sheet_exists="replace",
@@ -69,19 +93,20 @@ def generate_excel_for_count_posts(data, platform):
             df.to_excel(writer, sheet_name=f"{platform}帖子统计")
     except FileNotFoundError:
         # 如果文件不存在，创建新文件
-        df.to_excel("analysis_result/数据量统计.xlsx", sheet_name=f"{platform}帖子统计")
+        df.to_excel(POSTS_COUNT_PATH, sheet_name=f"{platform}帖子统计")
 
-    print("Excel文件已生成：analysis_result/数据量统计.xlsx")
+    print(f"Excel文件已生成：{POSTS_COUNT_PATH}")
 
 
-def count_posts(platform):
+def _count_platform(platform):
+    """统计一个平台各酒店的帖子数量，没有原始数据时返回 None"""
     filter = PostsFilter()
     raw_data = get_raw_data(f"raw_data/{platform}.json")
-    filtered_data = filter.filter_by_time(raw_data)
-
     if not raw_data:
         return None
 
+    filtered_data = filter.filter_by_time(raw_data)
+
     count = {}
     for hotel in raw_data:
         latest_time = 0
@@ -147,6 +172,10 @@ def count_posts(platform):
 
         # 获取对应的 analyzed_hotel 数据
         analyzed_hotel = analyzed_hotel_map.get(hotel_name)
+        # 同一个 link 有多个帖子时与原来一样取第一个
+        analyzed_posts = {}
+        for ap in (analyzed_hotel or {}).get("posts", []):
+            analyzed_posts.setdefault(ap.get("link"), ap)
 
         # --- 修正开始 ---
         # 在这里一次性计算该酒店的软文数量 (ad_count)
@@ -167,12 +196,8 @@ def count_posts(platform):
 
             # 统计酒店相关帖子和评论 (使用 analyzed_hotel)
             if analyzed_hotel:
-                # 查找与当前 post 匹配的 analyzed_post
-                matching_analyzed_post = None
-                for ap in analyzed_hotel.get("posts", []):
-                    if ap.get("link") == post.get("link"):  # 假设 link 是唯一标识符
-                        matching_analyzed_post = ap
-                        break
+                # 查找与当前 post 匹配的 analyzed_post（link 是唯一标识符）
+                matching_analyzed_post = analyzed_posts.get(post.get("link"))
 
                 if matching_analyzed_post and matching_analyzed_post.get(
                     "is_hotel_related", False
@@ -201,13 +226,59 @@ def count_posts(platform):
                     "内容不完整帖子占比有效帖子"
                 ] = f"{round(incomplete_posts/posts_count * 100)}%"
 
+    return count
+
+
+def count_posts(platform):
+    count = _count_platform(platform)
+    if count is None:
+        return None
+
     generate_excel_for_count_posts(count, platform)
     print("共有{}个酒店".format(len(count)))
     print("酒店列表： ", list(count.keys()))
 
 
+def _count_platform_table(platform):
+    # 一个平台统计失败时只跳过该平台，不影响其它平台的sheet
+    try:
+        count = _count_platform(platform)
+        return platform, None if count is None else _count_table(count, platform)
+    except Exception as exc:
+        print(f"统计 {platform} 的帖子数量失败: {exc}")
+        return platform, None
+
+
+def count_all_posts(platforms=PLATFORMS, path=POSTS_COUNT_PATH, max_workers=None):
+    """
+    各平台在多个进程中并行统计，统计完成后打开 path 一次，替换这些平台的sheet，其它平台的sheet保留
+
+    :param max_workers: 进程数，为 1 时在当前进程中依次统计
+    :return: {平台: DataFrame}，没有原始数据或统计失败的平台不在其中
+    """
+    platforms = list(platforms)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(platforms))
+    if max_workers <= 1:
+        results = list(map(_count_platform_table, platforms))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_count_platform_table, platforms))
+    tables = {platform: df for platform, df in results if df is not None}
+    if not tables:
+        print("没有可以统计的平台数据")
+        return tables
+
+    if os.path.exists(path):
+        writer = pd.ExcelWriter(path, mode="a", engine="openpyxl", if_sheet_exists="replace")
+    else:
+        writer = pd.ExcelWriter(path, mode="w", engine="openpyxl")
+    with writer:
+        for platform, df in tables.items():
+            df.to_excel(writer, sheet_name=f"{platform}帖子统计")
+            print(f"{platform}: 共有{len(df)}个酒店")
+    print(f"Excel文件已生成：{path}")
+    return tables
+
+
 if __name__ == "__main__":
-    pass
-    # count_posts("xhs")
-    # count_posts("wb")
-    # count_posts("flyert")
+    count_all_posts(sys.argv[1:] or PLATFORMS)
@@ -1,10 +1,20 @@
 from utils import Keywords
 from pprint import pprint
 
+# analyze_post_system_prompt / analyze_reply_system_prompt 中，与酒店无关的关键词列表放在最前面，
+# {hotel} 等随任务变化的内容放在其后，这样所有酒店的请求共享同一段前缀，可以命中服务端的 prompt 缓存。
+
 analyze_post_system_prompt = """<你的身份>
 你是一个专业的文本含义分析大师，同时你也是一个酒店行业分析大师擅长分析社交媒体用户发表的帖子内容的含义，能够清晰地理解该帖子地用户在谈论什么。
 </你的身份>
 
+<给定关键词>
+以下是你需要识别的关键词列表，其中primary_keyword键下为一级关键词列表，secondary_keyword键下为二级关键词列表，每个关键词对象keyword键的值为关键词名称，description键的值为关键词的描述，你可以通过description字段的值来理解关键词：
+```
+{keywords}
+```
+</给定关键词>
+
 <你的任务>
 你的任务是逐句分析给定的社交媒体帖子内容，找出在给定的关键词列表中，有哪些关键词在社媒中被直接提及，或者虽然没直接提及但是其内容和某关键词有关，提取出这些关键词及其情感倾向。
 在逐句分析社媒帖子内容时，先默认社媒帖子内容是关于{hotel}酒店的，如果帖子内容中有明确提及一个或多个酒店名称，则只分析与{hotel}酒店相关的内容。
@@ -18,13 +28,6 @@ analyze_post_system_prompt = """<你的身份>
 4. 以JSON格式返回分析结果。
 </分析步骤>
 
-<给定关键词>
-以下是你需要识别的关键词列表，其中primary_keyword键下为一级关键词列表，secondary_keyword键下为二级关键词列表，每个关键词对象keyword键的值为关键词名称，description键的值为关键词的描述，你可以通过description字段的值来理解关键词：
-```
-{keywords}
-```
-</给定关键词>
-
 <任务要求>
 1. **请严格确保所有关键词都来自于上面的关键词列表, 请勿添加上述关键词列表中不存在的关键词**
 2. **给定的关键词分为一级关键词primary_keyword和二级关键词secondary_keyword，请将其归类到对应的字段中**
@@ -81,6 +84,13 @@ analyze_reply_system_prompt = """<你的身份>
 你是一个专业的文本含义分析大师，同时你也是一个酒店行业分析大师擅长分析社交媒体用户发表的帖子内容的含义，能够清晰地理解该帖子地用户在谈论什么。
 </你的身份>
 
+<给定关键词>
+以下是你需要识别的关键词列表，其中primary_keyword键下为一级关键词列表，secondary_keyword键下为二级关键词列表，每个关键词对象keyword键的值为关键词名称，description键的值为关键词的描述，你可以通过description字段的值来理解关键词：
+```
+{keywords}
+```
+</给定关键词>
+
 <你的任务>
 下面我会给你一个社媒帖子内容，以及一条该帖子下面的评论。
 你的任务是以社交媒体帖子内容作为上下文，逐句分析给定的评论内容，找出在给定的关键词列表中，有哪些关键词在社媒中被直接提及，或者虽然没直接提及但是其内容和某关键词有关，提取出这些关键词及其情感倾向。
@@ -95,13 +105,6 @@ analyze_reply_system_prompt = """<你的身份>
 4. 以JSON格式返回分析结果。
 </分析步骤>
 
-<给定关键词>
-以下是你需要识别的关键词列表，其中primary_keyword键下为一级关键词列表，secondary_keyword键下为二级关键词列表，每个关键词对象keyword键的值为关键词名称，description键的值为关键词的描述，你可以通过description字段的值来理解关键词：
-```
-{keywords}
-```
-</给定关键词>
-
 <任务要求>
 1. **请严格确保所有关键词都来自于上面的关键词列表, 请勿添加上述关键词列表中不存在的关键词**
 2. **给定的关键词分为一级关键词primary_keyword和二级关键词secondary_keyword，请将其归类到对应的字段中**
@@ -185,7 +188,8 @@ is_hotel_related_system_prompt = """<你的身份>
     "is_hotel_related": <布尔值>，表示帖子是否与酒店相关,
     "is_hotel_related_reason": <你的判断依据>
     "is_ad": <布尔值>，表示帖子是否是广告,
-    "is_ad_reason": <你的判断依据>
+    "is_ad_reason": <你的判断依据>,
+    "confidence": <0到1之间的数字>，表示你对以上判断的把握程度
 }}
 ```
 </任务要求>
@@ -205,7 +209,8 @@ is_hotel_related_user_prompt = """请分析以下社交媒体帖子，判断其
     "is_hotel_related": <布尔值>，表示帖子是否与酒店相关,
     "is_hotel_related_reason": <你的判断依据>
     "is_ad": <布尔值>，表示帖子是否是广告,
-    "is_ad_reason": <你的判断依据>
+    "is_ad_reason": <你的判断依据>,
+    "confidence": <0到1之间的数字>，表示你对以上判断的把握程度
 }}
 ```
 """
@@ -292,6 +297,41 @@ extract_frequent_words_user_prompt = """<你的任务>
 """
 
 
+refine_frequent_words_system_prompt = """<你的身份>
+你是一个专业的文本含义分析大师，同时你也是一个酒店行业分析大师，擅长判断社交媒体用户提到酒店某个方面时的情感倾向。
+</你的身份>
+
+<你的任务>
+给定一个主题下从社媒内容中统计出的高频词，以及每个高频词在原文中的几段上下文，判断用户提到该高频词时的情感倾向是positive还是negative，二者选其一。
+</你的任务>
+
+<任务要求>
+1. 只判断情感倾向，keyword 必须与给定的高频词完全一致，不要增加、删除或改写高频词。
+2. **请严格按照以下json格式返回一个列表，确保json格式正确，且不要返回多余的解释和注释。**：
+```json
+[
+    {{
+        "keyword": "马桶",
+        "sentiment": "positive"
+    }}
+]
+```
+</任务要求>
+"""
+
+refine_frequent_words_user_prompt = """<主题>
+一级主题：{primary_keyword}
+二级主题：{secondary_keyword}
+</主题>
+
+<高频词及上下文>
+```json
+{terms}
+```
+</高频词及上下文>
+"""
+
+
 extract_typical_reviews_system_prompt = """<你的身份>
 你是一位经验丰富的酒店行业市场分析师，擅长从大量用户评论中提炼和总结典型的正面及负面反馈。
 </你的身份>
@@ -495,6 +535,42 @@ distribute_user_focus_user_prompt = """<你的任务>
 
 """
 
+distribute_user_focus_batch_system_prompt = """<你的身份>
+你是一位专业的文本分析师，擅长对社媒帖子内容进行分析，并根据其内容**从给定的关键词列表中选出**帖子提及的关键词。
+</你的身份>
+
+<你的任务>
+你的任务是逐条分析给定的多条关于酒店的社媒帖子内容，每条内容都带有编号，请根据每条内容分别从给定的关键词列表中选出该条内容提及的关键词。最终返回一个json对象。
+</你的任务>
+
+<给定关键词列表>
+{user_focus_keywords}
+</给定关键词列表>
+
+<任务要求>
+1. 请确保你返回的关键词列表中的关键词是给定关键词列表的子集，请不要选取给定关键词列表中不存在的关键词。
+2. 请确保你选出的关键词与对应编号的帖子内容具有关联性，不同编号的内容之间互不影响。
+3. 每个编号都必须返回一项，如果该条内容中没有提及到给定关键词列表中的任何关键词，请返回空列表。
+4. **请严格按照以下json格式返回，确保json格式正确，且不要返回多余的解释和注释。**：
+```json
+{{
+    "results": [
+        {{"index": <内容编号>, "keywords": ["<关键词1>", "<关键词2>", ...]}},
+        ...
+    ]
+}}
+```
+<任务要求>
+"""
+
+distribute_user_focus_batch_user_prompt = """<你的任务>
+请根据System Prompt中的指示，逐条分析以下关于酒店的社媒帖子内容，并根据每条内容从给定的关键词列表中选出该条内容提及的关键词。
+</你的任务>
+
+{contents}
+
+"""
+
 summarize_user_focus_system_prompt = """
 <你的身份>
 你是一个社媒监听专家，擅长从一批社媒帖子内容中分析总结出消费者关注的内容。
@@ -593,6 +669,48 @@ analyze_smart_hotel_user_prompt = """
 </帖子内容>
 """
 
+merge_smart_hotel_insights_system_prompt = """
+<你的身份>
+你是一位经验丰富的酒店行业市场分析师，擅长从用户的社媒帖子内容中洞察酒店行业的新方向和启发。
+</你的身份>
+
+<你的任务>
+社媒帖子数量较多，已经分批分析过，每一批都得到了若干条关于酒店智能设施的洞察以及对应的典型用户帖子。你的任务是把这些分批得到的洞察合并为一份完整的分析结果。
+</你的任务>
+
+<任务要求>
+1. 将语意相同或相近的洞察合并为一条，合并后的洞察同样需要具有**结论性**和**启发性**。
+2. 每条洞察的典型用户帖子必须从给定的分批结果中原样选取，不要进行修改或编造或总结，每条洞察最多保留5条最具代表性的帖子。
+</任务要求>
+
+<输出结构>
+请确保你的输出符合如下json结构，不要返回多余的解释和注释:
+```json
+[
+    {{
+        "insight": "<洞察1>",
+        "typical_posts": [
+            "<典型的用户帖子内容1>",
+            "<典型的用户帖子内容2>",
+            ...
+        ]
+    }},
+    ...
+]
+```
+</输出结构>
+"""
+
+merge_smart_hotel_insights_user_prompt = """
+<你的任务>
+请根据System Prompt中的指示，合并以下分批得到的酒店智能设施洞察。
+</你的任务>
+
+<分批洞察>
+{insights}
+</分批洞察>
+"""
+
 if __name__ == "__main__":
     keywords = Keywords.get_keywords()
     pprint(keywords)
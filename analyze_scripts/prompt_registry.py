@@ -0,0 +1,86 @@
+"""
+system prompt 注册表
+
+analyze_keywords 等阶段原先对每个帖子、每条回复都调用一次
+``analyze_post_system_prompt.format(keywords=keywords, hotel=hotel_name)``，
+关键词列表每次都被重新转成字符串，得到的大量相同的 system prompt 又被各个 future 持有。
+注册表对每个 (模板, 参数) 只渲染一次，之后返回同一个字符串对象。
+
+模板中与任务无关的静态内容（如关键词列表）放在前面，随任务变化的内容放在后面，
+user prompt 放在最后，使服务端的 prompt 缓存能够命中静态前缀，命中情况见 ``llm_usage.usage_stats``。
+"""
+
+import threading
+
+from prompt import (
+    analyze_post_system_prompt,
+    analyze_reply_system_prompt,
+    distribute_user_focus_batch_system_prompt,
+    distribute_user_focus_system_prompt,
+    summarize_user_focus_system_prompt,
+)
+from utils import Keywords
+
+
+class PromptRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates = {}
+        self._static_kwargs = {}
+        self._rendered = {}
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, name, template, **static_kwargs):
+        """
+        注册模板。static_kwargs 的值可以是函数，会在第一次渲染时调用一次并缓存结果，
+        避免在导入时读取文件。
+        """
+        with self._lock:
+            self._templates[name] = template
+            self._static_kwargs[name] = dict(static_kwargs)
+            for key in [k for k in self._rendered if k[0] == name]:
+                del self._rendered[key]
+
+    def render(self, name, **kwargs):
+        """
+        渲染模板，相同的 (name, kwargs) 返回同一个字符串对象。
+        模板中只使用 ``{field}`` 形式的占位符，参数统一转为 str 后作为缓存键。
+        """
+        kwargs = {k: str(v) for k, v in kwargs.items()}
+        key = (name, tuple(sorted(kwargs.items())))
+        with self._lock:
+            rendered = self._rendered.get(key)
+            if rendered is not None:
+                self.hits += 1
+                return rendered
+            self.misses += 1
+            static_kwargs = self._static_kwargs[name]
+            for k, v in static_kwargs.items():
+                if callable(v):
+                    static_kwargs[k] = str(v())
+            rendered = self._templates[name].format(**static_kwargs, **kwargs)
+            self._rendered[key] = rendered
+            return rendered
+
+    def clear(self):
+        with self._lock:
+            self._rendered.clear()
+
+
+prompt_registry = PromptRegistry()
+prompt_registry.register(
+    "analyze_post",
+    analyze_post_system_prompt,
+    keywords=Keywords.get_keywords_with_description,
+)
+prompt_registry.register(
+    "analyze_reply",
+    analyze_reply_system_prompt,
+    keywords=Keywords.get_keywords_with_description,
+)
+prompt_registry.register("distribute_user_focus", distribute_user_focus_system_prompt)
+prompt_registry.register(
+    "distribute_user_focus_batch", distribute_user_focus_batch_system_prompt
+)
+prompt_registry.register("summarize_user_focus", summarize_user_focus_system_prompt)
@@ -0,0 +1,257 @@
+"""
+LLM 响应缓存与可复现性检查
+
+只有 inference_profiles 中 ``cacheable=True`` 的阶段（temperature 0 + 固定 seed 的分类阶段）才使用缓存：
+
+* 缓存键是 (模型, system prompt, user prompt, temperature, seed, max_tokens, schema 名称) 的 sha256，
+  任何一个参数变化都不会命中旧结果；
+* 结果保存在 sqlite 中（默认 analysis_result/llm_cache.sqlite），重新运行同一阶段时直接复用；
+  system prompt（keywords 阶段包含完整的关键词体系）按哈希单独存一份，各条记录只保存其哈希；
+* 同一进程中相同请求同时在途时（例如大量“顶”“同上”之类的回复），后到的请求等待第一个请求的结果，不重复调用。
+
+``check_reproducibility`` 从缓存中按阶段抽样，绕过缓存重新请求，比较两次结果（忽略 *reason 这类说明文字字段），
+打印一致率，用于确认该阶段的确定性设置是否足以支撑缓存：
+```
+python analyze_scripts/response_cache.py is_hotel_related 50
+```
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from llm_usage import usage_stats
+
+DEFAULT_CACHE_PATH = "analysis_result/llm_cache.sqlite"
+
+
+def request_key(request):
+    """request 为 infer 的参数字典，返回缓存键"""
+    payload = json.dumps(request, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS prompts (
+                hash TEXT PRIMARY KEY,
+                system_prompt TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                stage TEXT,
+                request TEXT NOT NULL,
+                system_prompt_hash TEXT,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            """
+        )
+        self._migrate()
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_stage ON responses (stage)"
+        )
+        self._conn.commit()
+        # 在途请求：key -> (Event, [结果])
+        self._inflight = {}
+
+    def _migrate(self):
+        """旧版本的缓存在每条记录的 request 中保存完整的 system prompt，移到 prompts 表中"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        if "system_prompt_hash" not in columns:
+            self._conn.execute("ALTER TABLE responses ADD COLUMN system_prompt_hash TEXT")
+        rows = self._conn.execute(
+            "SELECT key, request FROM responses WHERE system_prompt_hash IS NULL"
+        ).fetchall()
+        for key, request in rows:
+            request = json.loads(request)
+            stored, prompt_hash = self._store_prompt(request)
+            self._conn.execute(
+                "UPDATE responses SET request = ?, system_prompt_hash = ? WHERE key = ?",
+                (json.dumps(stored, ensure_ascii=False), prompt_hash, key),
+            )
+        if rows:
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+            print(f"响应缓存: {len(rows)} 条记录的 system prompt 已移到 prompts 表")
+
+    def _store_prompt(self, request):
+        """写入 system prompt（已存在时忽略），返回 (去掉 system prompt 的 request, 哈希)；需持有锁"""
+        stored = dict(request)
+        system_prompt = stored.pop("system_prompt", None)
+        if system_prompt is None:
+            return stored, None
+        prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        self._conn.execute(
+            "INSERT OR IGNORE INTO prompts VALUES (?, ?)", (prompt_hash, system_prompt)
+        )
+        return stored, prompt_hash
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, request, response, stage=None):
+        with self._lock:
+            stored, prompt_hash = self._store_prompt(request)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    stage,
+                    json.dumps(stored, ensure_ascii=False),
+                    prompt_hash,
+                    json.dumps(response, ensure_ascii=False),
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+
+    def get_or_compute(self, request, compute, stage=None):
+        """
+        命中缓存时直接返回；相同请求在途时等待其结果；否则调用 compute()，结果不为 None 时写入缓存
+
+        :param request: 决定结果的全部请求参数（可 JSON 序列化的字典）
+        """
+        key = request_key(request)
+        cached = self.get(key)
+        if cached is not None:
+            usage_stats.count("cache_hit")
+            return cached
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            owner = inflight is None
+            if owner:
+                inflight = (threading.Event(), [])
+                self._inflight[key] = inflight
+        done, result = inflight
+        if not owner:
+            done.wait()
+            if result and result[0] is not None:
+                usage_stats.count("cache_dedup")
+                return result[0]
+            # 第一个请求失败时自己再请求一次
+            return compute()
+
+        try:
+            value = compute()
+            result.append(value)
+            if value is not None:
+                self.put(key, request, value, stage)
+            usage_stats.count("cache_miss")
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            done.set()
+
+    def sample(self, stage, size):
+        """按阶段随机抽取 size 条缓存记录，返回 [(request, response), ...]，request 中还原了 system prompt"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.request, p.system_prompt, r.response FROM "
+                "(SELECT request, system_prompt_hash, response FROM responses "
+                "WHERE stage = ? ORDER BY RANDOM() LIMIT ?) r "
+                "LEFT JOIN prompts p ON p.hash = r.system_prompt_hash",
+                (stage, size),
+            ).fetchall()
+        samples = []
+        for request, system_prompt, response in rows:
+            request = json.loads(request)
+            if system_prompt is not None:
+                request["system_prompt"] = system_prompt
+            samples.append((request, json.loads(response)))
+        return samples
+
+    def report(self):
+        events = usage_stats.events()
+        hits = events.get("cache_hit", 0) + events.get("cache_dedup", 0)
+        total = hits + events.get("cache_miss", 0)
+        print(
+            f"响应缓存: 命中 {events.get('cache_hit', 0)} 次, 在途合并 {events.get('cache_dedup', 0)} 次, "
+            f"未命中 {events.get('cache_miss', 0)} 次, 命中率 {hits / total if total else 0:.2%}"
+        )
+
+
+def _canonical(value):
+    """去掉 *reason 字段后序列化，用于比较两次结果是否一致"""
+
+    def strip(v):
+        if isinstance(v, dict):
+            return {k: strip(x) for k, x in v.items() if not k.endswith("reason")}
+        if isinstance(v, list):
+            return [strip(x) for x in v]
+        return v
+
+    return json.dumps(strip(value), ensure_ascii=False, sort_keys=True)
+
+
+def check_reproducibility(stage, sample_size=50, cache=None, service=None):
+    """
+    从缓存中抽取 stage 的 sample_size 条记录，以相同参数绕过缓存重新请求，返回一致率
+
+    :param service: utils.OpenAIService，默认新建
+    """
+    import output_schemas
+    from utils import OpenAIService
+
+    cache = cache or ResponseCache()
+    service = service or OpenAIService()
+    schemas = {
+        schema.name: schema
+        for schema in vars(output_schemas).values()
+        if isinstance(schema, output_schemas.OutputSchema)
+    }
+    samples = cache.sample(stage, sample_size)
+    if not samples:
+        print(f"缓存中没有阶段 {stage} 的记录")
+        return None
+
+    agreed = 0
+    compared = 0
+    for request, cached in samples:
+        try:
+            rerun = service.infer(
+                user_prompt=request["user_prompt"],
+                system_prompt=request["system_prompt"],
+                model=request["model"],
+                temperature=request["temperature"],
+                seed=request["seed"],
+                max_tokens=request["max_tokens"],
+                response_schema=schemas.get(request["schema"]),
+                stage=f"{stage}:reproducibility",
+            )
+        except Exception as exc:
+            print(f"重新请求失败: {exc}")
+            continue
+        compared += 1
+        if _canonical(rerun) == _canonical(cached):
+            agreed += 1
+        else:
+            print(f"\n结果不一致:\n缓存: {_canonical(cached)}\n重跑: {_canonical(rerun)}")
+
+    rate = agreed / compared if compared else 0.0
+    print(f"[{stage}] 可复现性: 抽样 {len(samples)} 条, 成功重跑 {compared} 条, 一致 {agreed} 条, 一致率 {rate:.2%}")
+    return rate
+
+
+if __name__ == "__main__":
+    check_reproducibility(
+        sys.argv[1] if len(sys.argv) > 1 else "is_hotel_related",
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+    )
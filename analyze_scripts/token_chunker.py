@@ -0,0 +1,108 @@
+"""
+按 token 预算切分内容，并以 map-reduce 方式并行处理
+
+原先 extract_user_focus 不论数据量大小都固定切成 20 份，analyze_smart_hotel 则把所有帖子拼成一个 prompt，
+数据量增长后要么超出上下文窗口，要么每次请求都远未用满。
+
+* ``count_tokens`` 安装了 tiktoken 时按模型的编码计数，否则按字符估算（中日韩字符按 1 个 token，其它字符按 4 个字符 1 个 token，偏保守）；
+* ``pack_chunks`` 按原顺序把内容装入若干个不超过 token 预算的分块，单条超出预算的内容截断后单独成块；
+* ``map_reduce`` 用线程池并行处理每个分块，再把各分块的结果交给 reduce 函数合并。
+
+分块文本用列表收集后一次 join，不再在循环中反复拼接字符串。
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import tiktoken
+except ImportError:  # 未安装时按字符估算
+    tiktoken = None
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+_encodings = {}
+
+
+def _encoding(model):
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            # gpt-4.1 系列使用 o200k_base，旧版本 tiktoken 不认识这些模型名
+            _encodings[model] = tiktoken.get_encoding("o200k_base")
+    return _encodings[model]
+
+
+def count_tokens(text, model="gpt-4.1-mini"):
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text, disallowed_special=()))
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_budget(text, budget, model="gpt-4.1-mini"):
+    """截断 text 使其不超过 budget 个 token"""
+    if count_tokens(text, model) <= budget:
+        return text
+    if tiktoken is not None:
+        encoding = _encoding(model)
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:budget])
+    # 估算模式下二分查找最长的前缀
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid], model) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+def pack_chunks(texts, budget, model="gpt-4.1-mini", separator="\n"):
+    """
+    按顺序把 texts 装入分块，每个分块 join 之后不超过 budget 个 token
+
+    :return: 分块列表，每个分块是 texts 中连续若干条内容组成的列表
+    """
+    separator_tokens = count_tokens(separator, model) if separator else 0
+    chunks = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = count_tokens(text, model)
+        if tokens > budget:
+            text = truncate_to_budget(text, budget, model)
+            tokens = budget
+        extra = tokens + (separator_tokens if current else 0)
+        if current and current_tokens + extra > budget:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+            extra = tokens
+        current.append(text)
+        current_tokens += extra
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def map_reduce(chunks, map_fn, reduce_fn, max_workers=20, label="分块"):
+    """
+    并行执行 map_fn(chunk)，按分块顺序收集非空结果后调用 reduce_fn(results)
+
+    map_fn 抛出异常或返回 None 的分块会被跳过。
+    """
+    results = [None] * len(chunks)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(map_fn, chunk): i for i, chunk in enumerate(chunks)}
+        done = 0
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as exc:
+                print(f"\n处理第 {i + 1} 个{label}时发生错误: {exc}")
+            done += 1
+            print(f"\r{label}处理进度: {done}/{len(chunks)}", end="", flush=True)
+    print()
+    return reduce_fn([result for result in results if result is not None])
@@ -7,19 +7,63 @@ import re
 from unittest import result
 from dotenv import load_dotenv
 
-from openai import OpenAI
+from comment_tree import walk_comments
+from llm_backends import get_default_pool
+from json_stream import JsonStreamError, JsonStreamParser, repair_json
+from corpus import Corpus, HotelPosts, Post
+from llm_usage import usage_stats
 
 load_dotenv()
 
 
+_JSON_FORMAT_HINT = "**请严格按照要求的json格式返回结果，确保json格式正确，且不要返回多余的解释和注释**"
+# 流式输出中 JSON 闭合后，最多再读取的 chunk 数，用于拿到末尾的 usage
+_USAGE_DRAIN_CHUNKS = 8
+_JSON_FENCE_RE = re.compile(r"```json\s*([\s\S]*?)\s*```")
+
+
+def _json_correction(error):
+    return f"""{_JSON_FORMAT_HINT}
+                        请注意避免出现如下报错：
+                        ```
+                        {error}
+                        ```
+                        """
+
+
+def parse_llm_json(res_raw, allow_bare=False):
+    """
+    从模型输出中解析 JSON：优先取 ```json 代码块，allow_bare 时也接受直接以 { / [ 开头的输出
+    （structured output 不带代码块）。严格解析失败时先尝试 repair_json，仍失败则抛出 JsonStreamError。
+    """
+    res_raw = res_raw or ""
+    matches = _JSON_FENCE_RE.findall(res_raw)
+    if matches:
+        text = matches[0]
+    elif allow_bare and res_raw.lstrip()[:1] in ("{", "["):
+        text = res_raw
+    else:
+        raise JsonStreamError("输出中没有找到 ```json 代码块")
+    try:
+        return json.loads(text, strict=False)
+    except json.JSONDecodeError as e:
+        try:
+            result = repair_json(text)
+        except ValueError:
+            raise JsonStreamError(str(e)) from e
+        usage_stats.count("json_repaired")
+        return result
+
+
 class OpenAIService:
-    """Service class for OpenAI API interactions."""
+    """
+    Service class for OpenAI API interactions.
 
-    def __init__(self):
-        self.client = OpenAI(
-            api_key=os.environ.get("OPENAI_API_KEY"),
-            base_url=os.environ.get("OPENAI_API_BASE"),
-        )
+    请求经由 llm_backends 的后端池发出，默认使用按环境变量创建的共享池（见 llm_backends.py）。
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool or get_default_pool()
 
     def infer(
         self,
@@ -28,44 +72,213 @@ class OpenAIService:
         model: str = "gpt-4.1-mini",
         temperature: float = 0.8,
         retries: int = 3,
+        stream: bool = False,
+        response_schema=None,
+        hedge=None,
+        stage=None,
+        seed=None,
+        max_tokens=None,
+        cache=None,
     ):
-        """Make an inference using OpenAI API."""
+        """
+        Make an inference using OpenAI API.
+
+        stream=True 时边接收边解析 JSON，JSON 闭合后立即关闭连接，结构错误出现时立即中止并重试。
+        response_schema 为 output_schemas 中的 OutputSchema 时使用 structured output，
+        返回结果在本地按 schema 校验，不通过才重新请求。
+        JSON 解析失败时先尝试 repair_json 修复，修复失败才重新请求，次数记录在 usage_stats 中。
+        hedge 为 llm_hedging.HedgePolicy 时，请求耗时超过近期分位数后会发出对冲请求，取最先返回的合法结果。
+        stage 为 usage_stats 中记录用量的阶段名。
+        seed / max_tokens 不为 None 时传给接口，通常来自 inference_profiles 中该阶段的设置。
+        cache 为 response_cache.ResponseCache 时，相同参数的请求直接复用缓存结果，
+        只应对确定性设置（temperature 0 + 固定 seed）的阶段使用。
+        """
+        if cache is not None:
+            request = {
+                "model": model,
+                "system_prompt": system_prompt,
+                "user_prompt": user_prompt,
+                "temperature": temperature,
+                "seed": seed,
+                "max_tokens": max_tokens,
+                "schema": response_schema.name if response_schema is not None else None,
+            }
+            return cache.get_or_compute(
+                request,
+                lambda: self.infer(
+                    user_prompt,
+                    system_prompt,
+                    model,
+                    temperature,
+                    retries,
+                    stream,
+                    response_schema,
+                    hedge,
+                    stage,
+                    seed,
+                    max_tokens,
+                ),
+                stage=stage,
+            )
+
+        # 只传入设置了的参数，部分兼容接口不接受 seed
+        options = {
+            name: value
+            for name, value in (("seed", seed), ("max_tokens", max_tokens))
+            if value is not None
+        }
         for attempt in range(retries):
             try:
-                completion = self.client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        ({"role": "system", "content": system_prompt}),
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    timeout=300,
-                    temperature=temperature,
-                )
-                res_raw = completion.choices[0].message.content
+                def request(cancel, user_prompt=user_prompt):
+                    if stream:
+                        return self._infer_stream(
+                            user_prompt,
+                            system_prompt,
+                            model,
+                            temperature,
+                            response_schema,
+                            cancel=cancel,
+                            stage=stage,
+                            **options,
+                        )
+                    return self._infer_once(
+                        user_prompt,
+                        system_prompt,
+                        model,
+                        temperature,
+                        response_schema,
+                        stage=stage,
+                        **options,
+                    )
 
-                # Try to parse JSON if present
-                pattern = re.compile(r"```json\s*([\s\S]*?)\s*```")
-                matches = pattern.findall(res_raw) if res_raw else None
-                if matches:
-                    try:
-                        return json.loads(matches[0], strict=False)
-                    except json.JSONDecodeError as e:
-                        user_prompt += f"""**请严格按照要求的json格式返回结果，确保json格式正确，且不要返回多余的解释和注释**
-                        请注意避免出现如下报错：
-                        ```
-                        {e}
-                        ```
-                        """
-                        continue
-                else:
-                    user_prompt += "**请严格按照要求的json格式返回结果，确保json格式正确，且不要返回多余的解释和注释**"
+                try:
+                    result = hedge.run(request) if hedge else request(None)
+                except JsonStreamError as e:
+                    usage_stats.count("json_retry")
+                    user_prompt += _json_correction(e)
                     continue
 
+                if response_schema is not None:
+                    errors = response_schema.validate(result)
+                    if errors:
+                        usage_stats.count("schema_retry")
+                        user_prompt += _json_correction("\n".join(errors[:5]))
+                        continue
+                    result = response_schema.unwrap(result)
+                return result
+
             except Exception as e:
                 print(f"OpenAI API call failed (attempt {attempt + 1}/{retries}): {e}")
                 if attempt == retries - 1:
                     raise
 
+    @staticmethod
+    def _create(
+        backend, user_prompt, system_prompt, model, temperature, response_schema, **kwargs
+    ):
+        if response_schema is not None:
+            kwargs["response_format"] = response_schema.response_format()
+        return backend.client.chat.completions.create(
+            model=backend.resolve_model(model),
+            messages=[
+                ({"role": "system", "content": system_prompt}),
+                {"role": "user", "content": user_prompt},
+            ],
+            timeout=300,
+            temperature=temperature,
+            **kwargs,
+        )
+
+    def _infer_once(
+        self,
+        user_prompt,
+        system_prompt,
+        model,
+        temperature,
+        response_schema,
+        stage=None,
+        **options,
+    ):
+        completion = self.pool.call(
+            lambda backend: self._create(
+                backend,
+                user_prompt,
+                system_prompt,
+                model,
+                temperature,
+                response_schema,
+                **options,
+            )
+        )
+        usage_stats.record(getattr(completion, "usage", None), model, stage)
+        return parse_llm_json(
+            completion.choices[0].message.content, allow_bare=response_schema is not None
+        )
+
+    def _infer_stream(self, *args, cancel=None, stage=None, **options):
+        # 整个流式读取过程都占用后端的在途名额，连接中断等错误同样会触发故障转移
+        return self.pool.call(
+            lambda backend: self._consume_stream(backend, *args, cancel, stage, **options)
+        )
+
+    def _consume_stream(
+        self,
+        backend,
+        user_prompt,
+        system_prompt,
+        model,
+        temperature,
+        response_schema,
+        cancel,
+        stage,
+        **options,
+    ):
+        response = self._create(
+            backend,
+            user_prompt,
+            system_prompt,
+            model,
+            temperature,
+            response_schema,
+            stream=True,
+            stream_options={"include_usage": True},
+            **options,
+        )
+        parser = JsonStreamParser()
+        drain = _USAGE_DRAIN_CHUNKS
+        last_usage = None
+        try:
+            for chunk in response:
+                if cancel is not None and cancel.is_set():
+                    # 对冲的另一个请求已经返回
+                    break
+                # OpenAI 只在最后一个（choices 为空的）chunk 中返回 usage，
+                # 其它兼容服务可能在带内容的 chunk 中也返回，内容要先交给 parser，usage 以最后一次为准
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    last_usage = usage
+                if chunk.choices and not parser.done:
+                    parser.feed(chunk.choices[0].delta.content)
+                    continue
+                if usage is not None and not chunk.choices:
+                    break
+                if parser.done:
+                    # JSON 已经完整，再多读几段等待 usage（通常只剩代码块结尾），超出则直接断开
+                    drain -= 1
+                    if drain <= 0:
+                        break
+            if last_usage is not None:
+                usage_stats.record(last_usage, model, stage)
+            result = parser.close()
+        finally:
+            # 提前返回或出错时关闭连接，服务端停止生成
+            close = getattr(response, "close", None)
+            if close is not None:
+                close()
+        if parser.repaired:
+            usage_stats.count("json_repaired")
+        return result
+
 
 class PostsFilter:
     def __init__(self, start_date=datetime(2024, 3, 1), end_date=datetime(2025, 2, 28)):
@@ -77,8 +290,9 @@ class PostsFilter:
         """
         去掉raw_data中的author字段
         去掉replies中每个reply的commenter_name和commenter_link字段
+        返回 Corpus 对象，后续分析阶段直接在其上读写结果
         """
-        simplified_data = []
+        simplified_hotels = []
         for hotel in data:
             simplified_posts = []
             for post in hotel["posts"]:
@@ -97,11 +311,10 @@ class PostsFilter:
                 # 检查 'note_id' 是否存在于 post 中，如果存在则添加
                 if "note_id" in post:
                     simplified_post["note_id"] = post["note_id"]
-                simplified_posts.append(simplified_post)
+                simplified_posts.append(Post.from_dict(simplified_post))
 
-            simplified_hotel = {"hotel": hotel["hotel"], "posts": simplified_posts}
-            simplified_data.append(simplified_hotel)
-        return simplified_data
+            simplified_hotels.append(HotelPosts(hotel["hotel"], simplified_posts))
+        return Corpus(simplified_hotels)
 
     def filter_by_time(self, raw_data):
         """
@@ -447,7 +660,8 @@ def format_xhs_data_from_mobile(file_path, hotel_name):
             "replies": [],
         }
         if post.get("comments", None):
-            for comment in post["comments"]:
+            # 过滤后的数据已是扁平列表；未过滤的数据则连同各层 sub_comments 一起展开
+            for _, comment in walk_comments(post["comments"]):
                 if comment.get("date_location", None):
                     parsed_comment_timestamp = parse_timestamp(comment["date_location"])
                     if not parsed_comment_timestamp:
@@ -479,15 +693,23 @@ def format_all_xhs_data_from_mobile(data_path, hotel_names):
     return all_data
 
 
-def merge_data(formatted_data, existing_data_path):
+def merge_data(formatted_data, existing_data_path, on_added=None):
     """
     将格式化或分析后的数据合并到已有的数据中，并根据 post['content'] 进行去重。
+    formatted_data 可以是 JSON 列表或 Corpus。
+
+    :param on_added: 写入文件后以实际新增的帖子（[{"hotel", "posts"}, ...]）调用，
+                     如 data_count.apply_analyzed_delta
     """
+    if isinstance(formatted_data, Corpus):
+        formatted_data = formatted_data.to_json()
+
     existing_data = get_raw_data(existing_data_path)
     if existing_data is None:
         print(f"警告: {existing_data_path} 不存在或为空")
         raise
 
+    added = []
     for formatted_hotel in formatted_data:
         found_hotel = False
         for existing_hotel in existing_data:
@@ -512,6 +734,10 @@ def merge_data(formatted_data, existing_data_path):
                         )  # 将新添加的内容也加入，防止formatted_hotel内部重复
 
                 existing_hotel["posts"].extend(new_posts_to_add)
+                if new_posts_to_add:
+                    added.append(
+                        {"hotel": formatted_hotel["hotel"], "posts": new_posts_to_add}
+                    )
                 break
 
         if not found_hotel:
@@ -533,8 +759,15 @@ def merge_data(formatted_data, existing_data_path):
                         "posts": unique_posts_for_new_hotel,
                     }
                 )
+                added.append(existing_data[-1])
 
+    if not added:
+        # 没有新帖子时文件内容不变，不重写，避免修改时间变化导致统计结果和内容索引被重新构建
+        print(f"{existing_data_path} 没有新增帖子")
+        return existing_data
     write_to_json(existing_data, existing_data_path)
+    if on_added is not None:
+        on_added(added)
     return existing_data
 
 
@@ -861,15 +1094,25 @@ def parse_timestamp(timestamp_str):
     return None
 
 
-def collect_huiting_content_by_keyword(data):
+def collect_huiting_content_by_keyword(data=None, hotel="惠庭"):
     """
     按关键词收集内容，以便于进行高频词汇提取
+
+    data 为 None 时从 content_index 的倒排索引中读取，不再遍历分析结果
     """
+    if data is None:
+        from content_index import get_default_index
+
+        return {
+            pk: {sk: [item["content"] for item in items] for sk, items in sk_map.items()}
+            for pk, sk_map in get_default_index().keyword_content_map(hotel).items()
+        }
+
     huiting_posts = []
-    for hotel in data:
-        if hotel["hotel"] == "惠庭":
-            huiting_posts.extend(hotel["posts"])
-            for post in hotel["posts"]:
+    for hotel_entry in data:
+        if hotel_entry["hotel"] == hotel:
+            huiting_posts.extend(hotel_entry["posts"])
+            for post in hotel_entry["posts"]:
                 huiting_posts.extend(post["replies"])
 
     # 收集包含关键字的帖子内容
@@ -1084,27 +1327,11 @@ def format_keywords_for_all_analyzed_file(file_paths):
     pprint(record)
 
 
-def get_huiting_content(get_replies=False):
-    wb_data = get_raw_data("analysis_result/wb_analyzed.json")
-    flyert_data = get_raw_data("analysis_result/flyert_analyzed.json")
-    xhs_data = get_raw_data("analysis_result/xhs_analyzed.json")
-
-    all_data = wb_data + flyert_data + xhs_data  # type: ignore
-
-    content = []
-    for hotel in all_data:
-        if hotel["hotel"] == "惠庭":
-            for post in hotel["posts"]:
-                if (
-                    post.get("is_hotel_related", False) == True
-                    and post.get("is_ad", False) == False
-                ):
-                    content.append(post["content"])
+def get_huiting_content(get_replies=False, hotel="惠庭"):
+    """从 content_index 的倒排索引中读取某个酒店与酒店相关、非广告的帖子（以及回复）内容"""
+    from content_index import get_default_index
 
-                if get_replies:
-                    for reply in post["replies"]:
-                        if reply.get("is_hotel_related", False) == True:
-                            content.append(reply["content"])
+    content = get_default_index().hotel_contents(hotel, include_replies=get_replies)
     print(f"共获取到 {len(content)} 条内容")
 
     return content
@@ -0,0 +1,86 @@
+"""
+有界的生产者/消费者工作队列
+
+分析阶段原先会把整个语料的任务一次性 submit 到线程池，再用 futures_map 记录
+每个任务在嵌套数据中的位置。语料一大，挂起的 future 和已经格式化好的 prompt
+会全部堆在内存里。这里改为：
+
+* 任务用轻量的 ``WorkItem`` 表示，直接引用要写回结果的 Post / Reply 对象；
+* 任务从一个（可以是惰性的）迭代器中取出，同时在途的任务数不超过 ``max_pending``，
+  队列满时生产者等待已有任务完成（背压），内存占用与语料大小无关；
+* prompt 在工作线程中按需生成，任务完成后即可回收；
+* 结果回调在调用方线程中执行，写回数据时不需要加锁，回调还可以返回后续任务
+  （例如帖子与酒店相关时再分析其回复），后续任务优先于新任务执行。
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class WorkItem:
+    """
+    一个待执行的分析任务
+
+    :param kind: 任务类型，如 "post" / "reply"
+    :param target: 结果写回的对象
+    :param context: 生成 prompt 需要的其它信息，如酒店名、所属帖子
+    """
+
+    __slots__ = ("kind", "target", "context")
+
+    def __init__(self, kind, target, context=None):
+        self.kind = kind
+        self.target = target
+        self.context = context
+
+
+_EXHAUSTED = object()
+
+
+def run_work_items(
+    items, worker, on_result, on_error=None, max_workers=200, max_pending=None
+):
+    """
+    以有界并发执行任务
+
+    :param items: WorkItem 的迭代器，会被惰性消费
+    :param worker: worker(item) -> result，在线程池中执行
+    :param on_result: on_result(item, result) -> 可选的后续 WorkItem 列表，在调用方线程执行
+    :param on_error: worker 或 on_result 抛出异常时调用 on_error(item, exc) -> 可选的后续 WorkItem 列表；
+                     为 None 时打印错误后跳过
+    :param max_workers: 线程数
+    :param max_pending: 同时在途（已提交未处理）的任务上限，默认为 max_workers 的 2 倍
+    """
+    if max_pending is None:
+        max_pending = max_workers * 2
+    source = iter(items)
+    follow_ups = deque()
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            # 填充在途任务，后续任务优先
+            while len(pending) < max_pending:
+                if follow_ups:
+                    item = follow_ups.popleft()
+                else:
+                    item = next(source, _EXHAUSTED)
+                    if item is _EXHAUSTED:
+                        break
+                pending[executor.submit(worker, item)] = item
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    more = on_result(item, future.result())
+                except Exception as exc:
+                    if on_error is None:
+                        print(f"\n处理任务时发生错误: {exc}")
+                        continue
+                    more = on_error(item, exc)
+                if more:
+                    follow_ups.extend(more)